@@ -0,0 +1,126 @@
+"""
+ASGI config for app project.
+
+It exposes the ASGI callable as a module-level variable named
+``application``. Run it with gunicorn's uvicorn worker, configured in
+gunicorn.conf.py.
+
+Django 2.1 has no ASGI handler of its own, so the WSGI application runs on
+thread pools under an event loop. The loop accepts connections, keeps them
+alive and reads request bodies; a thread is only taken once a request has
+fully arrived, so slow uploads no longer hold one. The thread then waits
+for each chunk of the response to be handed to the server, so streamed
+and file responses to a slow client still hold it until they are sent.
+Reads get a pool of their own, so the recipe, tag and ingredient lists
+keep being served while writes are slow.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Request bodies larger than this are buffered on disk
+BODY_MEMORY_SIZE = 64 * 1024
+
+
+class ThreadPoolWsgiToAsgiInstance(WsgiToAsgiInstance):
+    """Serve one request on the pool its method is routed to"""
+
+    def __init__(self, wsgi_application, executors):
+        super().__init__(wsgi_application)
+        self.executors = executors
+
+    async def run_wsgi_app(self, body):
+        loop = asyncio.get_event_loop()
+        executor = self.executors[self.scope['method'] in READ_METHODS]
+
+        def send(message):
+            asyncio.run_coroutine_threadsafe(
+                self.send(message), loop
+            ).result()
+
+        await loop.run_in_executor(executor, self._run, body, send)
+
+    def _run(self, body, send):
+        environ = self.build_environ(self.scope, body)
+        response = self.wsgi_application(environ, self.start_response)
+        try:
+            for output in response:
+                if not self.response_started:
+                    self.response_started = True
+                    send(self.response_start)
+                send({
+                    'type': 'http.response.body',
+                    'body': output,
+                    'more_body': True,
+                })
+        finally:
+            # Lets Django close the request and its database connection
+            if hasattr(response, 'close'):
+                response.close()
+        if not self.response_started:
+            self.response_started = True
+            send(self.response_start)
+        send({'type': 'http.response.body'})
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            raise ValueError('WSGI wrapper received a non-HTTP scope')
+        self.scope = scope
+        self.send = send
+        with SpooledTemporaryFile(max_size=BODY_MEMORY_SIZE) as body:
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    # The client gave up before sending the whole body
+                    return
+                body.write(message.get('body', b''))
+                if not message.get('more_body'):
+                    break
+            body.seek(0)
+            await self.run_wsgi_app(body)
+
+
+class ThreadPoolWsgiToAsgi(WsgiToAsgi):
+    """Run a WSGI application on separate read and write thread pools"""
+
+    def __init__(self, wsgi_application, read_threads, write_threads):
+        super().__init__(wsgi_application)
+        self.executors = {
+            True: ThreadPoolExecutor(read_threads, 'asgi-read'),
+            False: ThreadPoolExecutor(write_threads, 'asgi-write'),
+        }
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for executor in self.executors.values():
+                    executor.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        await ThreadPoolWsgiToAsgiInstance(
+            self.wsgi_application, self.executors
+        )(scope, receive, send)
+
+
+application = ThreadPoolWsgiToAsgi(
+    get_wsgi_application(),
+    settings.ASGI_READ_THREADS,
+    settings.ASGI_WRITE_THREADS,
+)
@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'core',
@@ -46,6 +47,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -78,17 +80,68 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.1/ref/settings/#databases
 
+# Connections are kept open for DB_CONN_MAX_AGE seconds (0 closes them after
+# every request) and checked before a new request reuses them.
+#
+# Set DB_PGBOUNCER=1 when DB_HOST is a pgbouncer in transaction pooling
+# mode. Consecutive transactions may then run on different server
+# connections, so server-side cursors, which outlive their transaction,
+# are turned off. psycopg2 never prepares statements on the server, so
+# there are none to lose. Point migrations straight at PostgreSQL: indexes
+# are created CONCURRENTLY, outside a transaction.
+
+DB_PGBOUNCER = os.environ.get('DB_PGBOUNCER', '0') == '1'
+DB_CONN_HEALTH_CHECKS = os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.backends.postgresql',
         'HOST': os.environ.get('DB_HOST'),
+        'PORT': os.environ.get('DB_PORT', ''),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'DISABLE_SERVER_SIDE_CURSORS': DB_PGBOUNCER,
+        'OPTIONS': {
+            'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 10)),
+        },
     }
 }
 
 
+# Cache
+# Point MEMCACHED_LOCATION at a memcached server (e.g. memcached:11211) to
+# share cached responses between workers; local memory is used otherwise.
+
+if os.environ.get('MEMCACHED_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': os.environ.get('MEMCACHED_LOCATION'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
+# Responses compressed with brotli, when installed, or gzip. Quality and
+# level are kept moderate: API responses are compressed on every request.
+COMPRESSION_MIN_SIZE = 200
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+COMPRESSION_BROTLI_QUALITY = int(
+    os.environ.get('COMPRESSION_BROTLI_QUALITY', 4)
+)
+# Streamed responses are flushed to the client every this many bytes in
+COMPRESSION_STREAM_FLUSH_SIZE = int(
+    os.environ.get('COMPRESSION_STREAM_FLUSH_SIZE', 64 * 1024)
+)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
 
@@ -108,6 +161,38 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Threads serving requests under app.asgi: reads (GET, HEAD, OPTIONS) and
+# writes get separate pools so slow writes cannot starve the read endpoints
+ASGI_READ_THREADS = int(os.environ.get('ASGI_READ_THREADS', 8))
+ASGI_WRITE_THREADS = int(os.environ.get('ASGI_WRITE_THREADS', 4))
+
+
+# Password hashing
+# Argon2 hashes new passwords; older hashes are upgraded at the next login
+PASSWORD_HASHERS = [
+    'core.passwords.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+PASSWORD_ARGON2_TIME_COST = int(os.environ.get('PASSWORD_ARGON2_TIME_COST', 2))
+PASSWORD_ARGON2_MEMORY_COST = int(
+    os.environ.get('PASSWORD_ARGON2_MEMORY_COST', 512)
+)
+PASSWORD_ARGON2_PARALLELISM = int(
+    os.environ.get('PASSWORD_ARGON2_PARALLELISM', 2)
+)
+# At most this many hashes run at once per process, each on its request's
+# thread, by default as many as a gunicorn worker has threads or the host
+# has cores. PASSWORD_HASH_QUEUE more may wait up to PASSWORD_HASH_TIMEOUT
+# seconds before the request gets a 503.
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', min(
+    int(os.environ.get('GUNICORN_THREADS', 4)), os.cpu_count() or 1
+)))
+PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 16))
+PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 5))
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/2.1/topics/i18n/
 
@@ -131,4 +216,79 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
 
-AUTH_USER_MODEL = 'core.User'
\ No newline at end of file
+AUTH_USER_MODEL = 'core.User'
+
+# Recepie API
+# Set RECEPIE_API_PAGINATE=0 to serve the legacy unpaginated lists while
+# clients migrate to cursor pagination.
+
+RECEPIE_API_PAGINATE = os.environ.get('RECEPIE_API_PAGINATE', '1') == '1'
+
+# Serve lists from values() rows instead of model instances, and encode and
+# decode JSON with orjson when it is installed; output is identical either way
+RECEPIE_FAST_SERIALIZERS = (
+    os.environ.get('RECEPIE_FAST_SERIALIZERS', '1') == '1'
+)
+RECEPIE_FAST_JSON = os.environ.get('RECEPIE_FAST_JSON', '1') == '1'
+# Lists asked for with ?stream=1 are streamed this many rows at a time
+RECEPIE_STREAM_CHUNK_SIZE = int(
+    os.environ.get('RECEPIE_STREAM_CHUNK_SIZE', 500)
+)
+# Histogram buckets per measure and most used tags and ingredients listed
+# first by the recipe stats endpoint, which counts every one used as well
+RECEPIE_STATS_BUCKETS = int(os.environ.get('RECEPIE_STATS_BUCKETS', 10))
+RECEPIE_STATS_TOP = int(os.environ.get('RECEPIE_STATS_TOP', 10))
+# Changes sent per delta sync response, more when they share a sequence
+RECEPIE_SYNC_PAGE_SIZE = int(os.environ.get('RECEPIE_SYNC_PAGE_SIZE', 1000))
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': (
+        'recepie.renderers.FastJSONRenderer' if RECEPIE_FAST_JSON
+        else 'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'recepie.parsers.FastJSONParser' if RECEPIE_FAST_JSON
+        else 'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+}
+
+RECEPIE_CACHE_ALIAS = 'default'
+RECEPIE_CACHE_TIMEOUT = int(os.environ.get('RECEPIE_CACHE_TIMEOUT', 300))
+
+# Where uploaded recipe images are resized; recepie.images.InlineQueue
+# processes them in the request's thread instead
+RECEPIE_IMAGE_QUEUE = os.environ.get(
+    'RECEPIE_IMAGE_QUEUE', 'recepie.images.ProcessPoolQueue'
+)
+RECEPIE_IMAGE_WORKERS = int(os.environ.get('RECEPIE_IMAGE_WORKERS', 2))
+RECEPIE_IMAGE_MAX_BYTES = int(
+    os.environ.get('RECEPIE_IMAGE_MAX_BYTES', 10 * 1024 * 1024)
+)
+# How the media view hands files to the front-end server: 'x-accel-redirect'
+# for nginx, 'x-sendfile' for Apache or lighttpd, or empty to send them
+# from Django. nginx needs an internal location at RECEPIE_MEDIA_ACCEL_PREFIX
+# aliased to MEDIA_ROOT.
+RECEPIE_MEDIA_SENDFILE = os.environ.get('RECEPIE_MEDIA_SENDFILE', '')
+RECEPIE_MEDIA_ACCEL_PREFIX = os.environ.get(
+    'RECEPIE_MEDIA_ACCEL_PREFIX', '/protected-media/'
+)
+# Chunks of resumable uploads; shared by every web worker, not served
+RECEPIE_UPLOAD_DIR = os.environ.get('RECEPIE_UPLOAD_DIR', '/vol/web/uploads')
+
+# Tokens stop being accepted this many seconds after they were issued
+USER_TOKEN_TTL = int(os.environ.get('USER_TOKEN_TTL', 30 * 24 * 3600))
+# Authenticated tokens are cached, so most requests skip authtoken_token.
+# Each process also keeps its own copy for USER_AUTH_LOCAL_TIMEOUT seconds,
+# which bounds how long another process may accept a revoked token.
+USER_AUTH_CACHE_ALIAS = 'default'
+USER_AUTH_CACHE_TIMEOUT = int(os.environ.get('USER_AUTH_CACHE_TIMEOUT', 300))
+USER_AUTH_LOCAL_TIMEOUT = float(os.environ.get('USER_AUTH_LOCAL_TIMEOUT', 5))
+USER_AUTH_LOCAL_SIZE = int(os.environ.get('USER_AUTH_LOCAL_SIZE', 10000))
+# Login attempts allowed per account and per client address, and signups
+# per client address
+USER_LOGIN_RATE = os.environ.get('USER_LOGIN_RATE', '10/min')
+USER_LOGIN_ADDRESS_RATE = os.environ.get('USER_LOGIN_ADDRESS_RATE', '30/min')
+USER_SIGNUP_RATE = os.environ.get('USER_SIGNUP_RATE', '20/hour')
@@ -25,8 +25,20 @@ class UserAdmin(BaseUserAdmin):
             'fields': ('email', 'password1', 'password2')
         }),
     )
-    
+
+
+class RecepieAdmin(admin.ModelAdmin):
+
+    def save_model(self, request, obj, form, change):
+        """Keep the reference counts of the recipe's image files"""
+        old_files = []
+        if change:
+            old_files = models.Recepie.objects.get(pk=obj.pk).stored_files()
+        super().save_model(request, obj, form, change)
+        models.StoredFile.objects.replace(old_files, obj.stored_files())
+
+
 admin.site.register(models.User, UserAdmin)
 admin.site.register(models.Tag)
 admin.site.register(models.Ingredient)
-admin.site.register(models.Recepie)
+admin.site.register(models.Recepie, RecepieAdmin)
@@ -0,0 +1,102 @@
+"""PostgreSQL backend that checks reused connections and counts them
+
+Django 2.1 only notices a dead persistent connection when a query on it
+fails. Here a connection is checked with SELECT 1 the first time it is
+used in a request, if it has been used before, and replaced when the
+check fails. Opens, closes and time spent connecting are counted per
+process for the db-stats endpoint.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db.backends.postgresql import base
+
+
+class ConnectionStats:
+    """Thread-safe counters of the process's database connections"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.closed = 0
+        self.failed_health_checks = 0
+        self.connect_seconds = 0.0
+        self.max_connect_seconds = 0.0
+
+    def connected(self, seconds):
+        with self._lock:
+            self.opened += 1
+            self.connect_seconds += seconds
+            self.max_connect_seconds = max(self.max_connect_seconds, seconds)
+
+    def disconnected(self):
+        with self._lock:
+            self.closed += 1
+
+    def health_check_failed(self):
+        with self._lock:
+            self.failed_health_checks += 1
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'opened': self.opened,
+                'closed': self.closed,
+                'open': self.opened - self.closed,
+                'failed_health_checks': self.failed_health_checks,
+                'connect_seconds_total': round(self.connect_seconds, 6),
+                'connect_seconds_avg': round(
+                    self.connect_seconds / self.opened, 6
+                ) if self.opened else 0.0,
+                'connect_seconds_max': round(self.max_connect_seconds, 6),
+            }
+
+
+stats = ConnectionStats()
+
+
+def server_connection_counts(connection):
+    """Return {state: count} of the server's connections to our database
+
+    Behind pgbouncer these are its server connections, not our clients.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT coalesce(state, 'unknown'), count(*) "
+            "FROM pg_stat_activity WHERE datname = current_database() "
+            "GROUP BY 1"
+        )
+        return dict(cursor.fetchall())
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    health_check_pending = False
+
+    def get_new_connection(self, conn_params):
+        start = time.perf_counter()
+        connection = super().get_new_connection(conn_params)
+        stats.connected(time.perf_counter() - start)
+        return connection
+
+    def _close(self):
+        try:
+            super()._close()
+        finally:
+            stats.disconnected()
+
+    def check_health_on_next_use(self):
+        """Check the connection, if one is open, before its next query"""
+        self.health_check_pending = (
+            self.connection is not None and settings.DB_CONN_HEALTH_CHECKS
+        )
+
+    def _cursor(self, name=None):
+        # Only between transactions, where closing loses nothing
+        if self.health_check_pending and not self.in_atomic_block and \
+                self.get_autocommit():
+            self.health_check_pending = False
+            if not self.is_usable():
+                stats.health_check_failed()
+                self.close()
+        return super()._cursor(name)
@@ -0,0 +1,75 @@
+"""Link counters kept on both sides of the recipe many-to-many fields
+
+Recepie.tag_count and ingredient_count count a recipe's links, and
+recipe_count on Tag and Ingredient the recipes linked to each. They move
+by F() updates in the transaction changing the links, so listing or
+sorting by them reads a column instead of grouping the through tables.
+The reconcile_counters command corrects any drift.
+"""
+from collections import Counter, defaultdict
+
+from django.db.models import F
+
+from core.models import Recepie
+
+# Counter on Recepie for each many-to-many field
+RECEPIE_COUNTERS = {
+    'tags': 'tag_count',
+    'ingredients': 'ingredient_count',
+}
+# Counter on the related model
+RELATED_COUNTER = 'recipe_count'
+
+
+def link_field(through):
+    """Return the Recepie many-to-many field whose through model this is"""
+    for field in Recepie._meta.many_to_many:
+        if field.remote_field.through is through:
+            return field
+    raise LookupError(f'{through.__name__} links no recipe field')
+
+
+def link_columns(field):
+    """Return the through columns pointing at the recipe and related row"""
+    return (
+        f'{field.m2m_field_name()}_id',
+        f'{field.m2m_reverse_field_name()}_id',
+    )
+
+
+def links(field, **filters):
+    """Return the (recepie id, related id) links matching filters"""
+    through = field.remote_field.through
+    return list(through.objects.filter(**filters).values_list(
+        *link_columns(field)
+    ))
+
+
+def _apply(model, counter, deltas):
+    """Add each {pk: delta} to counter, one UPDATE per distinct delta"""
+    pks = defaultdict(list)
+    for pk, delta in deltas.items():
+        if delta:
+            pks[delta].append(pk)
+    for delta, batch in pks.items():
+        model.objects.filter(pk__in=batch).update(
+            **{counter: F(counter) + delta}
+        )
+
+
+def count_links(field, added=(), removed=(), recepies=True, related=True):
+    """Move the counters for added and removed (recepie id, related id)
+
+    recepies or related may be turned off for a side whose rows are about
+    to be deleted. Returns the (recepie, related) deltas applied.
+    """
+    recepie_deltas, related_deltas = Counter(), Counter()
+    for pairs, sign in ((added, 1), (removed, -1)):
+        for recepie_id, related_id in pairs:
+            recepie_deltas[recepie_id] += sign
+            related_deltas[related_id] += sign
+    if recepies:
+        _apply(Recepie, RECEPIE_COUNTERS[field.name], recepie_deltas)
+    if related:
+        _apply(field.related_model, RELATED_COUNTER, related_deltas)
+    return recepie_deltas, related_deltas
@@ -0,0 +1,134 @@
+import http.client
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def percentile(ordered, fraction):
+    return ordered[int(fraction * (len(ordered) - 1))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Load a running server with GET requests and report throughput and '
+        'latency percentiles; run it against gunicorn with app.wsgi and '
+        'then with app.asgi to compare them'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+')
+        parser.add_argument('--token', help='API token to authenticate with')
+        parser.add_argument('--concurrency', default='1,8,32')
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument(
+            '--slow-clients', type=int, default=0,
+            help='Connections trickling an upload to the first URL meanwhile'
+        )
+
+    def handle(self, *args, **options):
+        self.urls = [urlsplit(url) for url in options['urls']]
+        if len({(url.scheme, url.netloc) for url in self.urls}) != 1:
+            raise CommandError('All URLs must be on the same server')
+        self.headers = {}
+        if options['token']:
+            self.headers['Authorization'] = f'Token {options["token"]}'
+
+        stop = threading.Event()
+        slow_clients = [
+            threading.Thread(target=self._slow_client, args=(stop,))
+            for _ in range(options['slow_clients'])
+        ]
+        for client in slow_clients:
+            client.start()
+        try:
+            for concurrency in map(int, options['concurrency'].split(',')):
+                self._run(options['requests'], concurrency)
+        finally:
+            stop.set()
+            for client in slow_clients:
+                client.join()
+
+    def _connect(self):
+        url = self.urls[0]
+        if url.scheme == 'https':
+            return http.client.HTTPSConnection(url.netloc, timeout=60)
+        return http.client.HTTPConnection(url.netloc, timeout=60)
+
+    def _path(self, url):
+        return url.path + (f'?{url.query}' if url.query else '')
+
+    def _client(self, count, offset, latencies, errors):
+        """Send count requests over one keep-alive connection"""
+        connection = self._connect()
+        for i in range(offset, offset + count):
+            url = self.urls[i % len(self.urls)]
+            start = time.perf_counter()
+            try:
+                connection.request(
+                    'GET', self._path(url), headers=self.headers
+                )
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException) as error:
+                errors.append(repr(error))
+                connection.close()
+                connection = self._connect()
+                continue
+            latencies.append(time.perf_counter() - start)
+            if response.status >= 400:
+                errors.append(f'{response.status} {url.path}')
+        connection.close()
+
+    def _slow_client(self, stop):
+        """Hold a connection open, sending an upload a kilobyte at a time"""
+        while not stop.is_set():
+            connection = self._connect()
+            try:
+                connection.putrequest('POST', self._path(self.urls[0]))
+                for name, value in self.headers.items():
+                    connection.putheader(name, value)
+                connection.putheader('Content-Type', 'application/json')
+                connection.putheader('Content-Length', str(1024 * 1024))
+                connection.endheaders()
+                while not stop.wait(0.1):
+                    connection.send(b' ' * 1024)
+            except (OSError, http.client.HTTPException):
+                pass
+            finally:
+                connection.close()
+
+    def _run(self, count, concurrency):
+        latencies, errors = [], []
+        per_client = max(count // concurrency, 1)
+        clients = [
+            threading.Thread(
+                target=self._client,
+                args=(per_client, i * per_client, latencies, errors)
+            )
+            for i in range(concurrency)
+        ]
+        start = time.perf_counter()
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        elapsed = time.perf_counter() - start
+
+        if not latencies:
+            raise CommandError(f'Every request failed: {errors[:1]}')
+        ordered = sorted(latencies)
+        ms = {
+            name: percentile(ordered, fraction) * 1000
+            for name, fraction in (('p50', .5), ('p90', .9), ('p99', .99))
+        }
+        self.stdout.write(
+            f'{concurrency:>4} clients {len(latencies):>6} requests  '
+            f'{len(latencies) / elapsed:8.0f}/s  '
+            f'p50 {ms["p50"]:7.1f}ms  p90 {ms["p90"]:7.1f}ms  '
+            f'p99 {ms["p99"]:7.1f}ms  max {ordered[-1] * 1000:7.1f}ms  '
+            f'{len(errors)} errors'
+        )
+        if errors:
+            self.stdout.write(f'     first error: {errors[0]}')
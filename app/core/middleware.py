@@ -0,0 +1,151 @@
+import re
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/')
+ACCEPT_ENCODING_RE = re.compile(
+    r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*'
+)
+
+
+def accepted_encodings(header):
+    """Return the codings in an Accept-Encoding header the client takes
+
+    Codings given q=0 are refused and left out.
+    """
+    accepted = set()
+    for part in header.split(','):
+        match = ACCEPT_ENCODING_RE.fullmatch(part)
+        if match is None:
+            continue
+        coding, quality = match.groups()
+        try:
+            if quality is not None and float(quality) <= 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(coding.lower())
+    return accepted
+
+
+class GzipCompressor:
+    encoding = 'gzip'
+
+    def __init__(self):
+        # wbits 31 writes a gzip header and trailer around the deflate data
+        self._compressor = zlib.compressobj(
+            settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31
+        )
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        # Emits what is buffered without ending the stream
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliCompressor:
+    encoding = 'br'
+
+    def __init__(self):
+        self._compressor = brotli.Compressor(
+            mode=brotli.MODE_TEXT, quality=settings.COMPRESSION_BROTLI_QUALITY
+        )
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def _compressors():
+    """Return the available compressors, most preferred first"""
+    if brotli is not None:
+        yield BrotliCompressor
+    yield GzipCompressor
+
+
+def compress_stream(compressor, chunks, flush_size):
+    """Compress chunks as they come, flushing every flush_size bytes in
+
+    A flush ends the deflate or brotli block, so flushing every chunk
+    would cost most of the ratio; every flush_size still bounds how much
+    the client waits for.
+    """
+    pending = 0
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        pending += len(chunk)
+        if pending >= flush_size:
+            data += compressor.flush()
+            pending = 0
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Compress JSON and text with brotli or gzip, as the client accepts
+
+    Streamed responses are compressed chunk by chunk and stay streamed.
+    Like GZipMiddleware, a compressed response's ETag is made weak.
+    """
+
+    def process_response(self, request, response):
+        if response.status_code != 200 or \
+                response.has_header('Content-Encoding') or \
+                response.has_header('Content-Range'):
+            return response
+        content_type = response.get('Content-Type', '')
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return response
+        if not response.streaming and \
+                len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = accepted_encodings(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        for compressor_class in _compressors():
+            if compressor_class.encoding in accepted or '*' in accepted:
+                break
+        else:
+            return response
+
+        compressor = compressor_class()
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                compressor, response.streaming_content,
+                settings.COMPRESSION_STREAM_FLUSH_SIZE
+            )
+            del response['Content-Length']
+        else:
+            content = compressor.compress(response.content) + \
+                compressor.finish()
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response['Content-Length'] = str(len(content))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = compressor.encoding
+        return response
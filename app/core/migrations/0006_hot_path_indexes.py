@@ -0,0 +1,70 @@
+from django.db import migrations, models
+
+from core.operations import CreateIndexConcurrently
+
+
+def create_index_concurrently(name, table, columns):
+    """Build an index without locking writes to a large table"""
+    return CreateIndexConcurrently(
+        name, table, ', '.join(f'"{c}"' for c in columns)
+    )
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    atomic = False
+
+    dependencies = [
+        ('core', '0005_recepie_image'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                create_index_concurrently(
+                    'core_tag_user_name_idx',
+                    'core_tag',
+                    ['user_id', 'name', 'id']
+                ),
+                create_index_concurrently(
+                    'core_ingr_user_name_idx',
+                    'core_ingredient',
+                    ['user_id', 'name', 'id']
+                ),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='tag',
+                    index=models.Index(
+                        fields=['user', 'name', 'id'],
+                        name='core_tag_user_name_idx'
+                    ),
+                ),
+                migrations.AddIndex(
+                    model_name='ingredient',
+                    index=models.Index(
+                        fields=['user', 'name', 'id'],
+                        name='core_ingr_user_name_idx'
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='recepie',
+            index=models.Index(
+                fields=['user', 'id'],
+                name='core_recepie_user_id_idx'
+            ),
+        ),
+        create_index_concurrently(
+            'core_recepie_tags_tag_rec_idx',
+            'core_recepie_tags',
+            ['tag_id', 'recepie_id']
+        ),
+        create_index_concurrently(
+            'core_recepie_ingr_ingr_rec_idx',
+            'core_recepie_ingredients',
+            ['ingredient_id', 'recepie_id']
+        ),
+    ]
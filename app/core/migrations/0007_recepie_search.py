@@ -0,0 +1,98 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+from core.operations import CreateIndexConcurrently
+
+
+BACKFILL_BATCH_SIZE = 1000
+SEARCH_CONFIG = 'english'
+
+# The title weighted A, tag and ingredient names B, as recipes were
+# indexed when this migration was written
+BACKFILL_SQL = """
+    UPDATE "core_recepie" AS r SET "search_vector" =
+        setweight(to_tsvector(%(config)s::regconfig,
+                              COALESCE(r."title", '')), 'A')
+        || setweight(to_tsvector(%(config)s::regconfig,
+                                 COALESCE(tags.names, '')), 'B')
+        || setweight(to_tsvector(%(config)s::regconfig,
+                                 COALESCE(ingredients.names, '')), 'B')
+    FROM unnest(%(ids)s) AS ids (id)
+    LEFT JOIN (
+        SELECT l."recepie_id", string_agg(t."name", ' ') AS names
+        FROM "core_recepie_tags" AS l
+        JOIN "core_tag" AS t ON t."id" = l."tag_id"
+        WHERE l."recepie_id" = ANY(%(ids)s)
+        GROUP BY l."recepie_id"
+    ) AS tags ON tags."recepie_id" = ids.id
+    LEFT JOIN (
+        SELECT l."recepie_id", string_agg(i."name", ' ') AS names
+        FROM "core_recepie_ingredients" AS l
+        JOIN "core_ingredient" AS i ON i."id" = l."ingredient_id"
+        WHERE l."recepie_id" = ANY(%(ids)s)
+        GROUP BY l."recepie_id"
+    ) AS ingredients ON ingredients."recepie_id" = ids.id
+    WHERE r."id" = ids.id
+"""
+
+
+def backfill_search_vectors(apps, schema_editor):
+    """Populate the search vector of existing recipes in batches"""
+    Recepie = apps.get_model('core', 'Recepie')
+    last_id = 0
+    while True:
+        ids = list(
+            Recepie.objects.filter(id__gt=last_id).order_by('id')
+            .values_list('id', flat=True)[:BACKFILL_BATCH_SIZE]
+        )
+        if not ids:
+            break
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                BACKFILL_SQL, {'config': SEARCH_CONFIG, 'ids': ids}
+            )
+        last_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    atomic = False
+
+    dependencies = [
+        ('core', '0006_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recepie',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(
+            backfill_search_vectors,
+            migrations.RunPython.noop
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                CreateIndexConcurrently(
+                    'core_recepie_search_idx',
+                    'core_recepie',
+                    '"search_vector"',
+                    method='gin'
+                ),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='recepie',
+                    index=django.contrib.postgres.indexes.GinIndex(
+                        fields=['search_vector'],
+                        name='core_recepie_search_idx'
+                    ),
+                ),
+            ],
+        ),
+    ]
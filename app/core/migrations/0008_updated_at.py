@@ -0,0 +1,66 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+from core.operations import CreateIndexConcurrently
+
+
+def create_index_concurrently(name, table, columns):
+    """Build an index without locking writes to a large table"""
+    return CreateIndexConcurrently(
+        name, table, ', '.join(f'"{c}"' for c in columns)
+    )
+
+
+def add_updated_at(model_name):
+    return migrations.AddField(
+        model_name=model_name,
+        name='updated_at',
+        field=models.DateTimeField(
+            auto_now=True, default=django.utils.timezone.now
+        ),
+        preserve_default=False,
+    )
+
+
+def add_user_updated_index(model_name, name, table):
+    return migrations.SeparateDatabaseAndState(
+        database_operations=[
+            create_index_concurrently(
+                name, table, ['user_id', 'updated_at']
+            ),
+        ],
+        state_operations=[
+            migrations.AddIndex(
+                model_name=model_name,
+                index=models.Index(
+                    fields=['user', 'updated_at'],
+                    name=name
+                ),
+            ),
+        ],
+    )
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    atomic = False
+
+    dependencies = [
+        ('core', '0007_recepie_search'),
+    ]
+
+    operations = [
+        add_updated_at('tag'),
+        add_updated_at('ingredient'),
+        add_updated_at('recepie'),
+        add_user_updated_index(
+            'tag', 'core_tag_user_updated_idx', 'core_tag'
+        ),
+        add_user_updated_index(
+            'ingredient', 'core_ingr_user_updated_idx', 'core_ingredient'
+        ),
+        add_user_updated_index(
+            'recepie', 'core_recepie_user_updated_idx', 'core_recepie'
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 2.1.15 on 2026-10-18 02:28
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from core.operations import CreateIndexConcurrently
+
+
+def add_user_seq_index(model_name, name, table):
+    """Add a (user, change_seq) index without locking a large table"""
+    return migrations.SeparateDatabaseAndState(
+        database_operations=[
+            CreateIndexConcurrently(name, table, '"user_id", "change_seq"'),
+        ],
+        state_operations=[
+            migrations.AddIndex(
+                model_name=model_name,
+                index=models.Index(fields=['user', 'change_seq'], name=name),
+            ),
+        ],
+    )
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    atomic = False
+
+    dependencies = [
+        ('core', '0008_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeSequence',
+            fields=[
+                ('user', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=32)),
+                ('object_id', models.IntegerField()),
+                ('change_seq', models.BigIntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recepie',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        add_user_seq_index(
+            'ingredient', 'core_ingr_user_seq_idx', 'core_ingredient'
+        ),
+        add_user_seq_index(
+            'recepie', 'core_recepie_user_seq_idx', 'core_recepie'
+        ),
+        add_user_seq_index('tag', 'core_tag_user_seq_idx', 'core_tag'),
+        migrations.AddField(
+            model_name='tombstone',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['user', 'change_seq'], name='core_tombstone_user_seq_idx'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+from core.operations import CreateIndexConcurrently
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """Fold each user's same-named tags and ingredients into the oldest one"""
+    Recepie = apps.get_model('core', 'Recepie')
+    for model_name, field in (('Tag', 'tag'), ('Ingredient', 'ingredient')):
+        model = apps.get_model('core', model_name)
+        through = Recepie._meta.get_field(f'{field}s').remote_field.through
+        duplicates = model.objects.values('user', 'name').annotate(
+            rows=Count('id'), keep=Min('id')
+        ).filter(rows__gt=1)
+        for duplicate in duplicates:
+            extra_ids = list(model.objects.filter(
+                user=duplicate['user'], name=duplicate['name']
+            ).exclude(id=duplicate['keep']).values_list('id', flat=True))
+            linked = set(through.objects.filter(
+                **{field: duplicate['keep']}
+            ).values_list('recepie_id', flat=True))
+            relink = set(through.objects.filter(
+                **{f'{field}__in': extra_ids}
+            ).values_list('recepie_id', flat=True)) - linked
+            through.objects.bulk_create([
+                through(**{'recepie_id': recepie_id,
+                           f'{field}_id': duplicate['keep']})
+                for recepie_id in relink
+            ])
+            model.objects.filter(id__in=extra_ids).delete()
+
+
+def add_unique_names(model_name, table):
+    """Add a (user, name) unique constraint without locking a large table"""
+    name = f'{table}_user_name_uniq'
+    return migrations.SeparateDatabaseAndState(
+        database_operations=[
+            CreateIndexConcurrently(
+                name, table, '"user_id", "name"', unique=True
+            ),
+            migrations.RunSQL(
+                sql=f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" '
+                    f'UNIQUE USING INDEX "{name}";',
+                reverse_sql=f'ALTER TABLE "{table}" DROP CONSTRAINT "{name}";',
+            ),
+        ],
+        state_operations=[
+            migrations.AlterUniqueTogether(
+                name=model_name,
+                unique_together={('user', 'name')},
+            ),
+        ],
+    )
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    atomic = False
+
+    dependencies = [
+        ('core', '0009_delta_sync'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_names,
+            migrations.RunPython.noop,
+            atomic=True
+        ),
+        add_unique_names('ingredient', 'core_ingredient'),
+        add_unique_names('tag', 'core_tag'),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 2.1.15 on 2026-10-18 02:55
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_unique_user_names'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recepie',
+            name='image_renditions',
+            field=django.contrib.postgres.fields.jsonb.JSONField(default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recepie',
+            name='image_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], editable=False, max_length=10),
+        ),
+    ]
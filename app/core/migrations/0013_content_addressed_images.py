@@ -0,0 +1,47 @@
+# Generated by Django 2.1.15 on 2026-10-18 03:02
+
+import core.models
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_image_uploads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('ref_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='recepie',
+            name='image',
+            field=models.ImageField(null=True, storage=core.storage.ContentAddressedStorage(), upload_to=core.models.recipe_image_file_path),
+        ),
+        migrations.AddIndex(
+            model_name='storedfile',
+            index=models.Index(fields=['ref_count', 'name'], name='core_storedfile_refs_idx'),
+        ),
+        # Count the files recipes already use, so they are managed too
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO core_storedfile (name, ref_count, updated_at)
+                SELECT name, count(*), now() FROM (
+                    SELECT image AS name FROM core_recepie
+                    WHERE image <> ''
+                    UNION ALL
+                    SELECT value FROM core_recepie,
+                        jsonb_each_text(image_renditions)
+                ) AS refs
+                GROUP BY name
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
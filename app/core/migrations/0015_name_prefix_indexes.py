@@ -0,0 +1,40 @@
+from django.db import migrations
+
+from core.operations import CreateIndexConcurrently
+
+
+def drop_index_concurrently(name):
+    """Drop an index left by an earlier version of 0007, if there is one"""
+    return migrations.RunSQL(
+        sql=f'DROP INDEX CONCURRENTLY IF EXISTS "{name}";',
+        reverse_sql=migrations.RunSQL.noop,
+    )
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    atomic = False
+
+    dependencies = [
+        ('core', '0014_link_counters'),
+    ]
+
+    # ?q= filters on name__istartswith, which compiles to
+    # UPPER("name"::text) LIKE UPPER(%s). Databases migrated before 0007
+    # stopped building trigram indexes on the bare name, which never
+    # served it, lose them here; pg_trgm itself is left installed.
+    operations = [
+        CreateIndexConcurrently(
+            'core_tag_name_prefix_idx',
+            'core_tag',
+            '"user_id", UPPER("name"::text) text_pattern_ops'
+        ),
+        drop_index_concurrently('core_tag_name_trgm_idx'),
+        CreateIndexConcurrently(
+            'core_ingr_name_prefix_idx',
+            'core_ingredient',
+            '"user_id", UPPER("name"::text) text_pattern_ops'
+        ),
+        drop_index_concurrently('core_ingr_name_trgm_idx'),
+    ]
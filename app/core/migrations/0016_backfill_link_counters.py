@@ -0,0 +1,67 @@
+from django.db import migrations
+
+
+BACKFILL_BATCH_SIZE = 1000
+
+# (model, counter, through table, column pointing at the model)
+COUNTERS = (
+    ('Tag', 'recipe_count', 'core_recepie_tags', 'tag_id'),
+    ('Ingredient', 'recipe_count', 'core_recepie_ingredients',
+     'ingredient_id'),
+    ('Recepie', 'tag_count', 'core_recepie_tags', 'recepie_id'),
+    ('Recepie', 'ingredient_count', 'core_recepie_ingredients',
+     'recepie_id'),
+)
+
+COUNT_SQL = """
+    UPDATE "{table}" AS t SET "{counter}" = counts.count
+    FROM (
+        SELECT ids.id, count(l."{column}") AS count
+        FROM unnest(%(ids)s) AS ids (id)
+        LEFT JOIN "{links}" AS l ON l."{column}" = ids.id
+        GROUP BY ids.id
+    ) AS counts
+    WHERE t."id" = counts.id AND t."{counter}" <> counts.count
+"""
+
+
+def backfill_link_counters(apps, schema_editor):
+    """Count the links that already exist, a batch of rows at a time
+
+    Each batch commits on its own, so no lock is held for long. Links
+    changed while it runs are corrected by reconcile_counters.
+    """
+    for model_name, counter, links, column in COUNTERS:
+        model = apps.get_model('core', model_name)
+        sql = COUNT_SQL.format(
+            table=model._meta.db_table, counter=counter, links=links,
+            column=column
+        )
+        last_id = 0
+        while True:
+            ids = list(
+                model.objects.filter(id__gt=last_id).order_by('id')
+                .values_list('id', flat=True)[:BACKFILL_BATCH_SIZE]
+            )
+            if not ids:
+                break
+            with schema_editor.connection.cursor() as cursor:
+                cursor.execute(sql, {'ids': ids})
+            last_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    # Commit each batch instead of the whole backfill at once
+    atomic = False
+
+    dependencies = [
+        ('core', '0015_name_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            backfill_link_counters,
+            migrations.RunPython.noop
+        ),
+    ]
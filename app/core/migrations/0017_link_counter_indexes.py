@@ -0,0 +1,39 @@
+from django.db import migrations, models
+
+from core.operations import CreateIndexConcurrently
+
+
+def add_user_count_index(model_name, name, table):
+    """Add a (user, recipe_count, id) index without locking a large table"""
+    return migrations.SeparateDatabaseAndState(
+        database_operations=[
+            CreateIndexConcurrently(
+                name, table, '"user_id", "recipe_count", "id"'
+            ),
+        ],
+        state_operations=[
+            migrations.AddIndex(
+                model_name=model_name,
+                index=models.Index(
+                    fields=['user', 'recipe_count', 'id'], name=name
+                ),
+            ),
+        ],
+    )
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    atomic = False
+
+    dependencies = [
+        ('core', '0016_backfill_link_counters'),
+    ]
+
+    operations = [
+        add_user_count_index(
+            'ingredient', 'core_ingr_user_count_idx', 'core_ingredient'
+        ),
+        add_user_count_index('tag', 'core_tag_user_count_idx', 'core_tag'),
+    ]
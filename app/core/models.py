@@ -1,15 +1,29 @@
 import uuid
 import os
 
-from django.db import models
+from django.db import connection, models, router, transaction
+from django.db.transaction import TransactionManagementError
+from django.contrib.postgres.fields import JSONField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
                                        PermissionsMixin
 from django.conf import settings
+from django.utils import timezone
+
+from core import passwords
+from core.storage import ContentAddressedStorage
     
                                        
+IMAGE_EXTENSIONS = ('jpg', 'jpeg', 'png', 'gif', 'webp')
+
+
 def recipe_image_file_path(instance, filename):
     """Generate file path for new recipe image"""
-    ext = filename.split('.')[-1]
+    ext = filename.split('.')[-1].lower()
+    # Never let a client-chosen extension decide how the file is served
+    if ext not in IMAGE_EXTENSIONS:
+        ext = 'bin'
     filename = f'{uuid.uuid4()}.{ext}'
 
     return os.path.join('uploads/recipe/', filename)                                    
@@ -48,33 +62,192 @@ class User(AbstractBaseUser, PermissionsMixin):
     
     objects = UserManager()
     
-    USERNAME_FIELD = 'email'                                     
+    USERNAME_FIELD = 'email'
+
+    def set_password(self, raw_password):
+        self.password = passwords.make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        """Check the password under the hashing cap, rehashing if outdated"""
+        valid, outdated = passwords.check_password(
+            raw_password, self.password
+        )
+        if valid and outdated:
+            self.set_password(raw_password)
+            self._password = None
+            self.save(update_fields=['password'])
+        return valid
+
+
+class CounterFieldsMixin:
+    """Leave the counter columns out of saves of existing rows
+
+    Counters only move by F() updates, which saving a copy loaded earlier
+    would otherwise overwrite.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not kwargs.get('force_insert') and \
+                kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and
+                field.attname not in deferred and
+                field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class ChangeSequencedMixin:
+    """Save in one transaction with the change sequence stamped on it
+
+    The owner's sequence row stays locked until the row itself commits,
+    so no sync token can get ahead of a change not yet visible.
+    """
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self
+        )
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
+
+class NamedObjectManager(models.Manager):
+
+    def upsert_names(self, user_id, names):
+        """Return the user's objects with these names, creating missing ones
 
+        Returns ({name: object}, created objects). Existing names are left
+        untouched by the INSERT ... ON CONFLICT and read back afterwards.
+        """
+        names = list(dict.fromkeys(names))
+        if not names:
+            return {}, []
+        table = self.model._meta.db_table
+        # The sequence is taken in the transaction inserting the rows
+        in_transaction = transaction.atomic(savepoint=False)
+        with in_transaction, connection.cursor() as cursor:
+            change_seq = ChangeSequence.objects.next_value(user_id)
+            cursor.execute(
+                f'INSERT INTO {table} '
+                f'(user_id, name, updated_at, change_seq, recipe_count) '
+                f'SELECT %s, name, %s, %s, 0 '
+                f'FROM unnest(%s::varchar[]) AS name '
+                f'ON CONFLICT (user_id, name) DO NOTHING RETURNING id, name',
+                [user_id, timezone.now(), change_seq, names]
+            )
+            created = [
+                self.model.from_db(
+                    self.db,
+                    ['id', 'name', 'user_id', 'change_seq', 'recipe_count'],
+                    [pk, name, user_id, change_seq, 0]
+                )
+                for pk, name in cursor.fetchall()
+            ]
 
-class Tag(models.Model):
+        objects = {obj.name: obj for obj in created}
+        missing = [name for name in names if name not in objects]
+        if missing:
+            objects.update(
+                (obj.name, obj)
+                for obj in self.filter(user_id=user_id, name__in=missing)
+            )
+        return objects, created
+
+
+class Tag(ChangeSequencedMixin, CounterFieldsMixin, models.Model):
     name = models.CharField(max_length=255)
     user = models.ForeignKey(
             settings.AUTH_USER_MODEL,
             on_delete=models.CASCADE,
         )
+    updated_at = models.DateTimeField(auto_now=True)
+    change_seq = models.BigIntegerField(default=0, editable=False)
+    # Recipes linked to the tag, kept by core.counters
+    recipe_count = models.IntegerField(default=0, editable=False)
+
+    objects = NamedObjectManager()
+    counter_fields = ('recipe_count',)
+
+    class Meta:
+        unique_together = ('user', 'name')
+        indexes = [
+            models.Index(
+                fields=['user', 'name', 'id'],
+                name='core_tag_user_name_idx'
+            ),
+            models.Index(
+                fields=['user', 'updated_at'],
+                name='core_tag_user_updated_idx'
+            ),
+            models.Index(
+                fields=['user', 'change_seq'],
+                name='core_tag_user_seq_idx'
+            ),
+            models.Index(
+                fields=['user', 'recipe_count', 'id'],
+                name='core_tag_user_count_idx'
+            ),
+        ]
     
     def __str__(self):
         return self.name
     
 
-class Ingredient(models.Model):
+class Ingredient(ChangeSequencedMixin, CounterFieldsMixin, models.Model):
     """Ingredient to be used in a recipe"""
     name = models.CharField(max_length=255)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    updated_at = models.DateTimeField(auto_now=True)
+    change_seq = models.BigIntegerField(default=0, editable=False)
+    # Recipes using the ingredient, kept by core.counters
+    recipe_count = models.IntegerField(default=0, editable=False)
+
+    objects = NamedObjectManager()
+    counter_fields = ('recipe_count',)
+
+    class Meta:
+        unique_together = ('user', 'name')
+        indexes = [
+            models.Index(
+                fields=['user', 'name', 'id'],
+                name='core_ingr_user_name_idx'
+            ),
+            models.Index(
+                fields=['user', 'updated_at'],
+                name='core_ingr_user_updated_idx'
+            ),
+            models.Index(
+                fields=['user', 'change_seq'],
+                name='core_ingr_user_seq_idx'
+            ),
+            models.Index(
+                fields=['user', 'recipe_count', 'id'],
+                name='core_ingr_user_count_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
     
         
-class Recepie(models.Model):
+class Recepie(ChangeSequencedMixin, CounterFieldsMixin, models.Model):
+    IMAGE_PENDING = 'pending'
+    IMAGE_READY = 'ready'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUS_CHOICES = (
+        (IMAGE_PENDING, 'Pending'),
+        (IMAGE_READY, 'Ready'),
+        (IMAGE_FAILED, 'Failed'),
+    )
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
@@ -85,14 +258,204 @@ class Recepie(models.Model):
     link = models.CharField(max_length=255, blank=True)
     ingredients = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('Tag')
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image = models.ImageField(
+        null=True,
+        upload_to=recipe_image_file_path,
+        storage=ContentAddressedStorage()
+    )
+    image_status = models.CharField(
+        max_length=10, blank=True, editable=False,
+        choices=IMAGE_STATUS_CHOICES
+    )
+    # Storage names of the resized copies of image, keyed by rendition
+    image_renditions = JSONField(default=dict, editable=False)
+    # SHA-256 of the uploaded image, to recognise a repeated upload
+    image_sha256 = models.CharField(
+        max_length=64, blank=True, editable=False
+    )
+    search_vector = SearchVectorField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    change_seq = models.BigIntegerField(default=0, editable=False)
+    # Links to tags and ingredients, kept by core.counters
+    tag_count = models.IntegerField(default=0, editable=False)
+    ingredient_count = models.IntegerField(default=0, editable=False)
+
+    counter_fields = ('tag_count', 'ingredient_count')
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'id'],
+                name='core_recepie_user_id_idx'
+            ),
+            models.Index(
+                fields=['user', 'updated_at'],
+                name='core_recepie_user_updated_idx'
+            ),
+            models.Index(
+                fields=['user', 'change_seq'],
+                name='core_recepie_user_seq_idx'
+            ),
+            GinIndex(
+                fields=['search_vector'],
+                name='core_recepie_search_idx'
+            ),
+        ]
     
     
     def __str__(self):
         return self.title
-    
-    
-      
-                                           
-     
 
+    @staticmethod
+    def file_names(image, image_renditions):
+        """Return the stored files a recipe row with these values uses"""
+        names = [image] if image else []
+        names.extend(image_renditions.values())
+        return names
+
+    def stored_files(self):
+        """Return the names of the stored files this recipe uses"""
+        return self.file_names(self.image.name, self.image_renditions)
+
+
+class StoredFileManager(models.Manager):
+
+    def _adjust(self, deltas):
+        """Add deltas, a {name: change} dict, to the files' counts"""
+        deltas = {name: delta for name, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        table = self.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (name, ref_count, updated_at) '
+                f'SELECT name, delta, %s '
+                f'FROM unnest(%s::varchar[], %s::integer[]) AS v(name, delta) '
+                f'ON CONFLICT (name) DO UPDATE SET '
+                f'ref_count = {table}.ref_count + EXCLUDED.ref_count, '
+                f'updated_at = EXCLUDED.updated_at',
+                [timezone.now(), list(deltas), list(deltas.values())]
+            )
+
+    def replace(self, old_names, new_names):
+        """Move one reference from each of old_names to each of new_names"""
+        deltas = {}
+        for name in new_names:
+            deltas[name] = deltas.get(name, 0) + 1
+        for name in old_names:
+            deltas[name] = deltas.get(name, 0) - 1
+        self._adjust(deltas)
+
+    def retain(self, names):
+        """Count one more reference to each of the named files"""
+        self.replace([], names)
+
+    def release(self, names):
+        """Count one reference less to each of the named files"""
+        self.replace(names, [])
+
+
+class StoredFile(models.Model):
+    """Reference count of a file in content-addressed storage"""
+    name = models.CharField(max_length=255, primary_key=True)
+    ref_count = models.IntegerField(default=0)
+    # Last change of ref_count; unreferenced files get a grace period
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = StoredFileManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['ref_count', 'name'],
+                name='core_storedfile_refs_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.ref_count})'
+
+
+class ImageUpload(models.Model):
+    """A resumable recipe image upload still receiving its chunks"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    recepie = models.ForeignKey('Recepie', on_delete=models.CASCADE)
+    length = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.id} {self.offset}/{self.length}'
+
+
+class ChangeSequenceManager(models.Manager):
+
+    def next_value(self, user_id):
+        """Increment and return the user's change sequence
+
+        The upsert locks the user's counter row until the surrounding
+        transaction ends, so a user's changes commit in sequence order.
+        That transaction must be the one making the change.
+        """
+        if not connection.in_atomic_block:
+            raise TransactionManagementError(
+                'A change sequence must be taken in the transaction of '
+                'the change it numbers.'
+            )
+        table = self.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (user_id, value) VALUES (%s, 1) '
+                f'ON CONFLICT (user_id) DO UPDATE '
+                f'SET value = {table}.value + 1 RETURNING value',
+                [user_id]
+            )
+            return cursor.fetchone()[0]
+
+    def current_value(self, user_id):
+        """Return the user's latest change sequence without incrementing"""
+        return self.filter(user_id=user_id).values_list(
+            'value', flat=True
+        ).first() or 0
+
+
+class ChangeSequence(models.Model):
+    """Per-user counter ordering every change for delta sync"""
+    # No database constraint: deleting a user deletes its objects first,
+    # and their delete signals still advance the counter.
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        db_constraint=False
+    )
+    value = models.BigIntegerField(default=0)
+
+    objects = ChangeSequenceManager()
+
+
+class Tombstone(models.Model):
+    """Record of a deleted recipe, tag or ingredient for delta sync"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_constraint=False
+    )
+    model_name = models.CharField(max_length=32)
+    object_id = models.IntegerField()
+    change_seq = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'change_seq'],
+                name='core_tombstone_user_seq_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.model_name} {self.object_id}'
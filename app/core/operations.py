@@ -0,0 +1,77 @@
+"""Migration operations building indexes without locking large tables
+
+CREATE INDEX CONCURRENTLY cannot run inside a transaction block, so
+migrations using these set atomic = False.
+"""
+from django.db.migrations.operations.base import Operation
+
+INDEX_VALID_SQL = """
+    SELECT i.indisvalid FROM pg_index AS i
+    JOIN pg_class AS c ON c.oid = i.indexrelid
+    WHERE c.relname = %s
+"""
+
+
+def index_valid(schema_editor, name):
+    """Return whether index name is valid, or None when there is none"""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(INDEX_VALID_SQL, [name])
+        row = cursor.fetchone()
+    return None if row is None else row[0]
+
+
+class CreateIndexConcurrently(Operation):
+    """Build an index on table without blocking writes to it
+
+    A build that failed, e.g. on rows inserted meanwhile breaking a
+    unique index, leaves an INVALID index behind. It is dropped and built
+    again, while a valid one left by an earlier run is kept.
+    """
+    reduces_to_sql = False
+    reversible = True
+    atomic = False
+
+    def __init__(self, name, table, expression, method='btree',
+                 unique=False):
+        self.name = name
+        self.table = table
+        self.expression = expression
+        self.method = method
+        self.unique = unique
+
+    def deconstruct(self):
+        kwargs = {
+            'name': self.name,
+            'table': self.table,
+            'expression': self.expression,
+        }
+        if self.method != 'btree':
+            kwargs['method'] = self.method
+        if self.unique:
+            kwargs['unique'] = self.unique
+        return self.__class__.__name__, [], kwargs
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        valid = index_valid(schema_editor, self.name)
+        if valid:
+            return
+        if valid is False:
+            schema_editor.execute(f'DROP INDEX CONCURRENTLY "{self.name}";')
+        unique = 'UNIQUE ' if self.unique else ''
+        schema_editor.execute(
+            f'CREATE {unique}INDEX CONCURRENTLY "{self.name}" '
+            f'ON "{self.table}" USING {self.method} ({self.expression});'
+        )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        schema_editor.execute(
+            f'DROP INDEX CONCURRENTLY IF EXISTS "{self.name}";'
+        )
+
+    def describe(self):
+        return f'Create index {self.name} on {self.table} concurrently'
@@ -0,0 +1,95 @@
+"""A cap on how many passwords are hashed at once
+
+Hashing a password is deliberately slow. Argon2, bcrypt and PBKDF2 all
+release the GIL while they work, so hashes on the request threads run in
+parallel, and the request waits for its hash either way. The cap keeps
+them from piling up on the CPU: a few more requests wait a little for a
+slot, then the rest fail with 503.
+"""
+import threading
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class PasswordHashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many logins at once, try again shortly.'
+    default_code = 'password_hashing_busy'
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Argon2 with the cost set by the PASSWORD_ARGON2_* settings
+
+    Hashes made with other costs are rehashed at the user's next login.
+    """
+    time_cost = settings.PASSWORD_ARGON2_TIME_COST
+    memory_cost = settings.PASSWORD_ARGON2_MEMORY_COST
+    parallelism = settings.PASSWORD_ARGON2_PARALLELISM
+
+
+class HashingPool:
+    """Run at most workers hashing calls at a time, on the calling threads
+
+    queue more callers may wait for a slot, each for up to timeout seconds.
+    """
+
+    def __init__(self, workers=None, queue=None, timeout=None):
+        self.workers = workers or settings.PASSWORD_HASH_WORKERS
+        self.timeout = (
+            settings.PASSWORD_HASH_TIMEOUT if timeout is None else timeout
+        )
+        self._admitted = threading.BoundedSemaphore(self.workers + (
+            settings.PASSWORD_HASH_QUEUE if queue is None else queue
+        ))
+        self._running = threading.BoundedSemaphore(self.workers)
+
+    def run(self, func, *args, **kwargs):
+        """Return func(*args, **kwargs) once a slot is free"""
+        if not self._admitted.acquire(timeout=self.timeout):
+            raise PasswordHashingBusy
+        try:
+            if not self._running.acquire(timeout=self.timeout):
+                raise PasswordHashingBusy
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._running.release()
+        finally:
+            self._admitted.release()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = HashingPool()
+        return _pool
+
+
+def make_password(raw_password):
+    """Return the hash of raw_password, made by the preferred hasher"""
+    if raw_password is None:
+        return hashers.make_password(None)
+    return get_pool().run(hashers.make_password, raw_password)
+
+
+def _check(raw_password, encoded):
+    updates = []
+    return hashers.check_password(raw_password, encoded, updates.append), \
+        bool(updates)
+
+
+def check_password(raw_password, encoded):
+    """Return (whether raw_password matches, whether to rehash it)
+
+    The caller saves any new hash.
+    """
+    return get_pool().run(_check, raw_password, encoded)
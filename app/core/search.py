@@ -0,0 +1,59 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.db import connection
+
+SEARCH_CONFIG = 'english'
+
+RELATED_FIELDS = (('tags', 'tag'), ('ingredients', 'ingredient'))
+
+
+def _related_names(model, name, field, ids):
+    """Return SQL joining the names of the given recipes' related objects"""
+    through = model._meta.get_field(name).remote_field.through
+    return through.objects.filter(recepie_id__in=ids).order_by().values(
+        'recepie_id'
+    ).annotate(
+        names=StringAgg(f'{field}__name', ' ')
+    ).values('recepie_id', 'names').query.sql_with_params()
+
+
+def update_search_vectors(queryset):
+    """Recompute the stored search vector for every recipe in queryset
+
+    Tag and ingredient names are aggregated once for the whole set and
+    joined in, instead of a subquery per recipe, so a large batch stays a
+    few scans even when the planner's statistics lag behind a bulk load.
+    """
+    model = queryset.model
+    qn = connection.ops.quote_name
+    ids = queryset.order_by().values('pk')
+    ids_sql, params = ids.query.sql_with_params()
+    params = list(params)
+
+    # The title is weighted A, tag and ingredient names B
+    vector = "setweight(to_tsvector(%s::regconfig, COALESCE(r.{}, '')), 'A')"
+    vector = vector.format(qn(model._meta.get_field('title').column))
+    vector_params = [SEARCH_CONFIG]
+    joins = []
+    for name, field in RELATED_FIELDS:
+        sql, names_params = _related_names(model, name, field, ids)
+        joins.append(
+            f'LEFT JOIN ({sql}) AS {name} ON {name}.recepie_id = ids.id'
+        )
+        params.extend(names_params)
+        vector += (
+            f" || setweight(to_tsvector(%s::regconfig, "
+            f"COALESCE({name}.names, '')), 'B')"
+        )
+        vector_params.append(SEARCH_CONFIG)
+
+    pk = qn(model._meta.pk.column)
+    column = qn(model._meta.get_field('search_vector').column)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {qn(model._meta.db_table)} AS r '
+            f'SET {column} = {vector} '
+            f'FROM ({ids_sql}) AS ids (id) {" ".join(joins)} '
+            f'WHERE r.{pk} = ids.id',
+            vector_params + params
+        )
+        return cursor.rowcount
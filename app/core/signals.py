@@ -0,0 +1,186 @@
+from django.core.signals import request_started
+from django.db import connections
+from django.db.models.signals import m2m_changed, post_delete, post_save, \
+                                     pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core import counters
+from core.models import Tag, Ingredient, Recepie, ChangeSequence, \
+    StoredFile, Tombstone
+from core.search import update_search_vectors
+
+
+def _reindex(recepie_ids):
+    """Recompute the search vector of the given recipes"""
+    if recepie_ids:
+        update_search_vectors(Recepie.objects.filter(id__in=recepie_ids))
+
+
+def _touch(user_id, recepie_ids):
+    """Mark the given recipes as modified now"""
+    if recepie_ids:
+        Recepie.objects.filter(id__in=recepie_ids).update(
+            updated_at=timezone.now(),
+            change_seq=ChangeSequence.objects.next_value(user_id)
+        )
+
+
+def _linked_recepie_ids(instance):
+    """Return the ids of recipes linked to a tag or ingredient"""
+    return list(instance.recepie_set.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Recepie)
+def reindex_saved_recepie(sender, instance, raw=False, **kwargs):
+    """Keep a recipe's search vector current when it is saved"""
+    if not raw:
+        _reindex([instance.pk])
+
+
+@receiver(m2m_changed, sender=Recepie.tags.through)
+@receiver(m2m_changed, sender=Recepie.ingredients.through)
+def refresh_relinked_recepies(sender, instance, action, reverse, pk_set,
+                              **kwargs):
+    """Reindex and touch recipes whose tags or ingredients changed"""
+    if action == 'pre_clear' and reverse:
+        instance._cleared_recepie_ids = _linked_recepie_ids(instance)
+        return
+    if action in ('post_add', 'post_remove'):
+        recepie_ids = pk_set if reverse else [instance.pk]
+    elif action == 'post_clear':
+        recepie_ids = (
+            instance._cleared_recepie_ids if reverse else [instance.pk]
+        )
+    else:
+        return
+
+    _reindex(recepie_ids)
+    _touch(instance.user_id, recepie_ids)
+
+
+@receiver(m2m_changed, sender=Recepie.tags.through)
+@receiver(m2m_changed, sender=Recepie.ingredients.through)
+def count_relinked(sender, instance, action, reverse, pk_set, **kwargs):
+    """Move the link counters of both sides as links are added or removed
+
+    Removals are counted before the delete, from the links that exist;
+    pk_set may name objects that were never linked.
+    """
+    field = counters.link_field(sender)
+    source, target = counters.link_columns(field)
+    column = target if reverse else source
+    if action == 'post_add':
+        pairs = [
+            (pk, instance.pk) if reverse else (instance.pk, pk)
+            for pk in pk_set
+        ]
+        deltas = counters.count_links(field, added=pairs)
+    elif action in ('pre_remove', 'pre_clear'):
+        filters = {column: instance.pk}
+        if action == 'pre_remove':
+            filters[f'{source if reverse else target}__in'] = pk_set
+        deltas = counters.count_links(
+            field, removed=counters.links(field, **filters)
+        )
+    else:
+        return
+
+    # Keep the instance's own counter current, unless it was never loaded
+    recepie_deltas, related_deltas = deltas
+    if reverse:
+        counter, delta = counters.RELATED_COUNTER, related_deltas
+    else:
+        counter = counters.RECEPIE_COUNTERS[field.name]
+        delta = recepie_deltas
+    if counter not in instance.get_deferred_fields():
+        setattr(
+            instance, counter, getattr(instance, counter) + delta[instance.pk]
+        )
+
+
+@receiver(pre_delete, sender=Recepie)
+def count_deleted_recepie_links(sender, instance, **kwargs):
+    """Uncount a deleted recipe from its tags and ingredients"""
+    for field in Recepie._meta.many_to_many:
+        source, target = counters.link_columns(field)
+        counters.count_links(
+            field, removed=counters.links(field, **{source: instance.pk}),
+            recepies=False
+        )
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def count_deleted_attr_links(sender, instance, **kwargs):
+    """Uncount a deleted tag or ingredient from its recipes"""
+    for field in Recepie._meta.many_to_many:
+        if field.related_model is sender:
+            source, target = counters.link_columns(field)
+            counters.count_links(
+                field,
+                removed=counters.links(field, **{target: instance.pk}),
+                related=False
+            )
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def reindex_renamed_attr(sender, instance, created, raw=False, **kwargs):
+    """Reindex recipes using a tag or ingredient after it is renamed"""
+    if not created and not raw:
+        _reindex(_linked_recepie_ids(instance))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def collect_deleted_attr_recepies(sender, instance, **kwargs):
+    """Remember the recipes linked to a tag or ingredient being deleted"""
+    instance._deleted_recepie_ids = _linked_recepie_ids(instance)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def refresh_deleted_attr_recepies(sender, instance, **kwargs):
+    """Reindex and touch recipes that lost a deleted tag or ingredient"""
+    recepie_ids = getattr(instance, '_deleted_recepie_ids', [])
+    _reindex(recepie_ids)
+    _touch(instance.user_id, recepie_ids)
+
+
+@receiver(pre_save, sender=Tag)
+@receiver(pre_save, sender=Ingredient)
+@receiver(pre_save, sender=Recepie)
+def sequence_saved_object(sender, instance, raw=False, **kwargs):
+    """Stamp a saved object with its owner's next change sequence"""
+    if not raw:
+        instance.change_seq = ChangeSequence.objects.next_value(
+            instance.user_id
+        )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=Recepie)
+def record_tombstone(sender, instance, **kwargs):
+    """Leave a tombstone so delta sync can report the delete"""
+    Tombstone.objects.create(
+        user_id=instance.user_id,
+        model_name=sender._meta.model_name,
+        object_id=instance.pk,
+        change_seq=ChangeSequence.objects.next_value(instance.user_id)
+    )
+
+
+@receiver(post_delete, sender=Recepie)
+def release_deleted_recepie_files(sender, instance, **kwargs):
+    """Drop a deleted recipe's references to its stored image files"""
+    StoredFile.objects.release(instance.stored_files())
+
+
+@receiver(request_started)
+def check_reused_connections(sender, **kwargs):
+    """Have persistent connections checked before a request reuses them"""
+    for connection in connections.all():
+        if hasattr(connection, 'check_health_on_next_use'):
+            connection.check_health_on_next_use()
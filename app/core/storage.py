@@ -0,0 +1,59 @@
+import hashlib
+import os
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def content_sha256(content):
+    """Return the SHA-256 of a file, reading it in chunks"""
+    digest = getattr(content, 'sha256', None)
+    if digest:
+        return digest
+    sha256 = hashlib.sha256()
+    content.seek(0)
+    for chunk in iter(lambda: content.read(HASH_CHUNK_SIZE), b''):
+        sha256.update(chunk)
+    content.seek(0)
+    return sha256.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Store each distinct file once, named by the SHA-256 of its content
+
+    Names look like images/ab/cd/abcd...ef.jpg, whatever name the caller
+    asked for; only its extension is kept. Saving bytes that are already
+    stored writes nothing and returns the existing name. Files are never
+    deleted on behalf of one user; StoredFile counts their references and
+    the gc_images command removes the unreferenced ones.
+    """
+    prefix = 'images'
+
+    def content_name(self, digest, ext):
+        """Return the name of the file whose content hashes to digest"""
+        return '/'.join((self.prefix, digest[:2], digest[2:4], digest + ext))
+
+    def get_available_name(self, name, max_length=None):
+        # Equal names mean equal content, so an existing file is reused
+        return name
+
+    def _save(self, name, content):
+        ext = os.path.splitext(name)[1].lower()
+        name = self.content_name(content_sha256(content), ext)
+        full_path = self.path(name)
+        try:
+            # Tell the garbage collector the file is wanted again. It
+            # renames a file away before checking this, so the file is
+            # either seen as wanted or already gone and written again.
+            os.utime(full_path)
+            return name
+        except FileNotFoundError:
+            pass
+        # Write under a unique name and rename, so concurrent saves of the
+        # same content never expose a partly written file
+        temp_name = f'{name}.{uuid.uuid4().hex}.tmp'
+        super()._save(temp_name, content)
+        os.replace(self.path(temp_name), full_path)
+        return name
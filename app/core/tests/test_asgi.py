@@ -0,0 +1,60 @@
+import asyncio
+
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from app.asgi import application
+
+
+def call(scope, messages):
+    """Run the ASGI application on one request, returning what it sent"""
+    sent = []
+    incoming = list(messages)
+
+    async def receive():
+        return incoming.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        'type': 'http', 'http_version': '1.1', 'scheme': 'http',
+        'query_string': b'', 'headers': [(b'host', b'testserver')],
+        **scope,
+    }
+    asyncio.new_event_loop().run_until_complete(
+        application(scope, receive, send)
+    )
+    return sent
+
+
+class AsgiApplicationTests(SimpleTestCase):
+    """Test serving the API through the ASGI entry point"""
+
+    def test_request_served(self):
+        """Test a request runs through Django and its response is sent"""
+        sent = call(
+            {'method': 'GET', 'path': reverse('user:me')},
+            [{'type': 'http.request', 'body': b''}]
+        )
+
+        self.assertEqual(sent[0]['type'], 'http.response.start')
+        self.assertEqual(sent[0]['status'], 401)
+        self.assertEqual(sent[-1], {'type': 'http.response.body'})
+
+    def test_disconnect_before_body_ignored(self):
+        """Test a client leaving mid-upload gets no response or error"""
+        sent = call(
+            {'method': 'POST', 'path': reverse('user:create')},
+            [
+                {'type': 'http.request', 'body': b'{', 'more_body': True},
+                {'type': 'http.disconnect'},
+            ]
+        )
+
+        self.assertEqual(sent, [])
+
+    def test_websocket_scope_rejected(self):
+        """Test a non-HTTP scope is refused rather than failing on a key"""
+        with self.assertRaisesMessage(ValueError, 'non-HTTP scope'):
+            call({'type': 'websocket', 'path': '/'}, [])
@@ -0,0 +1,98 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from core.models import Ingredient, Recepie, Tag
+
+
+class LinkCounterTests(TestCase):
+    """Test the link counters follow many-to-many changes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'counters@test.com', 'testpass'
+        )
+        self.tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('Vegan', 'Quick', 'Spicy')
+        ]
+        self.salt = Ingredient.objects.create(user=self.user, name='Salt')
+        self.recepie = Recepie.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price=1
+        )
+
+    def assertCounts(self, tag_count, recipe_counts):
+        self.recepie.refresh_from_db()
+        self.assertEqual(self.recepie.tag_count, tag_count)
+        self.assertEqual(
+            [tag.recipe_count for tag in Tag.objects.order_by('id')],
+            recipe_counts
+        )
+
+    def test_add_remove_clear(self):
+        """Test adding, removing and clearing links from the recipe side"""
+        self.recepie.tags.add(*self.tags[:2])
+        self.assertEqual(self.recepie.tag_count, 2)
+        self.assertCounts(2, [1, 1, 0])
+
+        # Removing a tag that is not linked changes nothing
+        self.recepie.tags.remove(self.tags[0], self.tags[2])
+        self.assertEqual(self.recepie.tag_count, 1)
+        self.assertCounts(1, [0, 1, 0])
+
+        self.recepie.tags.set(self.tags)
+        self.assertCounts(3, [1, 1, 1])
+
+        self.recepie.tags.clear()
+        self.assertEqual(self.recepie.tag_count, 0)
+        self.assertCounts(0, [0, 0, 0])
+
+    def test_reverse_changes(self):
+        """Test links changed from the tag side count on both sides"""
+        other = Recepie.objects.create(
+            user=self.user, title='Salad', time_minutes=5, price=1
+        )
+        tag = self.tags[0]
+        tag.recepie_set.add(self.recepie, other)
+        self.assertEqual(tag.recipe_count, 2)
+        self.assertCounts(1, [2, 0, 0])
+
+        tag.recepie_set.remove(other)
+        self.assertCounts(1, [1, 0, 0])
+
+        tag.recepie_set.clear()
+        self.assertEqual(tag.recipe_count, 0)
+        self.assertCounts(0, [0, 0, 0])
+
+    def test_deletes_uncount(self):
+        """Test deleting either side uncounts it from the other"""
+        self.recepie.tags.add(*self.tags)
+        self.recepie.ingredients.add(self.salt)
+        self.tags[0].delete()
+        self.assertCounts(2, [1, 1])
+
+        self.recepie.delete()
+
+        self.assertEqual(
+            list(Tag.objects.values_list('recipe_count', flat=True)), [0, 0]
+        )
+        self.salt.refresh_from_db()
+        self.assertEqual(self.salt.recipe_count, 0)
+
+    def test_save_keeps_counters(self):
+        """Test saving a copy loaded earlier leaves the counters alone"""
+        stale = Tag.objects.get(pk=self.tags[0].pk)
+        self.recepie.tags.add(self.tags[0])
+
+        stale.name = 'Vegetarian'
+        stale.save()
+
+        stale.refresh_from_db()
+        self.assertEqual(stale.name, 'Vegetarian')
+        self.assertEqual(stale.recipe_count, 1)
+
+    def test_upserted_names_counted_from_zero(self):
+        """Test objects created by name start with no recipes"""
+        objects, created = Tag.objects.upsert_names(self.user.pk, ['New'])
+
+        self.assertEqual(objects['New'].recipe_count, 0)
+        self.assertEqual(Tag.objects.get(name='New').recipe_count, 0)
@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.backends.postgresql.base import stats
+
+DB_STATS_URL = reverse('recepie:db-stats')
+
+
+class DatabaseBackendTests(TestCase):
+    """Test checking and counting database connections"""
+
+    def setUp(self):
+        self.wrapper = connection.copy()
+
+    def tearDown(self):
+        self.wrapper.close()
+
+    def test_connections_counted(self):
+        """Test opening and closing a connection is counted"""
+        before = stats.as_dict()
+
+        self.wrapper.ensure_connection()
+        self.wrapper.close()
+
+        after = stats.as_dict()
+        self.assertEqual(after['opened'], before['opened'] + 1)
+        self.assertEqual(after['closed'], before['closed'] + 1)
+        self.assertGreater(after['connect_seconds_total'],
+                           before['connect_seconds_total'])
+
+    def test_dead_connection_replaced(self):
+        """Test a reused connection that was dropped is reopened"""
+        self.wrapper.ensure_connection()
+        self.wrapper.connection.close()
+        failures = stats.as_dict()['failed_health_checks']
+
+        self.wrapper.check_health_on_next_use()
+        with self.wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+        self.assertEqual(stats.as_dict()['failed_health_checks'],
+                         failures + 1)
+
+    @override_settings(DB_CONN_HEALTH_CHECKS=False)
+    def test_health_checks_disabled(self):
+        """Test no check is run when health checks are turned off"""
+        self.wrapper.ensure_connection()
+
+        self.wrapper.check_health_on_next_use()
+
+        self.assertFalse(self.wrapper.health_check_pending)
+
+    def test_db_stats_admin_only(self):
+        """Test connection metrics are exposed to staff only"""
+        user = get_user_model().objects.create_user(
+            email='test@test.com', password='testpass'
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        res = client.get(DB_STATS_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        user.is_staff = True
+        user.save()
+        res = client.get(DB_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('open', res.data['process'])
+        self.assertGreaterEqual(res.data['server']['active'], 1)
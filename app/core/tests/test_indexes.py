@@ -0,0 +1,131 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+
+from core.models import Tag, Ingredient, Recepie
+
+
+def explain(queryset):
+    """Return the Postgres query plan for a queryset as text"""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN ' + sql, params)
+        return '\n'.join(row[0] for row in cursor.fetchall())
+
+
+class HotPathIndexTests(TestCase):
+    """Test the per-user API queries are served by indexes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            'index@gmail.com',
+            'testpass'
+        )
+        # Give the planner enough rows, mostly owned by someone else, that
+        # with its default settings a selective, ordered index scan is the
+        # cheapest plan
+        other = get_user_model().objects.create_user(
+            'other@gmail.com',
+            'testpass'
+        )
+        # Interleaved as users' rows are, so no user's rows are packed
+        # together on disk
+        rows = [
+            row for n in range(3000) for row in (
+                (n, cls.user), *((f'{n}.{k}', other) for k in range(10))
+            )
+        ]
+        # A third of them linked to no recipe
+        Tag.objects.bulk_create((
+            Tag(user=owner, name=f'Tag {n}', recipe_count=i % 3)
+            for i, (n, owner) in enumerate(rows)
+        ), batch_size=5000)
+        Ingredient.objects.bulk_create((
+            Ingredient(user=owner, name=f'Ingr {n}', recipe_count=i % 3)
+            for i, (n, owner) in enumerate(rows)
+        ), batch_size=5000)
+        Recepie.objects.bulk_create((
+            Recepie(user=owner, title=f'Recepie {n}', time_minutes=5,
+                    price=1.00)
+            for n, owner in rows
+        ), batch_size=5000)
+        with connection.cursor() as cursor:
+            for model in (Tag, Ingredient, Recepie):
+                cursor.execute(f'ANALYZE "{model._meta.db_table}"')
+
+    def assertIndexScan(self, queryset, index_name=None):
+        plan = explain(queryset)
+        self.assertNotIn('Seq Scan', plan)
+        if index_name:
+            self.assertIn(index_name, plan)
+
+    def test_tag_list_uses_user_name_index(self):
+        """Test tags are listed through the (user, name) index"""
+        queryset = Tag.objects.filter(
+            user=self.user
+        ).order_by('-name', '-id')[:100]
+
+        self.assertIndexScan(queryset, 'core_tag_user_name_idx')
+
+    def test_ingredient_list_uses_user_name_index(self):
+        """Test ingredients are listed through the (user, name) index"""
+        queryset = Ingredient.objects.filter(
+            user=self.user
+        ).order_by('-name', '-id')[:100]
+
+        self.assertIndexScan(queryset, 'core_ingr_user_name_idx')
+
+    def test_tag_prefix_search_uses_name_prefix_index(self):
+        """Test ?q= on tags probes the (user, UPPER(name)) index"""
+        queryset = Tag.objects.filter(
+            user=self.user, name__istartswith='tag 123'
+        ).order_by('-name', '-id')[:100]
+
+        self.assertIndexScan(queryset, 'core_tag_name_prefix_idx')
+
+    def test_ingredient_prefix_search_uses_name_prefix_index(self):
+        """Test ?q= on ingredients probes the (user, UPPER(name)) index"""
+        queryset = Ingredient.objects.filter(
+            user=self.user, name__istartswith='ingr 123'
+        ).order_by('-name', '-id')[:100]
+
+        self.assertIndexScan(queryset, 'core_ingr_name_prefix_idx')
+
+    def test_recepie_list_uses_user_id_index(self):
+        """Test recipes are listed through the (user, id) index"""
+        queryset = Recepie.objects.filter(user=self.user).order_by('-id')[:100]
+
+        self.assertIndexScan(queryset, 'core_recepie_user_id_idx')
+
+    def test_assigned_tags_use_user_name_index(self):
+        """Test assigned-only tags are listed through the (user, name) index"""
+        queryset = Tag.objects.filter(
+            user=self.user, recipe_count__gt=0
+        ).order_by('-name', '-id')[:100]
+
+        self.assertIndexScan(queryset, 'core_tag_user_name_idx')
+
+    def test_assigned_ingredients_use_user_name_index(self):
+        """Test assigned-only ingredients are read through (user, name)"""
+        queryset = Ingredient.objects.filter(
+            user=self.user, recipe_count__gt=0
+        ).order_by('-name', '-id')[:100]
+
+        self.assertIndexScan(queryset, 'core_ingr_user_name_idx')
+
+    def test_popular_tags_use_count_index(self):
+        """Test tags sorted by popularity come from the count index"""
+        queryset = Tag.objects.filter(
+            user=self.user
+        ).order_by('-recipe_count', '-id')[:100]
+
+        self.assertIndexScan(queryset, 'core_tag_user_count_idx')
+
+    def test_popular_ingredients_use_count_index(self):
+        """Test ingredients sorted by popularity come from the count index"""
+        queryset = Ingredient.objects.filter(
+            user=self.user
+        ).order_by('-recipe_count', '-id')[:100]
+
+        self.assertIndexScan(queryset, 'core_ingr_user_count_idx')
@@ -1,5 +1,6 @@
 from unittest.mock import patch
-from django.test import TestCase
+from django.db.transaction import TransactionManagementError
+from django.test import TestCase, TransactionTestCase
 from django.contrib.auth import get_user_model
 
 from core import models
@@ -79,5 +80,43 @@ class ModelTests(TestCase):
 
         exp_path = f'uploads/recipe/{uuid}.jpg'
         self.assertEqual(file_path, exp_path)
-        
-    
\ No newline at end of file
+
+    def test_recepie_updated_at_touched_by_tag_changes(self):
+        """Test linking a tag marks the recipe as modified"""
+        user = sample_user()
+        recepie = models.Recepie.objects.create(
+            user=user,
+            title='Steak and mushroom sauce',
+            time_minutes=5,
+            price=22.00
+        )
+        before = recepie.updated_at
+
+        recepie.tags.add(models.Tag.objects.create(user=user, name='Meat'))
+
+        recepie.refresh_from_db()
+        self.assertGreater(recepie.updated_at, before)
+
+
+class ChangeSequenceTests(TransactionTestCase):
+    """Test change sequences are taken in the transaction of the change"""
+
+    def test_save_outside_transaction_is_sequenced(self):
+        """Test a save under autocommit takes its sequence in its own"""
+        user = sample_user()
+
+        tag = models.Tag.objects.create(user=user, name='Vegan')
+        tags, created = models.Tag.objects.upsert_names(user.id, ['Salty'])
+
+        self.assertEqual(tag.change_seq, 1)
+        self.assertEqual(created[0].change_seq, 2)
+        self.assertEqual(
+            models.ChangeSequence.objects.current_value(user.id), 2
+        )
+
+    def test_sequence_outside_transaction_rejected(self):
+        """Test a sequence cannot be committed apart from its change"""
+        user = sample_user()
+
+        with self.assertRaises(TransactionManagementError):
+            models.ChangeSequence.objects.next_value(user.id)
@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, connection
+from django.test import TransactionTestCase
+
+from core.models import Recepie
+from core.operations import CreateIndexConcurrently, index_valid
+
+INDEX = 'core_recepie_title_test_idx'
+
+
+class CreateIndexConcurrentlyTests(TransactionTestCase):
+    """Test concurrent index builds recover from failed earlier runs"""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            'index@test.com', 'testpass'
+        )
+        self.recepies = [
+            Recepie.objects.create(
+                user=user, title='Same', time_minutes=1, price=1
+            )
+            for _ in range(2)
+        ]
+        self.operation = CreateIndexConcurrently(
+            INDEX, 'core_recepie', '"title"', unique=True
+        )
+
+    def tearDown(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP INDEX IF EXISTS "{INDEX}"')
+
+    def build(self):
+        with connection.schema_editor(atomic=False) as editor:
+            self.operation.database_forwards('core', editor, None, None)
+            return index_valid(editor, INDEX)
+
+    def test_invalid_index_rebuilt(self):
+        """Test an index left INVALID by a failed build is built again"""
+        with self.assertRaises(DatabaseError):
+            self.build()
+        with connection.schema_editor(atomic=False) as editor:
+            self.assertIs(index_valid(editor, INDEX), False)
+
+        self.recepies[1].delete()
+
+        self.assertIs(self.build(), True)
+
+    def test_valid_index_kept(self):
+        """Test a valid index from an earlier run is not built again"""
+        self.recepies[1].delete()
+        self.build()
+
+        self.assertIs(self.build(), True)
@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import TestCase
+
+from core.models import StoredFile
+from core.storage import ContentAddressedStorage
+
+
+class ContentAddressedStorageTests(TestCase):
+    """Test files are stored once per distinct content"""
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.storage = ContentAddressedStorage(location=self.location)
+
+    def tearDown(self):
+        shutil.rmtree(self.location)
+
+    def test_same_content_stored_once(self):
+        """Test saving equal bytes twice returns one sharded name"""
+        first = self.storage.save('a.JPG', ContentFile(b'photo'))
+        second = self.storage.save('b.jpg', ContentFile(b'photo'))
+
+        self.assertEqual(first, second)
+        digest = first.split('/')[-1][:-4]
+        self.assertEqual(
+            first, f'images/{digest[:2]}/{digest[2:4]}/{digest}.jpg'
+        )
+        self.assertEqual(
+            os.listdir(os.path.dirname(self.storage.path(first))),
+            [f'{digest}.jpg']
+        )
+
+    def test_different_content_stored_apart(self):
+        """Test different bytes get different names"""
+        first = self.storage.save('a.jpg', ContentFile(b'photo'))
+        second = self.storage.save('a.jpg', ContentFile(b'other'))
+
+        self.assertNotEqual(first, second)
+        with self.storage.open(second) as f:
+            self.assertEqual(f.read(), b'other')
+
+
+class StoredFileTests(TestCase):
+    """Test reference counting of stored files"""
+
+    def test_replace_moves_references(self):
+        """Test one reference moves from each old name to each new one"""
+        StoredFile.objects.retain(['a', 'b', 'b'])
+
+        StoredFile.objects.replace(['a', 'b'], ['b', 'c'])
+
+        self.assertEqual(
+            dict(StoredFile.objects.values_list('name', 'ref_count')),
+            {'a': 0, 'b': 2, 'c': 1}
+        )
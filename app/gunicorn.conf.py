@@ -0,0 +1,44 @@
+"""Gunicorn settings for production; every value can be set from the env
+
+WSGI, a process per core with a few threads each:
+    gunicorn app.wsgi:application
+ASGI, an event loop per process handling connections and request bodies,
+with the threads configured by ASGI_READ_THREADS and ASGI_WRITE_THREADS:
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker \\
+        gunicorn app.asgi:application
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(
+    os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1)
+)
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+# Threads per worker; only used by the gthread worker
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Seconds an idle keep-alive connection stays open. Keep it below the idle
+# timeout of any load balancer in front, or it may reuse a closed socket.
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+# Workers silent for longer are killed and replaced
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+# Recycle workers now and then so slow leaks cannot build up
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+backlog = int(os.environ.get('GUNICORN_BACKLOG', 2048))
+
+limit_request_line = 8190
+limit_request_fields = 100
+limit_request_field_size = 8190
+
+# Heartbeat files on tmpfs; a disk-backed /tmp can stall workers in Docker
+worker_tmp_dir = os.environ.get('GUNICORN_WORKER_TMP_DIR', '/dev/shm')
+# Trust X-Forwarded-* only from the proxy in front
+forwarded_allow_ips = os.environ.get(
+    'GUNICORN_FORWARDED_ALLOW_IPS', '127.0.0.1'
+)
+
+accesslog = os.environ.get('GUNICORN_ACCESSLOG', '-')
+errorlog = '-'
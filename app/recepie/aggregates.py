@@ -0,0 +1,138 @@
+"""Recipe statistics computed by the database
+
+Five queries serve any number of recipes: one for counts, averages,
+bounds and percentiles of both measures, one histogram per measure and
+one count per tag and per ingredient used. tags and ingredients list the
+RECEPIE_STATS_TOP most used, and tag_counts and ingredient_counts every
+one used, from the same query.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
+from django.db.models import Aggregate, Avg, Count, F, FloatField, Func, \
+    IntegerField, Max, Min, Value
+from django.db.models.functions import Least
+
+from core.models import Recepie
+
+PERCENTILES = (0.25, 0.5, 0.75, 0.9)
+MEASURES = ('time_minutes', 'price')
+CENT = Decimal('0.01')
+
+
+class Percentiles(Aggregate):
+    """PostgreSQL percentile_cont of several fractions in one pass"""
+    function = 'percentile_cont'
+    template = (
+        '%(function)s(ARRAY[%(fractions)s]) '
+        'WITHIN GROUP (ORDER BY %(expressions)s)'
+    )
+
+    def __init__(self, expression, fractions, **extra):
+        super().__init__(
+            expression,
+            fractions=', '.join(str(float(f)) for f in fractions),
+            output_field=ArrayField(FloatField()),
+            **extra
+        )
+
+
+class WidthBucket(Func):
+    """The 1-based bucket of value among count equal ones from low to high"""
+    function = 'width_bucket'
+    output_field = IntegerField()
+
+
+def _round(name, value):
+    if value is None:
+        return None
+    if name == 'price':
+        return Decimal(value).quantize(CENT)
+    return round(float(value), 2)
+
+
+def _summary(queryset):
+    """Return the count and each measure's summary, in one query"""
+    aggregates = {'count': Count('id')}
+    for name in MEASURES:
+        aggregates.update({
+            f'{name}_avg': Avg(name),
+            f'{name}_min': Min(name),
+            f'{name}_max': Max(name),
+            f'{name}_percentiles': Percentiles(name, PERCENTILES),
+        })
+    row = queryset.aggregate(**aggregates)
+
+    summary = {}
+    for name in MEASURES:
+        percentiles = row[f'{name}_percentiles'] or [None] * len(PERCENTILES)
+        summary[name] = {
+            'avg': _round(name, row[f'{name}_avg']),
+            'min': row[f'{name}_min'],
+            'max': row[f'{name}_max'],
+            'percentiles': {
+                f'p{round(fraction * 100)}': _round(name, value)
+                for fraction, value in zip(PERCENTILES, percentiles)
+            },
+        }
+    return row['count'], summary
+
+
+def _histogram(queryset, name, low, high, buckets):
+    """Return buckets equal-width [from, to) counts of name over queryset
+
+    The highest value is counted in the last bucket.
+    """
+    if low == high:
+        return [{'from': low, 'to': high, 'count': queryset.count()}]
+
+    counts = dict(queryset.annotate(bucket=Least(
+        WidthBucket(F(name), Value(low), Value(high), Value(buckets)),
+        Value(buckets)
+    )).values('bucket').annotate(count=Count('id')).values_list(
+        'bucket', 'count'
+    ))
+    width = (high - low) / buckets
+    return [{
+        'from': _round(name, low + width * i),
+        'to': _round(name, low + width * (i + 1)),
+        'count': counts.get(i + 1, 0),
+    } for i in range(buckets)]
+
+
+def _usage(queryset, m2m):
+    """Return the related objects used, the most used first, with counts"""
+    field = m2m.m2m_reverse_field_name()
+    columns = (f'{field}_id', f'{field}__name')
+    rows = m2m.remote_field.through.objects.filter(
+        recepie__in=queryset.values('id')
+    ).values(*columns).annotate(count=Count('id')).order_by(
+        '-count', f'{field}__name', f'{field}_id'
+    ).values_list(*columns, 'count')
+    return [
+        {'id': related_id, 'name': name, 'count': count}
+        for related_id, name, count in rows
+    ]
+
+
+def recepie_stats(queryset):
+    """Return statistics over the recipes in queryset"""
+    queryset = queryset.order_by()
+    buckets = settings.RECEPIE_STATS_BUCKETS
+    top = settings.RECEPIE_STATS_TOP
+    count, summary = _summary(queryset)
+    for name, measure in summary.items():
+        measure['histogram'] = _histogram(
+            queryset, name, measure['min'], measure['max'], buckets
+        ) if count else []
+    stats = {'count': count, **summary}
+    for name, counts_name in (
+        ('tags', 'tag_counts'), ('ingredients', 'ingredient_counts')
+    ):
+        usage = _usage(
+            queryset, Recepie._meta.get_field(name)
+        ) if count else []
+        stats[name] = usage[:top]
+        stats[counts_name] = usage
+    return stats
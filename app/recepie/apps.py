@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class RecepieConfig(AppConfig):
     name = 'recepie'
+
+    def ready(self):
+        from recepie import signals  # noqa: F401
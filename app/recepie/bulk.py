@@ -0,0 +1,405 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from core import counters
+from core.models import Recepie, ChangeSequence, ImageUpload, \
+    StoredFile, Tombstone
+from core.search import update_search_vectors
+
+from recepie import uploads
+from recepie.cache import invalidate_user
+from recepie.fields import UserManyRelatedField, save_new_objects
+
+BATCH_SIZE = 1000
+
+
+def _link_fields(model):
+    """Return (name, related model, through, source, target) per m2m field
+
+    source and target are the through model's columns pointing at model
+    and at the related model.
+    """
+    return [
+        (
+            field.name,
+            field.related_model,
+            field.remote_field.through,
+            f'{field.m2m_field_name()}_id',
+            f'{field.m2m_reverse_field_name()}_id',
+        )
+        for field in model._meta.many_to_many
+    ]
+
+
+def _linked_recepie_ids(model, ids):
+    """Return the ids of recipes linked to the given tags or ingredients"""
+    for name, related, through, source, target in _link_fields(Recepie):
+        if related is model:
+            return list(through.objects.filter(
+                **{f'{target}__in': ids}
+            ).values_list(source, flat=True).distinct())
+    return []
+
+
+def _reindex(model, ids):
+    """Recompute the search vectors affected by writing the given objects"""
+    if model is not Recepie:
+        ids = _linked_recepie_ids(model, ids)
+    if ids:
+        update_search_vectors(Recepie.objects.filter(id__in=ids))
+
+
+def bulk_update(model, objs, fields, batch_size=BATCH_SIZE):
+    """Write fields of objs with one UPDATE ... FROM (VALUES ...) per batch"""
+    qn = connection.ops.quote_name
+    columns = [model._meta.pk]
+    columns += [model._meta.get_field(name) for name in fields]
+    # rel_db_type turns serial into integer; VALUES needs the casts to
+    # type its parameters
+    row = '(' + ', '.join(
+        f'%s::{field.rel_db_type(connection)}' for field in columns
+    ) + ')'
+    names = ', '.join(qn(field.column) for field in columns)
+    assignments = ', '.join(
+        f'{qn(field.column)} = v.{qn(field.column)}' for field in columns[1:]
+    )
+    pk_column = qn(model._meta.pk.column)
+    with connection.cursor() as cursor:
+        for start in range(0, len(objs), batch_size):
+            batch = objs[start:start + batch_size]
+            cursor.execute(
+                f'UPDATE {qn(model._meta.db_table)} AS t SET {assignments} '
+                f'FROM (VALUES {", ".join([row] * len(batch))}) AS v({names}) '
+                f'WHERE t.{pk_column} = v.{pk_column}',
+                [
+                    field.get_db_prep_save(
+                        getattr(obj, field.attname), connection
+                    )
+                    for obj in batch
+                    for field in columns
+                ]
+            )
+
+
+def _delete_links(through, column, ids):
+    """Delete the link rows whose column points at one of ids"""
+    # The m2m_changed receivers make QuerySet.delete() fetch every row
+    # first; link rows have nothing depending on them, so skip that.
+    queryset = through.objects.filter(**{f'{column}__in': ids})
+    queryset._raw_delete(queryset.db)
+
+
+def _replace_links(model, objs, links, created=False):
+    """Point each object's many-to-many fields at the given related objects
+
+    links holds one dict per object mapping field names to the related
+    objects; fields missing from an object's dict are left untouched. The
+    link counters move by the difference.
+    """
+    for name, related, through, source, target in _link_fields(model):
+        linked = [(obj, link[name]) for obj, link in zip(objs, links)
+                  if name in link]
+        if not linked:
+            continue
+        field = model._meta.get_field(name)
+        removed = []
+        if not created:
+            ids = [obj.pk for obj, items in linked]
+            removed = counters.links(field, **{f'{source}__in': ids})
+            _delete_links(through, source, ids)
+        added = [
+            (obj.pk, pk)
+            for obj, items in linked
+            for pk in dict.fromkeys(item.pk for item in items)
+        ]
+        through.objects.bulk_create([
+            through(**{source: obj_pk, target: pk}) for obj_pk, pk in added
+        ], batch_size=BATCH_SIZE)
+        counters.count_links(field, added=added, removed=removed)
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """Create and update a list of objects with a few batched queries"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self._preload_related(data)
+        return super().to_internal_value(data)
+
+    def _preload_related(self, data):
+        """Load every object the items refer to with one query per field"""
+        preloaded = self.context.setdefault('preloaded_related', {})
+        for name, field in self.child.fields.items():
+            if not isinstance(field, UserManyRelatedField):
+                continue
+            pks = {
+                field.child_relation.to_pk(value)
+                for item in data if isinstance(item, dict)
+                if isinstance(item.get(name), list)
+                for value in item[name]
+            }
+            pks.discard(None)
+            preloaded[name] = field.child_relation.get_queryset().in_bulk(pks)
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        objs, links = self._build(model, validated_data, [
+            model() for attrs in validated_data
+        ])
+        model.objects.bulk_create(objs, batch_size=BATCH_SIZE)
+        self._save_new_related(model, objs, links)
+        _replace_links(model, objs, links, created=True)
+        if model is Recepie:
+            _reindex(model, [obj.pk for obj in objs])
+        return self._written(model, objs, links)
+
+    def update(self, instances, validated_data):
+        model = self.child.Meta.model
+        objs, links = self._build(model, validated_data, instances)
+        fields = {'updated_at', 'change_seq'}
+        for attrs in validated_data:
+            fields.update(attrs)
+        bulk_update(model, objs, sorted(fields))
+        self._save_new_related(model, objs, links)
+        _replace_links(model, objs, links)
+        _reindex(model, [obj.pk for obj in objs])
+        return self._written(model, objs, links)
+
+    def _save_new_related(self, model, objs, links):
+        """Create the related objects given by a new name, once per user"""
+        for name, related, *rest in _link_fields(model):
+            value_lists = defaultdict(list)
+            for obj, link in zip(objs, links):
+                if name in link:
+                    value_lists[obj.user_id].append(link[name])
+            for user_id, lists in value_lists.items():
+                save_new_objects(related, user_id, lists)
+
+    def _build(self, model, validated_data, objs):
+        """Set attributes on objs and pop their many-to-many values"""
+        link_names = [name for name, *rest in _link_fields(model)]
+        now = timezone.now()
+        sequences = {}
+        links = []
+        for obj, attrs in zip(objs, validated_data):
+            links.append({
+                name: attrs.pop(name) for name in link_names if name in attrs
+            })
+            for name, value in attrs.items():
+                setattr(obj, name, value)
+            if obj.user_id not in sequences:
+                sequences[obj.user_id] = ChangeSequence.objects.next_value(
+                    obj.user_id
+                )
+            obj.change_seq = sequences[obj.user_id]
+            obj.updated_at = now
+        return objs, links
+
+    def _written(self, model, objs, links):
+        """Invalidate the owners' caches and attach each object's links
+
+        The links are cached on the objects the way prefetch_related would,
+        so the response is rendered without querying them again.
+        """
+        for user_id in {obj.user_id for obj in objs}:
+            invalidate_user(user_id)
+
+        for name, related, through, source, target in _link_fields(model):
+            unchanged = [
+                obj.pk for obj, link in zip(objs, links) if name not in link
+            ]
+            current = defaultdict(list)
+            if unchanged:
+                rows = through.objects.filter(
+                    **{f'{source}__in': unchanged}
+                ).values_list(source, target)
+                for pk, related_pk in rows:
+                    current[pk].append(related(pk=related_pk))
+            for obj, link in zip(objs, links):
+                items = link[name] if name in link else current[obj.pk]
+                items = list({item.pk: item for item in items}.values())
+                obj.__dict__.setdefault('_prefetched_objects_cache', {})[
+                    name
+                ] = items
+                setattr(obj, counters.RECEPIE_COUNTERS[name], len(items))
+        return objs
+
+
+class NamedListSerializer(BulkListSerializer):
+    """Bulk create returning existing objects for names already taken"""
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        names = defaultdict(list)
+        for attrs in validated_data:
+            names[attrs['user'].pk].append(attrs['name'])
+        objects = {}
+        for user_id, user_names in names.items():
+            found, created = model.objects.upsert_names(user_id, user_names)
+            objects.update(
+                ((user_id, name), obj) for name, obj in found.items()
+            )
+            if created:
+                invalidate_user(user_id)
+        return [
+            objects[attrs['user'].pk, attrs['name']]
+            for attrs in validated_data
+        ]
+
+
+def bulk_delete(model, queryset):
+    """Delete the objects in queryset, leaving tombstones for delta sync
+
+    Signal handlers are bypassed: links, tombstones and search vectors are
+    maintained here with one query each rather than one per object.
+    """
+    rows = list(queryset.values_list('pk', 'user_id'))
+    ids = [pk for pk, user_id in rows]
+    user_ids = {user_id for pk, user_id in rows}
+    recepie_ids = [] if model is Recepie else _linked_recepie_ids(model, ids)
+
+    sequences = {
+        user_id: ChangeSequence.objects.next_value(user_id)
+        for user_id in user_ids
+    }
+    Tombstone.objects.bulk_create([
+        Tombstone(
+            user_id=user_id,
+            model_name=model._meta.model_name,
+            object_id=pk,
+            change_seq=sequences[user_id]
+        )
+        for pk, user_id in rows
+    ], batch_size=BATCH_SIZE)
+
+    for name, related, through, source, target in _link_fields(Recepie):
+        if model is not Recepie and related is not model:
+            continue
+        # Only the side that outlives the delete is recounted
+        field = Recepie._meta.get_field(name)
+        column = source if model is Recepie else target
+        counters.count_links(
+            field,
+            removed=counters.links(field, **{f'{column}__in': ids}),
+            recepies=model is not Recepie,
+            related=model is Recepie
+        )
+        _delete_links(through, column, ids)
+    if model is Recepie:
+        uploads.discard_all(ImageUpload.objects.filter(recepie_id__in=ids))
+        StoredFile.objects.release([
+            name
+            for image, renditions in queryset.values_list(
+                'image', 'image_renditions'
+            )
+            for name in Recepie.file_names(image, renditions)
+        ])
+    # Nothing else references these rows once their links are gone
+    model.objects.filter(pk__in=ids)._raw_delete(queryset.db)
+
+    if recepie_ids:
+        update_search_vectors(Recepie.objects.filter(id__in=recepie_ids))
+        for user_id, change_seq in sequences.items():
+            Recepie.objects.filter(
+                id__in=recepie_ids, user_id=user_id
+            ).update(updated_at=timezone.now(), change_seq=change_seq)
+    for user_id in user_ids:
+        invalidate_user(user_id)
+    return len(ids)
+
+
+class BulkModelMixin:
+    """Create, update and delete lists of objects in one request"""
+    max_bulk_size = 10000
+
+    def _bulk_items(self, request):
+        """Return the request body as a list of at most max_bulk_size items"""
+        items = request.data
+        if not isinstance(items, list):
+            raise serializers.ValidationError({
+                'non_field_errors': ['Expected a list of items.']
+            })
+        if len(items) > self.max_bulk_size:
+            raise serializers.ValidationError({
+                'non_field_errors': [
+                    f'At most {self.max_bulk_size} items may be sent.'
+                ]
+            })
+        return items
+
+    def _bulk_objects(self, ids):
+        """Return the user's objects for ids, raising per-item errors"""
+        valid_ids = {
+            pk for pk in ids
+            if isinstance(pk, int) and not isinstance(pk, bool)
+        }
+        objects = self.queryset.filter(
+            user=self.request.user
+        ).select_for_update().in_bulk(valid_ids)
+        seen = set()
+        errors = []
+        for pk in ids:
+            if pk not in valid_ids:
+                errors.append({'id': ['Expected an integer ID.']})
+            elif pk in seen:
+                errors.append({'id': ['Duplicate ID.']})
+            elif pk not in objects:
+                errors.append({'id': ['Not found.']})
+            else:
+                errors.append({})
+            seen.add(pk)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return [objects[pk] for pk in ids]
+
+    @action(methods=['POST'], detail=False, url_path='bulk')
+    def bulk(self, request):
+        """Create a list of objects"""
+        serializer = self.get_serializer(
+            data=self._bulk_items(request), many=True
+        )
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            serializer.save(user=request.user)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @bulk.mapping.patch
+    def bulk_update(self, request):
+        """Partially update a list of objects identified by their id"""
+        items = self._bulk_items(request)
+        with transaction.atomic():
+            instances = self._bulk_objects([
+                item.get('id') if isinstance(item, dict) else None
+                for item in items
+            ])
+            serializer = self.get_serializer(
+                instances, data=items, many=True, partial=True
+            )
+            serializer.is_valid(raise_exception=True)
+            try:
+                with transaction.atomic():
+                    serializer.save()
+            except IntegrityError:
+                # Renaming onto a name the user already has
+                raise serializers.ValidationError({
+                    'non_field_errors': ['Names must be unique.']
+                })
+        return Response(serializer.data)
+
+    @bulk.mapping.delete
+    def bulk_destroy(self, request):
+        """Delete a list of objects given as a list of ids"""
+        ids = self._bulk_items(request)
+        with transaction.atomic():
+            instances = self._bulk_objects(ids)
+            bulk_delete(
+                self.queryset.model,
+                self.queryset.filter(pk__in=[obj.pk for obj in instances])
+            )
+        return Response(status=status.HTTP_204_NO_CONTENT)
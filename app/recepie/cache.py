@@ -0,0 +1,119 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+
+
+class CacheStats:
+    """Thread-safe hit/miss counters for the response cache"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def as_dict(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+
+stats = CacheStats()
+
+
+def get_cache():
+    return caches[settings.RECEPIE_CACHE_ALIAS]
+
+
+def _generation_key(user_id):
+    return f'recepie:generation:{user_id}'
+
+
+def get_generation(user_id):
+    """Return the user's data generation, starting one if it was evicted"""
+    cache = get_cache()
+    key = _generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        # Seed from the clock so an evicted counter never reuses old keys
+        cache.add(key, int(time.time() * 1000000), None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(user_id):
+    """Invalidate every cached response of the user"""
+    cache = get_cache()
+    try:
+        cache.incr(_generation_key(user_id))
+    except ValueError:
+        get_generation(user_id)
+
+
+def invalidate_user(user_id):
+    """Bump the user's generation now and again once the write commits"""
+    bump_generation(user_id)
+    transaction.on_commit(lambda: bump_generation(user_id))
+
+
+def response_key(request):
+    """Return the cache key for a request, scoped to the user's generation
+
+    Pagination links are absolute, so the scheme and host are keyed too.
+    """
+    user_id = request.user.pk
+    query = '&'.join(
+        f'{name}={value}'
+        for name, values in sorted(request.query_params.lists())
+        for value in values
+    )
+    digest = hashlib.md5(
+        f'{request.scheme}://{request.get_host()}{request.path}?{query}'
+        f'|{request.accepted_media_type}'.encode()
+    ).hexdigest()
+    return f'recepie:response:{user_id}:{get_generation(user_id)}:{digest}'
+
+
+class CachedResponseMixin:
+    """Serve read responses as cached, rendered JSON bytes"""
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        """Return handler's response from the cache, filling it on a miss"""
+        if request.accepted_renderer.format != 'json':
+            return handler(request, *args, **kwargs)
+
+        cache = get_cache()
+        key = response_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            stats.hit()
+            content_type, content = cached
+            response = HttpResponse(content, content_type=content_type)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        stats.miss()
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            response = self.finalize_response(
+                request, response, *args, **kwargs
+            )
+            response.render()
+            cache.set(
+                key,
+                (response['Content-Type'], response.content),
+                settings.RECEPIE_CACHE_TIMEOUT
+            )
+        response['X-Cache'] = 'MISS'
+        return response
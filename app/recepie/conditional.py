@@ -0,0 +1,103 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Count, DateTimeField, IntegerField, Max, \
+    OuterRef, Subquery
+from django.http import HttpResponseNotModified
+from django.utils.http import http_date, parse_etags, quote_etag
+
+from core.models import Tag, Ingredient, Recepie
+
+from recepie.cache import get_cache, get_generation
+
+VERSIONED_MODELS = (Recepie, Tag, Ingredient)
+
+
+def _per_user(model, aggregate, output_field):
+    """Return a subquery aggregating the outer user's rows of model"""
+    rows = model.objects.filter(
+        user=OuterRef('pk')
+    ).order_by().values('user').annotate(value=aggregate).values('value')
+    return Subquery(rows, output_field=output_field)
+
+
+def user_data_version(user):
+    """Return (version, last_modified) of the user's data in one query
+
+    The version changes on every create, update and delete: updates move
+    the newest updated_at and deletes lower the row count.
+    """
+    annotations = {}
+    for model in VERSIONED_MODELS:
+        name = model._meta.model_name
+        annotations[f'{name}_updated'] = _per_user(
+            model, Max('updated_at'), DateTimeField()
+        )
+        annotations[f'{name}_count'] = _per_user(
+            model, Count('id'), IntegerField()
+        )
+    row = get_user_model().objects.filter(pk=user.pk).annotate(
+        **annotations
+    ).values(*annotations).get()
+
+    version = '|'.join(f'{key}={row[key]}' for key in sorted(row))
+    timestamps = [
+        value for key, value in row.items()
+        if key.endswith('_updated') and value is not None
+    ]
+    return version, max(timestamps, default=None)
+
+
+def cached_user_data_version(user):
+    """Return the user's data version, computed once per cache generation"""
+    key = f'recepie:version:{user.pk}:{get_generation(user.pk)}'
+    return get_cache().get_or_set(
+        key,
+        lambda: user_data_version(user),
+        settings.RECEPIE_CACHE_TIMEOUT
+    )
+
+
+def etag_matches(request, etag):
+    """Return whether If-None-Match names etag, compared weakly
+
+    Weak comparison, as compression makes the ETag sent out weak.
+    """
+    client_etags = [
+        client_etag[2:] if client_etag.startswith('W/') else client_etag
+        for client_etag in parse_etags(
+            request.META.get('HTTP_IF_NONE_MATCH', '')
+        )
+    ]
+    return etag in client_etags or '*' in client_etags
+
+
+class ConditionalGetMixin:
+    """Add ETag/Last-Modified and answer If-None-Match with 304"""
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        """Return 304 when the client's ETag is current, else run handler
+
+        Deletes do not move Last-Modified, so only If-None-Match is used
+        to decide whether the client's copy is still current.
+        """
+        version, last_modified = cached_user_data_version(request.user)
+        etag = quote_etag(hashlib.sha1('|'.join((
+            str(request.user.pk),
+            version,
+            request.get_full_path(),
+            request.accepted_media_type,
+        )).encode()).hexdigest())
+
+        if etag_matches(request, etag):
+            response = HttpResponseNotModified()
+        else:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        return response
@@ -0,0 +1,148 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import models
+
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+from recepie import images
+
+
+def save_new_objects(model, user_id, value_lists):
+    """Replace unsaved named objects in value_lists with stored ones
+
+    Every new name across the lists is created with one upsert, and a name
+    the user already has resolves to the existing object.
+    """
+    names = [
+        value.name for values in value_lists for value in values
+        if value.pk is None
+    ]
+    if not names:
+        return []
+    objects, created = model.objects.upsert_names(user_id, names)
+    for values in value_lists:
+        values[:] = [
+            objects[value.name] if value.pk is None else value
+            for value in values
+        ]
+    return created
+
+
+class UserManyRelatedField(serializers.ManyRelatedField):
+    """Many-related field resolving every submitted pk with one query
+
+    Items that are names rather than ids come back as unsaved objects for
+    save_new_objects() to create or look up at save time.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        relation = self.child_relation
+        errors = []
+        values = []
+        for item in data:
+            try:
+                values.append(relation.to_value(item))
+            except serializers.ValidationError as exc:
+                errors.extend(exc.detail)
+
+        pks = [value for value in values
+               if not isinstance(value, models.Model)]
+        objects = self.preloaded()
+        if objects is None:
+            objects = relation.get_queryset().in_bulk(pks) if pks else {}
+        errors.extend(
+            relation.error_messages['does_not_exist'].format(pk_value=pk)
+            for pk in pks if pk not in objects
+        )
+        if errors:
+            raise serializers.ValidationError(errors)
+        return [
+            value if isinstance(value, models.Model) else objects[value]
+            for value in values
+        ]
+
+    def preloaded(self):
+        """Return the objects a list serializer loaded for this field"""
+        return self.context.get('preloaded_related', {}).get(self.field_name)
+
+
+class UserPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key field limited to objects owned by the requesting user
+
+    With many=True, items may also be names, given as a string that is
+    not a number or as {"name": ...}.
+    """
+    default_error_messages = {
+        'invalid_name': 'Invalid name "{name}".',
+    }
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return UserManyRelatedField(**list_kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        request = self.context.get('request')
+        if request is None:
+            return queryset.none()
+        return queryset.filter(user=request.user)
+
+    def to_pk(self, data):
+        """Return data as a primary key value, or None if it is not one"""
+        if isinstance(data, str) and not data.isdigit():
+            return None
+        if isinstance(data, bool) or not isinstance(data, (int, str)):
+            return None
+        try:
+            return self.queryset.model._meta.pk.to_python(data)
+        except DjangoValidationError:
+            return None
+
+    def to_value(self, data):
+        """Return a primary key, or an unsaved object for a new name"""
+        pk = self.to_pk(data)
+        if pk is not None:
+            return pk
+        if isinstance(data, dict):
+            data = data.get('name')
+        if not isinstance(data, str):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        name = data.strip()
+        max_length = self.queryset.model._meta.get_field('name').max_length
+        if not name or len(name) > max_length:
+            self.fail('invalid_name', name=data)
+        return self.queryset.model(name=name)
+
+    def to_internal_value(self, data):
+        pk = self.to_pk(data)
+        if pk is None:
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        obj = self.get_queryset().filter(pk=pk).first()
+        if obj is None:
+            self.fail('does_not_exist', pk_value=pk)
+        return obj
+
+
+class ImageRenditionsField(serializers.Field):
+    """Read-only map of image rendition names to their URLs"""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        urls = {}
+        for name, path in value.items():
+            url = images.storage().url(path)
+            urls[name] = request.build_absolute_uri(url) if request else url
+        return urls
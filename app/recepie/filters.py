@@ -0,0 +1,24 @@
+from django.db.models import Count, Exists, OuterRef
+
+MATCH_ANY = 'any'
+MATCH_ALL = 'all'
+MATCH_MODES = (MATCH_ANY, MATCH_ALL)
+
+
+def filter_by_related(queryset, through, field, ids, match=MATCH_ANY):
+    """Filter recipes linked to any or all of the given related ids
+
+    Both modes are semi-joins against the M2M through table, so a recipe
+    matching several of the ids is still returned only once.
+    """
+    links = through.objects.filter(**{f'{field}_id__in': ids})
+    if match == MATCH_ALL:
+        recepie_ids = links.order_by().values('recepie_id').annotate(
+            matched=Count(f'{field}_id')
+        ).filter(matched=len(ids)).values('recepie_id')
+        return queryset.filter(id__in=recepie_ids)
+
+    annotation = f'has_{field}'
+    return queryset.annotate(**{
+        annotation: Exists(links.filter(recepie_id=OuterRef('pk')))
+    }).filter(**{annotation: True})
@@ -0,0 +1,225 @@
+"""Background processing of uploaded recipe images
+
+An upload is stored as sent and the request returns; the image is then
+verified, turned upright, stripped of its metadata and re-encoded into the
+renditions below outside the request.
+"""
+import io
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from PIL import Image, ImageOps
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.utils.module_loading import import_string
+
+from core.models import Recepie, StoredFile
+
+logger = logging.getLogger(__name__)
+
+# name: (width, height, crop to exactly that size)
+RENDITIONS = {
+    'thumbnail': (200, 200, True),
+    'card': (640, 480, False),
+    'full': (2048, 2048, False),
+}
+JPEG_QUALITY = 85
+
+EXIF_ORIENTATION = 0x0112
+ORIENTATION_TRANSPOSE = {
+    2: Image.FLIP_LEFT_RIGHT,
+    3: Image.ROTATE_180,
+    4: Image.FLIP_TOP_BOTTOM,
+    5: Image.TRANSPOSE,
+    6: Image.ROTATE_270,
+    7: Image.TRANSVERSE,
+    8: Image.ROTATE_90,
+}
+
+
+def _orientation(image):
+    """Return the EXIF orientation of image, if it has a readable one"""
+    try:
+        exif = image._getexif() or {}
+    except (AttributeError, IndexError, KeyError, SyntaxError, TypeError,
+            ValueError):
+        return None
+    return exif.get(EXIF_ORIENTATION)
+
+
+def _open(source):
+    """Return the uploaded image as an upright RGB image
+
+    source is a filesystem path or the image's bytes.
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    Image.open(source).verify()
+    # verify() leaves the image unusable, so it is opened again
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    image = Image.open(source)
+    method = ORIENTATION_TRANSPOSE.get(_orientation(image))
+    if method is not None:
+        image = image.transpose(method)
+    if image.mode == 'RGB':
+        return image
+    image = image.convert('RGBA')
+    flattened = Image.new('RGB', image.size, 'white')
+    flattened.paste(image, mask=image.split()[-1])
+    return flattened
+
+
+def render(source):
+    """Return {rendition name: JPEG bytes} for an uploaded image
+
+    Runs in a worker process. source is a path or the image's bytes.
+    Nothing of the upload's metadata, EXIF location included, is carried
+    over into the renditions.
+    """
+    image = _open(source)
+    renditions = {}
+    for name, (width, height, crop) in RENDITIONS.items():
+        if crop:
+            resized = ImageOps.fit(image, (width, height), Image.LANCZOS)
+        else:
+            resized = image.copy()
+            resized.thumbnail((width, height), Image.LANCZOS)
+        out = io.BytesIO()
+        resized.save(
+            out, format='JPEG', quality=JPEG_QUALITY, optimize=True,
+            progressive=True
+        )
+        renditions[name] = out.getvalue()
+    return renditions
+
+
+def _finish(recepie_id, original, **fields):
+    """Save fields on the recipe if its image is still original
+
+    Returns False when the image was replaced or removed meanwhile.
+    """
+    with transaction.atomic():
+        recepie = Recepie.objects.select_for_update().filter(
+            pk=recepie_id, image=original
+        ).first()
+        if recepie is None:
+            return False
+        old_files = recepie.stored_files()
+        for name, value in fields.items():
+            setattr(recepie, name, value)
+        recepie.save(
+            update_fields=list(fields) + ['updated_at', 'change_seq']
+        )
+        StoredFile.objects.replace(old_files, recepie.stored_files())
+    return True
+
+
+def store(recepie_id, original, renditions):
+    """Save rendered images and mark the recipe's image ready
+
+    Renditions of a replaced image are left unreferenced for gc_images.
+    """
+    names = {
+        name: storage().save(f'{name}.jpg', ContentFile(data))
+        for name, data in renditions.items()
+    }
+    _finish(recepie_id, original, image_renditions=names,
+            image_status=Recepie.IMAGE_READY)
+
+
+def fail(recepie_id, original):
+    """Mark the recipe's image as impossible to process"""
+    logger.exception('Processing image %s of recipe %s failed',
+                     original, recepie_id)
+    _finish(recepie_id, original, image_status=Recepie.IMAGE_FAILED)
+
+
+def storage():
+    """Return the storage recipe images and their renditions live in"""
+    return Recepie._meta.get_field('image').storage
+
+
+def _source(original):
+    """Return the stored image's path, or its bytes if storage has none"""
+    try:
+        return storage().path(original)
+    except NotImplementedError:
+        with storage().open(original) as image:
+            return image.read()
+
+
+def process(recepie_id, original):
+    """Render and store the renditions of a recipe image"""
+    try:
+        store(recepie_id, original, render(_source(original)))
+    except Exception:
+        fail(recepie_id, original)
+
+
+class InlineQueue:
+    """Process images in the calling thread, a stand-in for tests"""
+
+    def enqueue(self, recepie_id, original):
+        process(recepie_id, original)
+
+
+class ProcessPoolQueue:
+    """Render images in a pool of worker processes
+
+    Rendering is CPU bound, so it runs outside the web process's GIL; the
+    results are stored from the pool's result thread.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or settings.RECEPIE_IMAGE_WORKERS
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(self.workers)
+            return self._executor
+
+    def enqueue(self, recepie_id, original):
+        try:
+            future = self.executor.submit(render, _source(original))
+        except Exception:
+            fail(recepie_id, original)
+            return
+        future.add_done_callback(partial(self._done, recepie_id, original))
+
+    def _done(self, recepie_id, original, future):
+        try:
+            store(recepie_id, original, future.result())
+        except Exception:
+            fail(recepie_id, original)
+        finally:
+            connections.close_all()
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_queue():
+    """Return the queue configured by RECEPIE_IMAGE_QUEUE"""
+    path = settings.RECEPIE_IMAGE_QUEUE
+    with _queues_lock:
+        if path not in _queues:
+            _queues[path] = import_string(path)()
+        return _queues[path]
+
+
+def schedule(recepie):
+    """Queue the recipe's image once the current transaction commits"""
+    recepie_id, original = recepie.pk, recepie.image.name
+    transaction.on_commit(
+        lambda: get_queue().enqueue(recepie_id, original)
+    )
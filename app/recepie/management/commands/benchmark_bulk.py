@@ -0,0 +1,84 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from recepie import views
+
+BULK_ACTIONS = {
+    'post': 'bulk',
+    'patch': 'bulk_update',
+    'delete': 'bulk_destroy',
+}
+
+
+class Rollback(Exception):
+    """Raised to undo everything the benchmark wrote"""
+
+
+class Command(BaseCommand):
+    help = 'Time bulk recipe writes through the API views, then roll back'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recepies', type=int, default=10000)
+        parser.add_argument('--links', type=int, default=3)
+
+    def handle(self, *args, **options):
+        self.factory = APIRequestFactory()
+        try:
+            with transaction.atomic():
+                self._run(options['recepies'], options['links'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _request(self, viewset, method, payload, status_code):
+        request = getattr(self.factory, method)(
+            '/bulk/', payload, format='json'
+        )
+        force_authenticate(request, self.user)
+        res = viewset.as_view(BULK_ACTIONS)(request)
+        if res.status_code != status_code:
+            raise CommandError(
+                f'{viewset.__name__} {method} returned {res.status_code}: '
+                f'{res.data}'
+            )
+        return res.data
+
+    def _timed(self, label, count, *args):
+        start = time.perf_counter()
+        data = self._request(*args)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f'{label:<8} {count:>6} items  {elapsed:8.3f}s  '
+            f'{count / elapsed:10.0f}/s'
+        )
+        return data
+
+    def _run(self, count, links):
+        self.user = get_user_model().objects.create_user(
+            'benchmark-bulk@example.com'
+        )
+        tags = [t['id'] for t in self._request(
+            views.TagViewSet, 'post',
+            [{'name': f'Tag {n}'} for n in range(links)], 201
+        )]
+        ingredients = [i['id'] for i in self._request(
+            views.IngredientViewSet, 'post',
+            [{'name': f'Ingredient {n}'} for n in range(links)], 201
+        )]
+
+        created = self._timed('create', count, views.RecepieViewSet, 'post', [
+            {'title': f'Recepie {n}', 'time_minutes': 10, 'price': '5.00',
+             'tags': tags, 'ingredients': ingredients}
+            for n in range(count)
+        ], 201)
+        ids = [recepie['id'] for recepie in created]
+        self._timed('update', count, views.RecepieViewSet, 'patch', [
+            {'id': pk, 'title': f'Updated {pk}', 'tags': tags[:1]}
+            for pk in ids
+        ], 200)
+        self._timed('delete', count, views.RecepieViewSet, 'delete', ids, 204)
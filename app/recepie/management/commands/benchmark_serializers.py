@@ -0,0 +1,119 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Prefetch
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.models import Ingredient, Recepie, Tag
+
+from recepie import serializers
+from recepie.renderers import FastJSONRenderer
+
+
+class Rollback(Exception):
+    """Raised to undo everything the benchmark wrote"""
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare objects per second serialized and rendered by the instance '
+        'and values() list paths, then roll back'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recepies', type=int, default=5000)
+        parser.add_argument('--links', type=int, default=3)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options['recepies'], options['links'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _run(self, count, links):
+        user = get_user_model().objects.create_user(
+            'benchmark-serializers@example.com'
+        )
+        tags = Tag.objects.bulk_create(
+            Tag(user=user, name=f'Tag {n}') for n in range(count)
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(user=user, name=f'Ingredient {n}')
+            for n in range(links)
+        )
+        recepies = Recepie.objects.bulk_create(
+            Recepie(user=user, title=f'Recepie {n}', time_minutes=n,
+                    price='5.00', link='https://example.com/')
+            for n in range(count)
+        )
+        for field, related in (('tags', tags[:links]),
+                               ('ingredients', ingredients)):
+            m2m = Recepie._meta.get_field(field)
+            m2m.remote_field.through.objects.bulk_create(
+                m2m.remote_field.through(**{
+                    m2m.m2m_field_name(): recepie,
+                    m2m.m2m_reverse_field_name(): obj,
+                })
+                for recepie in recepies for obj in related
+            )
+
+        request = APIRequestFactory().get('/')
+        force_authenticate(request, user)
+        context = {'request': Request(request)}
+        recepie_queryset = Recepie.objects.filter(user=user).defer(
+            'search_vector'
+        ).order_by('-id').prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.only('id').order_by('id')),
+            Prefetch(
+                'ingredients',
+                queryset=Ingredient.objects.only('id').order_by('id')
+            ),
+        )
+        self._compare('recepies', serializers.RecepieSerializer,
+                      recepie_queryset, context)
+        self._compare('tags', serializers.TagSerializer,
+                      Tag.objects.filter(user=user).order_by('-name', '-id'),
+                      context)
+
+    def _timed(self, label, count, func):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f'{label:<28} {count:>7} objects  {elapsed:8.3f}s  '
+            f'{count / elapsed:10.0f}/s'
+        )
+        return result
+
+    def _compare(self, label, serializer_class, queryset, context):
+        count = queryset.count()
+        default = self._timed(
+            f'{label} instances', count,
+            lambda: serializer_class(
+                list(queryset), many=True, context=context
+            ).data
+        )
+        serializer = serializer_class(context=context)
+        fast = self._timed(
+            f'{label} values()', count,
+            lambda: serializer.rows_to_representation(
+                serializer.values_rows(queryset), queryset
+            )
+        )
+        if default != fast:
+            raise CommandError(f'The {label} outputs differ')
+
+        rendered = self._timed(
+            f'{label} JSONRenderer', count,
+            lambda: JSONRenderer().render(fast)
+        )
+        if self._timed(f'{label} FastJSONRenderer', count,
+                       lambda: FastJSONRenderer().render(fast)) != rendered:
+            raise CommandError(f'The rendered {label} differ')
@@ -0,0 +1,212 @@
+import os
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import Recepie, ImageUpload, StoredFile
+
+from recepie import images, uploads
+
+
+def _walk_files(root):
+    """Yield the path of every file under root, one directory at a time"""
+    for directory, dirnames, filenames in os.walk(root):
+        for filename in filenames:
+            yield os.path.join(directory, filename)
+
+
+def _is_upload_id(value):
+    return len(value) == 32 and all(c in '0123456789abcdef' for c in value)
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help = 'Delete stored image files and uploads nothing refers to'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--grace-hours', type=float, default=24,
+            help='Keep anything changed more recently than this'
+        )
+        parser.add_argument(
+            '--recount', action='store_true',
+            help='Recount the references from the recipe table first'
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        self.storage = images.storage()
+        self.batch_size = options['batch_size']
+        self.dry_run = options['dry_run']
+        self.cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+
+        if options['recount']:
+            self._recount()
+        unreferenced = self._delete_unreferenced()
+        orphaned = self._delete_orphaned()
+        stale = self._delete_stale_uploads()
+        verb = 'Would delete' if self.dry_run else 'Deleted'
+        self.stdout.write(
+            f'{verb} {unreferenced} unreferenced files, {orphaned} '
+            f'orphaned files and {stale} stale uploads'
+        )
+
+    def _old(self, path):
+        """Return whether the file at path was last written before cutoff"""
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return True
+        return mtime < self.cutoff.timestamp()
+
+    def _remove(self, path):
+        if not self.dry_run:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _remove_unwanted(self, path):
+        """Remove a stored file unless it is saved again meanwhile
+
+        Returns whether it is gone. The file is renamed away before
+        its time is checked: a save reusing it has either touched it by
+        then, and it is put back, or finds it gone and writes it again.
+        """
+        if self.dry_run:
+            return self._old(path)
+        removed = f'{path}.{uuid.uuid4().hex}.gc'
+        try:
+            os.rename(path, removed)
+        except FileNotFoundError:
+            return True
+        if not self._old(removed):
+            os.rename(removed, path)
+            return False
+        os.remove(removed)
+        return True
+
+    def _recount(self):
+        """Set every file's count to the references the recipes hold"""
+        table = StoredFile._meta.db_table
+        recepies = Recepie._meta.db_table
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Block concurrent reference changes until the count is done
+            cursor.execute(f'LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE')
+            cursor.execute(
+                f'UPDATE {table} SET ref_count = 0, updated_at = %s '
+                f'WHERE ref_count <> 0',
+                [timezone.now()]
+            )
+            cursor.execute(
+                f'INSERT INTO {table} (name, ref_count, updated_at) '
+                f'SELECT name, count(*), %s FROM ('
+                f"SELECT image AS name FROM {recepies} WHERE image <> '' "
+                f'UNION ALL SELECT value FROM {recepies}, '
+                f'jsonb_each_text(image_renditions)'
+                f') AS refs GROUP BY name '
+                f'ON CONFLICT (name) DO UPDATE SET '
+                f'ref_count = EXCLUDED.ref_count',
+                [timezone.now()]
+            )
+            if self.dry_run:
+                transaction.set_rollback(True)
+
+    def _delete_unreferenced(self):
+        """Delete files whose count has been zero since before cutoff"""
+        deleted = 0
+        last = ''
+        while True:
+            with transaction.atomic():
+                names = list(StoredFile.objects.select_for_update(
+                    skip_locked=True
+                ).filter(
+                    ref_count__lte=0, updated_at__lt=self.cutoff,
+                    name__gt=last
+                ).order_by('name').values_list(
+                    'name', flat=True
+                )[:self.batch_size])
+                if not names:
+                    return deleted
+                last = names[-1]
+                # A file saved again is wanted again, even with no count yet
+                names = [
+                    name for name in names
+                    if self._remove_unwanted(self.storage.path(name))
+                ]
+                if not self.dry_run:
+                    StoredFile.objects.filter(name__in=names).delete()
+                deleted += len(names)
+
+    def _delete_orphaned(self):
+        """Delete stored files that were never counted, and dead temp files
+
+        These are left behind by saves whose transaction rolled back.
+        """
+        root = self.storage.path(self.storage.prefix)
+        media_root = self.storage.path('')
+        deleted = 0
+        old_files = (path for path in _walk_files(root) if self._old(path))
+        for paths in _batches(old_files, self.batch_size):
+            names = {
+                os.path.relpath(path, media_root).replace(os.sep, '/'): path
+                for path in paths
+            }
+            counted = set(StoredFile.objects.filter(
+                name__in=list(names)
+            ).values_list('name', flat=True))
+            for name, path in names.items():
+                if name not in counted and self._remove_unwanted(path):
+                    deleted += 1
+        return deleted
+
+    def _delete_stale_uploads(self):
+        """Delete resumable uploads abandoned before cutoff"""
+        stale = ImageUpload.objects.filter(created_at__lt=self.cutoff)
+        if self.dry_run:
+            deleted = stale.count()
+        else:
+            deleted = 0
+            while True:
+                ids = list(stale.values_list('id', flat=True)[
+                    :self.batch_size
+                ])
+                if not ids:
+                    break
+                uploads.discard_all(ImageUpload.objects.filter(id__in=ids))
+                deleted += len(ids)
+
+        # Chunk files whose upload row is already gone
+        old_parts = (
+            path for path in _walk_files(settings.RECEPIE_UPLOAD_DIR)
+            if self._old(path)
+        )
+        for paths in _batches(old_parts, self.batch_size):
+            parts = {
+                os.path.basename(path).split('.')[0]: path for path in paths
+            }
+            known = {
+                upload_id.hex for upload_id in ImageUpload.objects.filter(
+                    id__in=[i for i in parts if _is_upload_id(i)]
+                ).values_list('id', flat=True)
+            }
+            for upload_id, path in parts.items():
+                if upload_id not in known:
+                    self._remove(path)
+                    deleted += 1
+        return deleted
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Recepie
+
+from recepie import images
+
+
+class Command(BaseCommand):
+    help = 'Render the image renditions of recipes that lack them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Render again images that are already processed'
+        )
+
+    def handle(self, *args, **options):
+        recepies = Recepie.objects.exclude(image='').exclude(image=None)
+        if not options['all']:
+            recepies = recepies.exclude(image_status=Recepie.IMAGE_READY)
+        jobs = list(recepies.order_by('id').values_list('id', 'image'))
+        for recepie_id, original in jobs:
+            images.process(recepie_id, original)
+        self.stdout.write(f'Processed {len(jobs)} images')
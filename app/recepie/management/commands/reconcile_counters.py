@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from core import counters
+from core.models import Recepie
+
+from recepie.cache import invalidate_user
+
+
+def _counted(field, column, model):
+    """Return the number of links in field pointing at model's outer row"""
+    links = field.remote_field.through.objects.filter(
+        **{column: OuterRef('pk')}
+    ).order_by().values(column).annotate(count=Count('id')).values('count')
+    return Coalesce(Subquery(links, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    help = (
+        'Recount the link counters on recipes, tags and ingredients from '
+        'the through tables, correcting any that drifted'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.dry_run = options['dry_run']
+        for field in Recepie._meta.many_to_many:
+            source, target = counters.link_columns(field)
+            self._reconcile(
+                Recepie, counters.RECEPIE_COUNTERS[field.name],
+                _counted(field, source, Recepie)
+            )
+            self._reconcile(
+                field.related_model, counters.RELATED_COUNTER,
+                _counted(field, target, field.related_model)
+            )
+
+    def _reconcile(self, model, counter, counted):
+        """Correct counter on model's rows, batch_size rows at a time"""
+        fixed = 0
+        last = 0
+        while True:
+            with transaction.atomic():
+                rows = list(model.objects.filter(pk__gt=last).order_by(
+                    'pk'
+                ).annotate(counted=counted).values_list(
+                    'pk', 'user_id', counter, 'counted'
+                )[:self.batch_size])
+                if not rows:
+                    break
+                last = rows[-1][0]
+                drifted = {
+                    pk: user_id for pk, user_id, value, actual in rows
+                    if value != actual
+                }
+                if drifted and not self.dry_run:
+                    model.objects.filter(pk__in=list(drifted)).update(
+                        **{counter: counted}
+                    )
+                    for user_id in set(drifted.values()):
+                        invalidate_user(user_id)
+            fixed += len(drifted)
+        verb = 'Would correct' if self.dry_run else 'Corrected'
+        self.stdout.write(
+            f'{verb} {counter} of {fixed} {model._meta.verbose_name_plural}'
+        )
@@ -0,0 +1,152 @@
+"""Serving stored recipe images to their owners
+
+Django only checks access and writes headers: with RECEPIE_MEDIA_SENDFILE
+set, the front-end server sends the file itself, ranges included.
+Without it the file goes out through FileResponse, which WSGI servers
+hand to sendfile().
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db.models import Q
+from django.http import FileResponse, Http404, HttpResponse, \
+    HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import http_date, quote_etag
+
+from rest_framework import status
+
+from core.models import Recepie
+
+from recepie import images
+from recepie.conditional import etag_matches
+
+# Content-addressed names never change content, so never expire
+IMMUTABLE_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+CACHE_CONTROL = 'private, max-age=3600'
+CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CONTENT_ADDRESSED_RE = re.compile(r'/([0-9a-f]{64})\.[a-z0-9]+$')
+
+
+def readable_by(user, name):
+    """Return whether one of user's recipes uses the named file
+
+    Only an EXISTS query is run; no recipe row is loaded.
+    """
+    recepies = Recepie.objects.all()
+    if not user.is_staff:
+        recepies = recepies.filter(user=user)
+    uses = Q(image=name)
+    for rendition in images.RENDITIONS:
+        uses |= Q(image_renditions__contains={rendition: name})
+    return recepies.filter(uses).exists()
+
+
+def parse_range(header, size):
+    """Return (start, end) of a single byte range, inclusive
+
+    Returns None when there is no range to honour; several ranges are
+    answered with the whole file. Raises ValueError if unsatisfiable.
+    """
+    match = RANGE_RE.match(header or '')
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError('Unsatisfiable range')
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _file_response(request, path, size, etag):
+    """Return the file, or the byte range the request asks for"""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    byte_range = None
+    if if_range is None or if_range == etag:
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+        except ValueError:
+            response = HttpResponse(
+                status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+            )
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+    if byte_range is None:
+        response = FileResponse(open(path, 'rb'))
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _read_range(path, start, end - start + 1),
+            status=status.HTTP_206_PARTIAL_CONTENT
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def _offloaded_response(name, path):
+    """Return an empty response telling the front end which file to send"""
+    response = HttpResponse()
+    if settings.RECEPIE_MEDIA_SENDFILE == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = (
+            settings.RECEPIE_MEDIA_ACCEL_PREFIX + name
+        )
+    else:
+        response['X-Sendfile'] = path
+    return response
+
+
+def serve(request, name):
+    """Return the stored file called name, which the caller may read"""
+    storage = images.storage()
+    try:
+        path = storage.path(name)
+        stat = os.stat(path)
+    except (SuspiciousFileOperation, FileNotFoundError, NotADirectoryError):
+        raise Http404
+
+    digest = CONTENT_ADDRESSED_RE.search(name)
+    if digest is not None:
+        etag = quote_etag(digest.group(1))
+        cache_control = IMMUTABLE_CACHE_CONTROL
+    else:
+        etag = quote_etag(f'{int(stat.st_mtime)}-{stat.st_size}')
+        cache_control = CACHE_CONTROL
+
+    if etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    elif settings.RECEPIE_MEDIA_SENDFILE:
+        response = _offloaded_response(name, path)
+    else:
+        response = _file_response(request, path, stat.st_size, etag)
+
+    if not isinstance(response, HttpResponseNotModified):
+        response['Content-Type'] = (
+            mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        )
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,138 @@
+import json
+
+from django.conf import settings
+from django.db.models import Q
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+
+def _reversed(ordering):
+    return tuple(
+        order[1:] if order.startswith('-') else f'-{order}'
+        for order in ordering
+    )
+
+
+def after(ordering, values):
+    """Return the filter for rows past values of the fields in ordering
+
+    (a, b) after (x, y) is a past x, or a equal to x and b past y. The
+    bound on a alone lets an index scan start at x.
+    """
+    past_all = Q()
+    for order, value in reversed(list(zip(ordering, values))):
+        field = order.lstrip('-')
+        lookup = 'lt' if order.startswith('-') else 'gt'
+        past = Q(**{f'{field}__{lookup}': value})
+        past_all = past | (Q(**{field: value}) & past_all) \
+            if past_all else past
+    if len(ordering) == 1:
+        return past_all
+    field = ordering[0].lstrip('-')
+    lookup = 'lte' if ordering[0].startswith('-') else 'gte'
+    return Q(**{f'{field}__{lookup}': values[0]}) & past_all
+
+
+class RecepieCursorPagination(CursorPagination):
+    """Keyset pagination over the ordering declared on the viewset
+
+    The cursor holds the last row's value of every ordering field, which
+    ends with the id, so a page starts right after that row however many
+    share its leading value, e.g. its rank or count, instead of skipping
+    through them with an OFFSET.
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def get_page_size(self, request):
+        """Return None to serve the legacy unpaginated list when disabled"""
+        if not settings.RECEPIE_API_PAGINATE:
+            return None
+        return super().get_page_size(request)
+
+    def get_ordering(self, request, queryset, view):
+        """Page over the viewset's indexed ordering, e.g. (name, id)"""
+        ordering = tuple(view.get_ordering())
+        assert ordering[-1].lstrip('-') == 'id', (
+            'The ordering must end with the id to identify a position'
+        )
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """CursorPagination.paginate_queryset filtering on every field"""
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        ordering = _reversed(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if current_position is not None:
+            queryset = queryset.filter(
+                self._after(ordering, current_position)
+            )
+
+        # One more row than the page tells whether another page follows
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering
+            )
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def _after(self, ordering, position):
+        """Return the filter for rows past the cursor's position"""
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return after(ordering, values)
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            field = order.lstrip('-')
+            if isinstance(instance, dict):
+                value = instance[field]
+            else:
+                value = getattr(instance, field)
+            values.append(str(value))
+        return json.dumps(values)
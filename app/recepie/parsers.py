@@ -0,0 +1,37 @@
+import io
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from django.conf import settings
+
+from rest_framework.parsers import JSONParser
+
+from recepie.renderers import FastJSONRenderer
+
+UTF8 = ('utf-8', 'utf8')
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser decoding UTF-8 bodies with orjson when it is installed
+
+    Bodies orjson rejects are handed to JSONParser, which either accepts
+    them too or raises its usual ParseError.
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get(
+            'encoding', settings.DEFAULT_CHARSET
+        )
+        if orjson is None or not self.strict or encoding.lower() not in UTF8:
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read()
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return super().parse(
+                io.BytesIO(body), media_type, parser_context
+            )
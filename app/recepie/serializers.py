@@ -1,51 +1,115 @@
+from django.db import IntegrityError, transaction
+
 from rest_framework import serializers
 
 from core.models import Tag, Ingredient, Recepie
 
-class TagSerializer(serializers.ModelSerializer):
+from recepie.bulk import BulkListSerializer, NamedListSerializer
+from recepie.cache import invalidate_user
+from recepie.fieldsets import SparseFieldsMixin
+from recepie.fields import ImageRenditionsField, \
+    UserPrimaryKeyRelatedField, save_new_objects
+from recepie.values import ValuesSerializerMixin
+
+
+class NamedObjectSerializer(ValuesSerializerMixin,
+                            serializers.ModelSerializer):
+    """Create returns the user's existing object when the name is taken"""
+
+    def create(self, validated_data):
+        user_id = validated_data['user'].pk
+        name = validated_data['name']
+        objects, created = self.Meta.model.objects.upsert_names(
+            user_id, [name]
+        )
+        if created:
+            invalidate_user(user_id)
+        return objects[name]
+
+    def update(self, instance, validated_data):
+        try:
+            with transaction.atomic():
+                return super().update(instance, validated_data)
+        except IntegrityError:
+            raise serializers.ValidationError({
+                'name': ['This name is already in use.']
+            })
+
+
+class TagSerializer(NamedObjectSerializer):
+    assigned_count = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Tag
-        fields = ('id', 'name')
+        fields = ('id', 'name', 'assigned_count')
         read_only_fields = ('id',)
+        list_serializer_class = NamedListSerializer
         
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(NamedObjectSerializer):
+    assigned_count = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Ingredient
-        fields = ('id', 'name')
+        fields = ('id', 'name', 'assigned_count')
         read_only_fields = ('id',)
+        list_serializer_class = NamedListSerializer
     
 
-class RecepieSerializer(serializers.ModelSerializer):
-    
-    ingredients = serializers.PrimaryKeyRelatedField(
+class RecepieSerializer(SparseFieldsMixin, ValuesSerializerMixin,
+                        serializers.ModelSerializer):
+    expandable_fields = {
+        'tags': TagSerializer,
+        'ingredients': IngredientSerializer,
+    }
+
+    ingredients = UserPrimaryKeyRelatedField(
         many=True,
         queryset=Ingredient.objects.all()
     )
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = UserPrimaryKeyRelatedField(
         many=True,
         queryset=Tag.objects.all()
     )
+    images = ImageRenditionsField(source='image_renditions')
     
     class Meta:
         model = Recepie
         fields = ('id', 'title', 'ingredients', 'tags', 'time_minutes',
-                  'price', 'link'
+                  'price', 'link', 'image_status', 'images', 'tag_count',
+                  'ingredient_count'
         )
         read_only_fields = ('id',)
+        list_serializer_class = BulkListSerializer
+
+    def create(self, validated_data):
+        self._save_new_related(validated_data['user'].pk, validated_data)
+        return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        self._save_new_related(instance.user_id, validated_data)
+        return super().update(instance, validated_data)
+
+    def _save_new_related(self, user_id, validated_data):
+        """Create the tags and ingredients given by a new name"""
+        for name in ('tags', 'ingredients'):
+            if name in validated_data:
+                save_new_objects(
+                    self.fields[name].child_relation.queryset.model,
+                    user_id,
+                    [validated_data[name]]
+                )
         
 
 class RecepieDetailSerializer(RecepieSerializer):
-    ingredients = IngredientSerializer(many=True, read_only=True)
-    tags = TagSerializer(many=True, read_only=True)
+    default_expand = ('tags', 'ingredients')
     
     
 class RecipeImageSerializer(serializers.ModelSerializer):
     """Serializer for uploading images to recipe"""
+    images = ImageRenditionsField(source='image_renditions')
 
     class Meta:
         model = Recepie
-        fields = ('id', 'image')
+        fields = ('id', 'image', 'image_status', 'images')
         read_only_fields = ('id',)
\ No newline at end of file
@@ -0,0 +1,26 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Tag, Ingredient, Recepie
+
+from recepie.cache import invalidate_user
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=Recepie)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=Recepie)
+def invalidate_owner_cache(sender, instance, raw=False, **kwargs):
+    """Drop the owner's cached responses when one of their objects changes"""
+    if not raw:
+        invalidate_user(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recepie.tags.through)
+@receiver(m2m_changed, sender=Recepie.ingredients.through)
+def invalidate_relinked_owner_cache(sender, instance, action, **kwargs):
+    """Drop the owner's cached responses when recipe links change"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_user(instance.user_id)
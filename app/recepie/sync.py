@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.core import signing
+from django.db.models import Prefetch
+
+from rest_framework.exceptions import ValidationError
+
+from core.models import Tag, Ingredient, Recepie, ChangeSequence, Tombstone
+
+from recepie import serializers
+
+TOKEN_SALT = 'recepie.sync'
+
+
+def encode_token(change_seq):
+    """Return an opaque sync token for a change sequence value"""
+    return signing.dumps(change_seq, salt=TOKEN_SALT)
+
+
+def decode_token(token):
+    """Return the change sequence value of a sync token"""
+    try:
+        return int(signing.loads(token, salt=TOKEN_SALT))
+    except (signing.BadSignature, TypeError, ValueError):
+        raise ValidationError({'since': 'Invalid sync token.'})
+
+
+def _page_end(querysets, since, current, size):
+    """Return (last change sequence of the page, whether more follow)
+
+    The page holds the size earliest changes after since, and every
+    other change sharing the last one's sequence, so it may run over.
+    """
+    sequences = sorted(
+        change_seq for queryset in querysets
+        for change_seq in queryset.filter(
+            change_seq__gt=since, change_seq__lte=current
+        ).order_by('change_seq').values_list(
+            'change_seq', flat=True
+        )[:size + 1]
+    )
+    if len(sequences) <= size:
+        return current, False
+    return sequences[size - 1], True
+
+
+def changes_since(user, since=None):
+    """Return a page of the user's objects changed and deleted after since
+
+    The current sequence is read before the changes, so a write
+    committing meanwhile is sent on the next sync rather than skipped.
+    Without since every object is sent, but no deletes. Each page's token
+    leads to the next; more tells whether one follows.
+    """
+    current = ChangeSequence.objects.current_value(user.pk)
+
+    recepies = Recepie.objects.filter(user=user).defer(
+        'search_vector'
+    ).prefetch_related(
+        Prefetch('tags', queryset=Tag.objects.only('id')),
+        Prefetch('ingredients', queryset=Ingredient.objects.only('id')),
+    )
+    tags = Tag.objects.filter(user=user)
+    ingredients = Ingredient.objects.filter(user=user)
+    tombstones = Tombstone.objects.filter(user=user)
+    if since is None:
+        since = 0
+        tombstones = tombstones.none()
+
+    end, more = _page_end(
+        (recepies, tags, ingredients, tombstones),
+        since, current, settings.RECEPIE_SYNC_PAGE_SIZE
+    )
+    recepies, tags, ingredients, tombstones = (
+        queryset.filter(change_seq__gt=since, change_seq__lte=end)
+        for queryset in (recepies, tags, ingredients, tombstones)
+    )
+
+    deleted = {'recepies': [], 'tags': [], 'ingredients': []}
+    for model_name, object_id in tombstones.values_list(
+            'model_name', 'object_id'):
+        deleted[f'{model_name}s'].append(object_id)
+
+    return {
+        'token': encode_token(end),
+        'more': more,
+        'recepies': serializers.RecepieSerializer(
+            recepies.order_by('change_seq', 'id'), many=True
+        ).data,
+        'tags': serializers.TagSerializer(
+            tags.order_by('change_seq', 'id'), many=True
+        ).data,
+        'ingredients': serializers.IngredientSerializer(
+            ingredients.order_by('change_seq', 'id'), many=True
+        ).data,
+        'deleted': deleted,
+    }
@@ -0,0 +1,317 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recepie, Tag, Ingredient, Tombstone
+
+RECEPIE_BULK_URL = reverse('recepie:recepie-bulk')
+TAG_BULK_URL = reverse('recepie:tag-bulk')
+INGREDIENT_BULK_URL = reverse('recepie:ingredient-bulk')
+RECEPIE_URLS = reverse('recepie:recepie-list')
+
+
+def sample_recepie(user, **params):
+    defaults = {
+        'title': 'sample recepie',
+        'time_minutes': 10,
+        'price': 5.00
+    }
+    defaults.update(params)
+    return Recepie.objects.create(user=user, **defaults)
+
+
+class BulkApiTests(TestCase):
+    """Test the bulk create, update and delete endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'bulk@gmail.com',
+            '12345678'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_create_recepies(self):
+        """Test a list of recipes is created with their links"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        payload = [
+            {'title': f'Soup {n}', 'time_minutes': 5, 'price': '1.00',
+             'tags': [tag.id], 'ingredients': [ingredient.id]}
+            for n in range(3)
+        ]
+
+        res = self.client.post(RECEPIE_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [r['title'] for r in res.data], ['Soup 0', 'Soup 1', 'Soup 2']
+        )
+        recepies = Recepie.objects.filter(user=self.user)
+        self.assertEqual(recepies.count(), 3)
+        for recepie in recepies:
+            self.assertEqual(list(recepie.tags.all()), [tag])
+            self.assertEqual(list(recepie.ingredients.all()), [ingredient])
+            self.assertGreater(recepie.change_seq, 0)
+
+    def test_bulk_create_recepies_with_names(self):
+        """Test names shared across a batch create one object each"""
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        payload = [
+            {'title': f'Soup {n}', 'time_minutes': 5, 'price': '1.00',
+             'tags': ['Vegan'], 'ingredients': ['Salt', 'Pepper']}
+            for n in range(3)
+        ]
+
+        res = self.client.post(RECEPIE_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        vegan = Tag.objects.get(user=self.user)
+        pepper = Ingredient.objects.get(user=self.user, name='Pepper')
+        self.assertEqual(Ingredient.objects.count(), 2)
+        for recepie in Recepie.objects.filter(user=self.user):
+            self.assertEqual(list(recepie.tags.all()), [vegan])
+            self.assertCountEqual(recepie.ingredients.all(), [salt, pepper])
+
+    def test_bulk_create_tags_reuses_existing_names(self):
+        """Test bulk creating taken names returns the existing tags"""
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.post(
+            TAG_BULK_URL,
+            [{'name': 'Vegan'}, {'name': 'Quick'}, {'name': 'Quick'}],
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data[0]['id'], vegan.id)
+        self.assertEqual(res.data[1]['id'], res.data[2]['id'])
+        self.assertEqual(Tag.objects.count(), 2)
+
+    def test_bulk_rename_to_taken_name_rejected(self):
+        """Test renaming a tag onto another tag's name is rejected"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        quick = Tag.objects.create(user=self.user, name='Quick')
+
+        res = self.client.patch(
+            TAG_BULK_URL, [{'id': quick.id, 'name': 'Vegan'}], format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        quick.refresh_from_db()
+        self.assertEqual(quick.name, 'Quick')
+
+    def test_bulk_create_query_count_is_constant(self):
+        """Test creating more tags does not cost more queries"""
+        with self.assertNumQueries(4):
+            self.client.post(
+                TAG_BULK_URL, [{'name': 'a'}, {'name': 'b'}], format='json'
+            )
+        with self.assertNumQueries(4):
+            self.client.post(
+                TAG_BULK_URL,
+                [{'name': str(n)} for n in range(50)],
+                format='json'
+            )
+
+    def test_bulk_create_reports_item_errors(self):
+        """Test invalid items are reported by position and nothing is saved"""
+        payload = [{'name': 'Vegan'}, {'name': ''}, {}]
+
+        res = self.client.post(TAG_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('name', res.data[1])
+        self.assertIn('name', res.data[2])
+        self.assertFalse(Tag.objects.exists())
+
+    def test_bulk_create_rejects_foreign_tags(self):
+        """Test recipes cannot be linked to another user's tags"""
+        other = get_user_model().objects.create_user(
+            'other@gmail.com',
+            'testpass'
+        )
+        mine = Tag.objects.create(user=self.user, name='Mine')
+        foreign = Tag.objects.create(user=other, name='Theirs')
+        payload = [
+            {'title': title, 'time_minutes': 5, 'price': '1.00',
+             'tags': tags, 'ingredients': []}
+            for title, tags in (('Ok', [mine.id]), ('Bad', [foreign.id]))
+        ]
+
+        res = self.client.post(RECEPIE_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('tags', res.data[1])
+        self.assertFalse(Recepie.objects.exists())
+
+    def test_bulk_requires_list(self):
+        """Test a single object body is rejected"""
+        res = self.client.post(
+            INGREDIENT_BULK_URL, {'name': 'Salt'}, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_size_limited(self):
+        """Test batches larger than the limit are rejected"""
+        payload = [{'name': str(n)} for n in range(10001)]
+
+        res = self.client.post(TAG_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Tag.objects.exists())
+
+    def test_bulk_create_is_searchable_and_invalidates_cache(self):
+        """Test bulk created recipes are indexed and listed at once"""
+        self.client.get(RECEPIE_URLS)
+
+        self.client.post(RECEPIE_BULK_URL, [
+            {'title': 'Carrot cake', 'time_minutes': 5, 'price': '1.00',
+             'tags': [], 'ingredients': []}
+        ], format='json')
+        res = self.client.get(RECEPIE_URLS, {'q': 'carrot'})
+
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(len(self.client.get(RECEPIE_URLS).data['results']), 1)
+
+    def test_bulk_update_recepies(self):
+        """Test a list of recipes is partially updated in order"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        first = sample_recepie(user=self.user, title='First')
+        second = sample_recepie(user=self.user, title='Second')
+        first.tags.add(tag)
+        payload = [
+            {'id': second.id, 'price': '9.50'},
+            {'id': first.id, 'title': 'Renamed', 'tags': []},
+        ]
+
+        res = self.client.patch(RECEPIE_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data], [second.id, first.id])
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.title, 'Renamed')
+        self.assertEqual(first.tags.count(), 0)
+        self.assertEqual(str(second.price), '9.50')
+        self.assertEqual(second.title, 'Second')
+
+    def test_bulk_update_rejects_unknown_ids(self):
+        """Test missing, foreign and duplicate ids are reported per item"""
+        other = get_user_model().objects.create_user(
+            'other@gmail.com',
+            'testpass'
+        )
+        mine = Tag.objects.create(user=self.user, name='Mine')
+        foreign = Tag.objects.create(user=other, name='Theirs')
+        payload = [
+            {'id': mine.id, 'name': 'Changed'},
+            {'id': foreign.id, 'name': 'Stolen'},
+            {'id': mine.id, 'name': 'Again'},
+            {'name': 'No id'},
+        ]
+
+        res = self.client.patch(TAG_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        for error in res.data[1:]:
+            self.assertIn('id', error)
+        foreign.refresh_from_db()
+        mine.refresh_from_db()
+        self.assertEqual(foreign.name, 'Theirs')
+        self.assertEqual(mine.name, 'Mine')
+
+    def test_bulk_delete_recepies(self):
+        """Test a list of recipes is deleted and tombstoned"""
+        keep = sample_recepie(user=self.user)
+        gone = [sample_recepie(user=self.user) for n in range(2)]
+        gone_ids = [recepie.id for recepie in gone]
+
+        res = self.client.delete(RECEPIE_BULK_URL, gone_ids, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            list(Recepie.objects.values_list('id', flat=True)), [keep.id]
+        )
+        self.assertEqual(
+            sorted(Tombstone.objects.filter(
+                user=self.user, model_name='recepie'
+            ).values_list('object_id', flat=True)),
+            gone_ids
+        )
+
+    def test_bulk_delete_tags_touches_recepies(self):
+        """Test deleting tags unlinks and re-sequences their recipes"""
+        recepie = sample_recepie(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recepie.tags.add(tag)
+        recepie.refresh_from_db()
+        change_seq = recepie.change_seq
+
+        res = self.client.delete(TAG_BULK_URL, [tag.id], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        recepie.refresh_from_db()
+        self.assertEqual(recepie.tags.count(), 0)
+        self.assertGreater(recepie.change_seq, change_seq)
+        self.assertFalse(Tag.objects.exists())
+
+    def test_bulk_delete_tags_keeps_other_links(self):
+        """Test deleting tags leaves ingredient links sharing their ids"""
+        other = get_user_model().objects.create_user(
+            'other@gmail.com',
+            'testpass'
+        )
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        ingredient = Ingredient.objects.create(
+            id=tag.id, user=other, name='Salt'
+        )
+        recepie = sample_recepie(user=other)
+        recepie.ingredients.add(ingredient)
+
+        res = self.client.delete(TAG_BULK_URL, [tag.id], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(list(recepie.ingredients.all()), [ingredient])
+        ingredient.refresh_from_db()
+        self.assertEqual(ingredient.recipe_count, 1)
+
+    def test_bulk_delete_foreign_ids_rejected(self):
+        """Test another user's objects cannot be bulk deleted"""
+        other = get_user_model().objects.create_user(
+            'other@gmail.com',
+            'testpass'
+        )
+        foreign = Ingredient.objects.create(user=other, name='Salt')
+
+        res = self.client.delete(
+            INGREDIENT_BULK_URL, [foreign.id], format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Ingredient.objects.filter(id=foreign.id).exists())
+
+
+class BenchmarkCommandTests(TestCase):
+    """Test the bulk write benchmark command"""
+
+    def test_benchmark_leaves_no_data(self):
+        """Test the benchmark reports timings and rolls its data back"""
+        out = StringIO()
+
+        call_command('benchmark_bulk', recepies=20, stdout=out)
+
+        self.assertIn('create', out.getvalue())
+        self.assertIn('delete', out.getvalue())
+        self.assertFalse(Recepie.objects.exists())
+        self.assertFalse(get_user_model().objects.exists())
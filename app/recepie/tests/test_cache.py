@@ -0,0 +1,139 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recepie, Tag
+
+RECEPIE_URLS = reverse('recepie:recepie-list')
+TAGS_URL = reverse('recepie:tag-list')
+CACHE_STATS_URL = reverse('recepie:cache-stats')
+
+
+def detail_url(recipe_id):
+    """Return recipe detail URL"""
+    return reverse('recepie:recepie-detail', args=[recipe_id])
+
+
+def sample_recepie(user, **params):
+    defaults = {
+        'title': 'sample recepie',
+        'time_minutes': 10,
+        'price': 5.00
+    }
+    defaults.update(params)
+    return Recepie.objects.create(user=user, **defaults)
+
+
+class ResponseCacheTests(TestCase):
+    """Test list and detail responses are cached per user"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'cache@gmail.com',
+            '12345678'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_repeat_list_served_from_cache(self):
+        """Test a repeated list is served without touching the database"""
+        sample_recepie(user=self.user)
+        first = self.client.get(RECEPIE_URLS)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(RECEPIE_URLS)
+
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.content, second.content)
+
+    def test_query_string_is_part_of_key(self):
+        """Test different filters are cached separately"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(TAGS_URL)
+
+        res = self.client.get(TAGS_URL, {'q': 'veg'})
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data['results'][0]['id'], tag.id)
+
+    @override_settings(ALLOWED_HOSTS=['internal', 'public.example.com'])
+    def test_host_is_part_of_key(self):
+        """Test pages are not served with another host's links"""
+        sample_recepie(user=self.user)
+        sample_recepie(user=self.user)
+        params = {'page_size': 1}
+        self.client.get(RECEPIE_URLS, params, HTTP_HOST='internal')
+
+        res = self.client.get(
+            RECEPIE_URLS, params, HTTP_HOST='public.example.com', secure=True
+        )
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertTrue(
+            res.data['next'].startswith('https://public.example.com/')
+        )
+
+    def test_write_invalidates_list(self):
+        """Test creating a tag drops the cached tag list"""
+        self.client.get(TAGS_URL)
+        self.client.post(TAGS_URL, {'name': 'Lunch'})
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data['results'][0]['name'], 'Lunch')
+
+    def test_m2m_change_invalidates_detail(self):
+        """Test linking a tag drops the cached recipe detail"""
+        recepie = sample_recepie(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(detail_url(recepie.id))
+
+        recepie.tags.add(tag)
+        res = self.client.get(detail_url(recepie.id))
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data['tags'][0]['name'], 'Vegan')
+
+    def test_delete_invalidates_list(self):
+        """Test deleting a recipe drops the cached recipe list"""
+        recepie = sample_recepie(user=self.user)
+        self.client.get(RECEPIE_URLS)
+
+        recepie.delete()
+        res = self.client.get(RECEPIE_URLS)
+
+        self.assertEqual(res.data['results'], [])
+
+    def test_cache_scoped_to_user(self):
+        """Test one user's cached list is never served to another"""
+        sample_recepie(user=self.user)
+        self.client.get(RECEPIE_URLS)
+        user2 = get_user_model().objects.create_user(
+            'cache2@gmail.com',
+            '12345678'
+        )
+        self.client.force_authenticate(user2)
+
+        res = self.client.get(RECEPIE_URLS)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data['results'], [])
+
+    def test_cache_stats_admin_only(self):
+        """Test hit/miss counters are exposed to staff only"""
+        res = self.client.get(CACHE_STATS_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        res = self.client.get(CACHE_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('hits', res.data)
+        self.assertIn('misses', res.data)
@@ -0,0 +1,102 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recepie, Tag
+
+from recepie.serializers import RecepieSerializer
+
+RECEPIE_URLS = reverse('recepie:recepie-list')
+TAGS_URL = reverse('recepie:tag-list')
+
+
+def detail_url(recipe_id):
+    """Return recipe detail URL"""
+    return reverse('recepie:recepie-detail', args=[recipe_id])
+
+
+def sample_recepie(user, **params):
+    defaults = {
+        'title': 'sample recepie',
+        'time_minutes': 10,
+        'price': 5.00
+    }
+    defaults.update(params)
+    return Recepie.objects.create(user=user, **defaults)
+
+
+class ConditionalGetTests(TestCase):
+    """Test ETag and Last-Modified handling on read endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'etag@gmail.com',
+            '12345678'
+        )
+        self.client.force_authenticate(self.user)
+        self.recepie = sample_recepie(user=self.user)
+
+    def test_list_has_validators(self):
+        """Test list responses carry ETag and Last-Modified headers"""
+        res = self.client.get(RECEPIE_URLS)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', res)
+
+    def test_matching_etag_returns_not_modified(self):
+        """Test a current ETag returns 304 without serializing"""
+        etag = self.client.get(RECEPIE_URLS)['ETag']
+
+        with patch.object(RecepieSerializer, 'to_representation') as rep:
+            res = self.client.get(RECEPIE_URLS, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+        self.assertEqual(res.content, b'')
+        rep.assert_not_called()
+
+    def test_update_changes_etag(self):
+        """Test editing a recipe invalidates the previous ETag"""
+        etag = self.client.get(detail_url(self.recepie.id))['ETag']
+
+        self.recepie.title = 'Changed'
+        self.recepie.save()
+        res = self.client.get(
+            detail_url(self.recepie.id), HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertEqual(res.data['title'], 'Changed')
+
+    def test_delete_changes_etag(self):
+        """Test deleting a tag invalidates the previous ETag"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        etag = self.client.get(TAGS_URL)['ETag']
+
+        tag.delete()
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [])
+
+    def test_etag_depends_on_query(self):
+        """Test different pages of the same data have different ETags"""
+        first = self.client.get(RECEPIE_URLS)['ETag']
+        second = self.client.get(RECEPIE_URLS, {'page_size': 1})['ETag']
+
+        self.assertNotEqual(first, second)
+
+    def test_missing_recipe_has_no_etag(self):
+        """Test error responses are not given validators"""
+        res = self.client.get(detail_url(self.recepie.id + 1000))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn('ETag', res)
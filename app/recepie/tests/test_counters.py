@@ -0,0 +1,193 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recepie, Tag
+
+from recepie.cache import get_cache
+
+RECEPIES_URL = reverse('recepie:recepie-list')
+RECEPIES_BULK_URL = reverse('recepie:recepie-bulk')
+TAGS_URL = reverse('recepie:tag-list')
+TAGS_BULK_URL = reverse('recepie:tag-bulk')
+
+
+class CounterApiTests(TestCase):
+    """Test the API keeps and uses the link counters"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'counters@test.com', 'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.quick = Tag.objects.create(user=self.user, name='Quick')
+        self.unused = Tag.objects.create(user=self.user, name='Unused')
+
+    def create_recepie(self, tags):
+        recepie = Recepie.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price=1
+        )
+        recepie.tags.set(tags)
+        return recepie
+
+    def get(self, url, params=None):
+        get_cache().clear()
+        return self.client.get(url, params)
+
+    def test_recepie_counts_in_responses(self):
+        """Test created recipes report their link counts"""
+        res = self.client.post(RECEPIES_URL, {
+            'title': 'Soup', 'time_minutes': 5, 'price': '1.00',
+            'tags': [self.vegan.id, 'Brand new'], 'ingredients': ['Salt'],
+        }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['tag_count'], 2)
+        self.assertEqual(res.data['ingredient_count'], 1)
+        self.vegan.refresh_from_db()
+        self.assertEqual(self.vegan.recipe_count, 1)
+
+    def test_bulk_writes_counted(self):
+        """Test bulk create, update and delete move the counters"""
+        res = self.client.post(RECEPIES_BULK_URL, [
+            {'title': f'Soup {i}', 'time_minutes': 5, 'price': '1.00',
+             'tags': [self.vegan.id, self.quick.id], 'ingredients': []}
+            for i in range(3)
+        ], format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data[0]['tag_count'], 2)
+        ids = [item['id'] for item in res.data]
+
+        res = self.client.patch(RECEPIES_BULK_URL, [
+            {'id': ids[0], 'tags': [self.quick.id, self.unused.id]},
+            {'id': ids[1], 'title': 'Renamed'},
+        ], format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['tag_count'] for item in res.data], [2, 2]
+        )
+        counts = dict(Tag.objects.values_list('name', 'recipe_count'))
+        self.assertEqual(counts, {'Vegan': 2, 'Quick': 3, 'Unused': 1})
+
+        res = self.client.delete(TAGS_BULK_URL, [self.quick.id],
+                                 format='json')
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            list(Recepie.objects.order_by('id').values_list(
+                'tag_count', flat=True
+            )), [1, 1, 1]
+        )
+
+        res = self.client.delete(RECEPIES_BULK_URL, ids[:2], format='json')
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        counts = dict(Tag.objects.values_list('name', 'recipe_count'))
+        self.assertEqual(counts, {'Vegan': 1, 'Unused': 0})
+
+    def test_bulk_tag_delete_keeps_ingredient_links(self):
+        """Test deleting tags leaves ingredients sharing their ids linked"""
+        ingredient = Ingredient.objects.create(
+            id=self.unused.id, user=self.user, name='Salt'
+        )
+        recepie = self.create_recepie([])
+        recepie.ingredients.add(ingredient)
+
+        self.client.delete(TAGS_BULK_URL, [self.unused.id], format='json')
+
+        self.assertEqual(list(recepie.ingredients.all()), [ingredient])
+
+    def test_popular_ordering(self):
+        """Test ?ordering=popular lists the most used first"""
+        self.create_recepie([self.vegan, self.quick])
+        self.create_recepie([self.quick])
+
+        res = self.get(TAGS_URL, {'ordering': 'popular'})
+
+        self.assertEqual(
+            [tag['name'] for tag in res.data['results']],
+            ['Quick', 'Vegan', 'Unused']
+        )
+
+    def test_popular_ordering_paginates(self):
+        """Test popularity pages follow on from each other"""
+        self.create_recepie([self.vegan, self.quick])
+        self.create_recepie([self.quick])
+
+        res = self.get(TAGS_URL, {'ordering': 'popular', 'page_size': 2})
+        res2 = self.get(res.data['next'])
+
+        self.assertEqual(
+            [tag['name'] for tag in res2.data['results']], ['Unused']
+        )
+
+    def test_unknown_ordering_rejected(self):
+        """Test orderings other than name and popular are refused"""
+        res = self.get(TAGS_URL, {'ordering': 'title'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_assigned_from_counters(self):
+        """Test assigned_only and assigned_count read the counters"""
+        self.create_recepie([self.vegan])
+        self.create_recepie([self.vegan])
+
+        res = self.get(TAGS_URL, {'assigned_only': 1, 'assigned_count': 1})
+
+        self.assertEqual(
+            [(tag['name'], tag['assigned_count'])
+             for tag in res.data['results']],
+            [('Vegan', 2)]
+        )
+
+
+class ReconcileCountersTests(TestCase):
+    """Test the reconcile_counters command"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'reconcile@test.com', 'testpass'
+        )
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recepies = []
+        for i in range(5):
+            recepie = Recepie.objects.create(
+                user=self.user, title=f'Soup {i}', time_minutes=5, price=1
+            )
+            recepie.tags.add(self.tag)
+            self.recepies.append(recepie)
+
+    def reconcile(self, *args):
+        out = StringIO()
+        call_command('reconcile_counters', '--batch-size=2', *args,
+                     stdout=out)
+        return out.getvalue()
+
+    def test_reconcile_corrects_drift(self):
+        """Test drifted counters are recounted in batches"""
+        Tag.objects.update(recipe_count=42)
+        Recepie.objects.filter(
+            pk__in=[r.pk for r in self.recepies[:3]]
+        ).update(tag_count=0)
+
+        dry_run = self.reconcile('--dry-run')
+        self.tag.refresh_from_db()
+        self.assertEqual(self.tag.recipe_count, 42)
+        self.assertIn('Would correct tag_count of 3 recepies', dry_run)
+
+        out = self.reconcile()
+
+        self.assertIn('Corrected tag_count of 3 recepies', out)
+        self.assertIn('Corrected recipe_count of 1 tags', out)
+        self.tag.refresh_from_db()
+        self.assertEqual(self.tag.recipe_count, 5)
+        self.assertEqual(
+            set(Recepie.objects.values_list('tag_count', flat=True)), {1}
+        )
+        self.assertIn('Corrected tag_count of 0 recepies', self.reconcile())
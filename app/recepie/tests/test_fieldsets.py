@@ -0,0 +1,132 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recepie, Tag
+
+from recepie.cache import get_cache
+
+RECEPIES_URL = reverse('recepie:recepie-list')
+
+
+def detail_url(recepie_id):
+    return reverse('recepie:recepie-detail', args=[recepie_id])
+
+
+class SparseFieldsetTests(TestCase):
+    """Test ?fields= and ?expand= on the recipe endpoints"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'fields@test.com', 'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = Ingredient.objects.create(
+            user=self.user, name='Salt'
+        )
+        for i in range(3):
+            self.recepie = Recepie.objects.create(
+                user=self.user, title=f'Recipe {i}', time_minutes=i,
+                price=5, link='https://example.com'
+            )
+            self.recepie.tags.add(self.tag)
+            self.recepie.ingredients.add(self.ingredient)
+
+    def get(self, url, params=None):
+        get_cache().clear()
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        # The first query reads the data version for the ETag
+        return res, [query['sql'] for query in queries[1:]]
+
+    def get_both_paths(self, url, params=None):
+        """Return the response and SQL of the values and instance paths"""
+        fast = self.get(url, params)
+        with override_settings(RECEPIE_FAST_SERIALIZERS=False):
+            default = self.get(url, params)
+        self.assertEqual(fast[0].content, default[0].content)
+        return fast
+
+    def test_fields_narrow_output_and_columns(self):
+        """Test ?fields= selects only those fields and their columns"""
+        for path in (self.get_both_paths, self.get):
+            res, queries = path(RECEPIES_URL, {'fields': 'title,images'})
+
+            self.assertEqual(
+                list(res.data['results'][0]), ['id', 'title', 'images']
+            )
+            sql = '\n'.join(queries)
+            self.assertNotIn('"link"', sql)
+            self.assertNotIn('recepie_tags', sql)
+            self.assertNotIn('recepie_ingredients', sql)
+
+    @override_settings(RECEPIE_FAST_SERIALIZERS=False)
+    def test_fields_no_extra_queries(self):
+        """Test deferred columns are not loaded one row at a time"""
+        _, full = self.get(RECEPIES_URL)
+        _, sparse = self.get(RECEPIES_URL, {'fields': 'title'})
+
+        self.assertEqual(len(sparse), len(full) - 2)
+
+    def test_expand_list(self):
+        """Test ?expand= nests only the relations asked for"""
+        res, _ = self.get_both_paths(RECEPIES_URL, {'expand': 'tags'})
+        item = res.data['results'][0]
+
+        self.assertEqual(
+            item['tags'], [{'id': self.tag.id, 'name': 'Vegan'}]
+        )
+        self.assertEqual(item['ingredients'], [self.ingredient.id])
+
+    def test_expand_with_fields(self):
+        """Test expanding a relation left out of ?fields= skips it"""
+        res, queries = self.get_both_paths(
+            RECEPIES_URL, {'fields': 'title,ingredients', 'expand': 'tags'}
+        )
+
+        self.assertEqual(
+            list(res.data['results'][0]), ['id', 'title', 'ingredients']
+        )
+        self.assertNotIn('core_tag', '\n'.join(queries))
+
+    def test_retrieve_expands_by_default(self):
+        """Test the detail view keeps nesting unless ?expand= says not"""
+        url = detail_url(self.recepie.id)
+
+        res, _ = self.get(url)
+        self.assertEqual(res.data['tags'][0]['name'], 'Vegan')
+
+        res, queries = self.get(url, {'expand': '', 'fields': 'tags'})
+        self.assertEqual(res.data, {
+            'id': self.recepie.id, 'tags': [self.tag.id]
+        })
+        self.assertNotIn('core_ingredient', '\n'.join(queries))
+
+    def test_unknown_field_rejected(self):
+        """Test unknown field names are a bad request"""
+        for params in ({'fields': 'title,secret'}, {'expand': 'images'}):
+            get_cache().clear()
+            res = self.client.get(RECEPIES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_writes_ignore_fieldsets(self):
+        """Test writes take and return every field"""
+        res = self.client.post(
+            f'{RECEPIES_URL}?fields=title&expand=tags',
+            {'title': 'New', 'time_minutes': 1, 'price': '2.00',
+             'tags': [self.tag.id], 'ingredients': []},
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['tags'], [self.tag.id])
+        self.assertIn('price', res.data)
@@ -0,0 +1,170 @@
+import os
+import shutil
+import tempfile
+import time
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core.models import Recepie, ImageUpload, StoredFile
+
+from recepie import images, uploads
+
+MEDIA_ROOT = tempfile.mkdtemp()
+UPLOAD_DIR = tempfile.mkdtemp()
+
+
+def make_old(path):
+    """Set a file's times a week back"""
+    week_ago = time.time() - 7 * 24 * 3600
+    os.utime(path, (week_ago, week_ago))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, RECEPIE_UPLOAD_DIR=UPLOAD_DIR)
+class GcImagesCommandTests(TestCase):
+    """Test unreferenced image files are garbage collected"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(UPLOAD_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.storage = images.storage()
+        self.user = get_user_model().objects.create_user(
+            'gc@gmail.com',
+            'testpass'
+        )
+
+    def save(self, data):
+        name = self.storage.save('image.jpg', ContentFile(data))
+        make_old(self.storage.path(name))
+        return name
+
+    def recepie(self, image):
+        recepie = Recepie.objects.create(
+            user=self.user, title='Photo', time_minutes=5, price=1,
+            image=image
+        )
+        StoredFile.objects.retain(recepie.stored_files())
+        return recepie
+
+    def gc(self, *args):
+        out = StringIO()
+        call_command('gc_images', '--grace-hours=1', *args, stdout=out)
+        return out.getvalue()
+
+    def test_unreferenced_files_deleted(self):
+        """Test a file is deleted once no recipe refers to it"""
+        shared = self.save(b'shared')
+        first = self.recepie(shared)
+        self.recepie(shared)
+        first.delete()
+        StoredFile.objects.update(updated_at='2000-01-01T00:00Z')
+        self.gc()
+        self.assertTrue(os.path.exists(self.storage.path(shared)))
+
+        Recepie.objects.get().delete()
+        StoredFile.objects.update(updated_at='2000-01-01T00:00Z')
+        output = self.gc()
+
+        self.assertFalse(os.path.exists(self.storage.path(shared)))
+        self.assertFalse(StoredFile.objects.exists())
+        self.assertIn('Deleted 1 unreferenced files', output)
+
+    def test_recently_released_files_kept(self):
+        """Test files released within the grace period survive"""
+        name = self.save(b'recent')
+        self.recepie(name).delete()
+
+        self.gc()
+
+        self.assertTrue(os.path.exists(self.storage.path(name)))
+
+    def test_file_saved_again_during_gc_kept(self):
+        """Test a file reused just before it is renamed away survives"""
+        name = self.save(b'reused')
+        self.recepie(name).delete()
+        StoredFile.objects.update(updated_at='2000-01-01T00:00Z')
+        rename = os.rename
+
+        def save_then_rename(src, dst):
+            # The file passed the age check, then is saved again
+            if dst.endswith('.gc'):
+                self.storage.save('image.jpg', ContentFile(b'reused'))
+            rename(src, dst)
+
+        with mock.patch(
+            'recepie.management.commands.gc_images.os.rename',
+            side_effect=save_then_rename
+        ):
+            output = self.gc()
+
+        self.assertTrue(os.path.exists(self.storage.path(name)))
+        self.assertTrue(StoredFile.objects.filter(name=name).exists())
+        self.assertIn('Deleted 0 unreferenced files', output)
+
+    def test_file_saved_after_removal_written_again(self):
+        """Test saving content whose file was just collected rewrites it"""
+        name = self.save(b'gone')
+        self.recepie(name).delete()
+        StoredFile.objects.update(updated_at='2000-01-01T00:00Z')
+        self.gc()
+
+        again = self.storage.save('image.jpg', ContentFile(b'gone'))
+
+        self.assertEqual(again, name)
+        with self.storage.open(name) as stored:
+            self.assertEqual(stored.read(), b'gone')
+
+    def test_orphaned_files_deleted(self):
+        """Test stored files that were never counted are deleted"""
+        orphan = self.save(b'orphan')
+        counted = self.save(b'counted')
+        self.recepie(counted)
+
+        self.gc()
+
+        self.assertFalse(os.path.exists(self.storage.path(orphan)))
+        self.assertTrue(os.path.exists(self.storage.path(counted)))
+
+    def test_stale_uploads_deleted(self):
+        """Test abandoned resumable uploads and their chunks are deleted"""
+        recepie = self.recepie(None)
+        upload = ImageUpload.objects.create(
+            user=self.user, recepie=recepie, length=10
+        )
+        ImageUpload.objects.update(created_at='2000-01-01T00:00Z')
+        with uploads.open_part(upload) as part:
+            uploads.append_chunk(upload, part, BytesIO(b'abc'), 3)
+        path = uploads.part_path(upload)
+
+        self.gc()
+
+        self.assertFalse(ImageUpload.objects.exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_dry_run_deletes_nothing(self):
+        """Test a dry run only reports"""
+        orphan = self.save(b'orphan')
+
+        output = self.gc('--dry-run')
+
+        self.assertTrue(os.path.exists(self.storage.path(orphan)))
+        self.assertIn('Would delete 0 unreferenced files, 1 orphaned', output)
+
+    def test_recount_repairs_counts(self):
+        """Test recounting restores the references recipes hold"""
+        name = self.save(b'counted')
+        self.recepie(name)
+        StoredFile.objects.update(ref_count=0)
+
+        self.gc('--recount')
+
+        self.assertEqual(StoredFile.objects.get(name=name).ref_count, 1)
+        self.assertTrue(os.path.exists(self.storage.path(name)))
@@ -0,0 +1,171 @@
+import hashlib
+import io
+import struct
+from io import StringIO
+from unittest import mock
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recepie, StoredFile
+
+from recepie import images
+from recepie.fields import ImageRenditionsField
+
+
+def image_upload_url(recipe_id):
+    return reverse('recepie:recepie-upload-image', args=[recipe_id])
+
+
+def jpeg(size=(40, 20), orientation=None):
+    """Return JPEG bytes, tagged with an EXIF orientation if given"""
+    kwargs = {}
+    if orientation is not None:
+        # A big-endian TIFF header with one IFD entry: Orientation, SHORT
+        entry = struct.pack('>HHIHH', 0x0112, 3, 1, orientation, 0)
+        kwargs['exif'] = (
+            b'Exif\x00\x00MM\x00\x2a' + struct.pack('>I', 8) +
+            struct.pack('>H', 1) + entry + struct.pack('>I', 0)
+        )
+    out = io.BytesIO()
+    Image.new('RGB', size, 'red').save(out, format='JPEG', **kwargs)
+    return out.getvalue()
+
+
+@override_settings(RECEPIE_IMAGE_QUEUE='recepie.images.InlineQueue')
+class ImagePipelineTests(TransactionTestCase):
+    """Test uploaded images are processed into renditions"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'images@gmail.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.recepie = Recepie.objects.create(
+            user=self.user, title='Photo', time_minutes=5, price=1
+        )
+        self.stored = []
+
+    def tearDown(self):
+        self.recepie.refresh_from_db()
+        names = list(self.recepie.image_renditions.values()) + self.stored
+        if self.recepie.image:
+            names.append(self.recepie.image.name)
+        for name in names:
+            default_storage.delete(name)
+
+    def upload(self, data, name='photo.jpg'):
+        upload = ContentFile(data, name=name)
+        return self.client.post(
+            image_upload_url(self.recepie.id), {'image': upload},
+            format='multipart'
+        )
+
+    def test_upload_renders_renditions(self):
+        """Test an upload ends up ready with a URL per rendition"""
+        res = self.upload(jpeg(size=(1000, 800)))
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.recepie.refresh_from_db()
+        self.assertEqual(self.recepie.image_status, Recepie.IMAGE_READY)
+        self.assertEqual(
+            set(self.recepie.image_renditions), set(images.RENDITIONS)
+        )
+        sizes = {}
+        for name, path in self.recepie.image_renditions.items():
+            with default_storage.open(path) as f:
+                sizes[name] = Image.open(f).size
+        self.assertEqual(sizes['thumbnail'], (200, 200))
+        self.assertEqual(sizes['card'], (600, 480))
+        self.assertEqual(sizes['full'], (1000, 800))
+
+        detail = self.client.get(
+            reverse('recepie:recepie-detail', args=[self.recepie.id])
+        )
+        self.assertEqual(detail.data['image_status'], 'ready')
+        self.assertTrue(
+            detail.data['images']['card'].startswith('http://testserver/')
+        )
+
+    def test_renditions_upright_without_exif(self):
+        """Test EXIF orientation is applied and then stripped"""
+        self.upload(jpeg(size=(40, 20), orientation=6))
+
+        self.recepie.refresh_from_db()
+        with default_storage.open(self.recepie.image_renditions['full']) as f:
+            full = Image.open(f)
+            self.assertEqual(full.size, (20, 40))
+            self.assertNotIn('exif', full.info)
+
+    def test_unreadable_image_marked_failed(self):
+        """Test an image the pipeline cannot decode is marked failed"""
+        name = default_storage.save('uploads/recipe/bad.jpg',
+                                    ContentFile(jpeg()[:100]))
+        self.stored.append(name)
+        Recepie.objects.filter(id=self.recepie.id).update(image=name)
+
+        images.process(self.recepie.id, name)
+
+        self.recepie.refresh_from_db()
+        self.assertEqual(self.recepie.image_status, Recepie.IMAGE_FAILED)
+        self.assertEqual(self.recepie.image_renditions, {})
+
+    def test_stale_results_dropped(self):
+        """Test renditions of a replaced image are not attached"""
+        self.upload(jpeg())
+        self.recepie.refresh_from_db()
+        renditions = self.recepie.image_renditions
+        stale = jpeg(size=(30, 30))
+        name = images.storage().content_name(
+            hashlib.sha256(stale).hexdigest(), '.jpg'
+        )
+        self.stored.append(name)
+
+        images.store(self.recepie.id, 'uploads/recipe/old.jpg', {
+            'full': stale
+        })
+
+        self.recepie.refresh_from_db()
+        self.assertEqual(self.recepie.image_renditions, renditions)
+        self.assertFalse(StoredFile.objects.filter(
+            name=name, ref_count__gt=0
+        ).exists())
+
+    def test_process_images_command(self):
+        """Test the command renders images uploaded before the pipeline"""
+        name = default_storage.save('uploads/recipe/legacy.jpg',
+                                    ContentFile(jpeg()))
+        Recepie.objects.filter(id=self.recepie.id).update(image=name)
+        out = StringIO()
+
+        call_command('process_images', stdout=out)
+
+        self.recepie.refresh_from_db()
+        self.assertEqual(self.recepie.image_status, Recepie.IMAGE_READY)
+        self.assertIn('Processed 1 images', out.getvalue())
+
+
+class ImageRenditionsFieldTests(TestCase):
+    """Test rendition URLs"""
+
+    def test_urls_from_image_storage(self):
+        """Test URLs come from the storage the renditions were written to"""
+        with mock.patch.object(
+            images.storage(), 'url', lambda name: f'/images/{name}'
+        ):
+            urls = ImageRenditionsField().to_representation(
+                {'thumbnail': 'ab/cd/abcd.jpg'}
+            )
+
+        self.assertEqual(urls, {'thumbnail': '/images/ab/cd/abcd.jpg'})
@@ -0,0 +1,147 @@
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recepie
+
+from recepie import images, media
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def media_url(name):
+    return reverse('media', args=[name])
+
+
+def body(res):
+    if res.streaming:
+        return b''.join(res.streaming_content)
+    return res.content
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class MediaViewTests(TestCase):
+    """Test stored images are served to the owners of their recipes"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'media@gmail.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        storage = images.storage()
+        self.name = storage.save('image.png', ContentFile(b'0123456789'))
+        self.thumbnail = storage.save('image.jpg', ContentFile(b'thumb'))
+        Recepie.objects.create(
+            user=self.user, title='Photo', time_minutes=5, price=1,
+            image=self.name,
+            image_renditions={'thumbnail': self.thumbnail}
+        )
+
+    def get(self, name, **headers):
+        return self.client.get(media_url(name), **headers)
+
+    def test_owner_gets_image(self):
+        """Test the owner is sent the file with immutable caching"""
+        with self.assertNumQueries(1):
+            res = self.get(self.name)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(body(res), b'0123456789')
+        self.assertEqual(res['Content-Type'], 'image/png')
+        self.assertEqual(res['Cache-Control'], media.IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+
+    def test_rendition_served(self):
+        """Test renditions are readable like the image itself"""
+        res = self.get(self.thumbnail)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(body(res), b'thumb')
+
+    def test_other_users_refused(self):
+        """Test files of other users' recipes are not found"""
+        other = get_user_model().objects.create_user(
+            'other@gmail.com',
+            'testpass'
+        )
+        self.client.force_authenticate(other)
+
+        res = self.get(self.name)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_login_required(self):
+        """Test anonymous requests are refused"""
+        res = APIClient().get(media_url(self.name))
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_range_requests(self):
+        """Test single byte ranges are answered with partial content"""
+        res = self.get(self.name, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(res.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(body(res), b'2345')
+        self.assertEqual(res['Content-Range'], 'bytes 2-5/10')
+
+        res = self.get(self.name, HTTP_RANGE='bytes=-3')
+        self.assertEqual(body(res), b'789')
+
+        res = self.get(self.name, HTTP_RANGE='bytes=20-')
+        self.assertEqual(
+            res.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+
+    def test_not_modified(self):
+        """Test a matching If-None-Match is answered with 304"""
+        etag = self.get(self.name)['ETag']
+
+        res = self.get(self.name, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        res = self.get(self.name, HTTP_IF_NONE_MATCH=f'W/{etag}')
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_etag_compared_exactly(self):
+        """Test an If-None-Match merely containing the ETag is not a match"""
+        etag = self.get(self.name)['ETag']
+
+        res = self.get(self.name, HTTP_IF_NONE_MATCH=f'"x{etag[1:-1]}x"')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @override_settings(RECEPIE_MEDIA_SENDFILE='x-accel-redirect')
+    def test_x_accel_redirect(self):
+        """Test nginx is told to send the file itself"""
+        res = self.get(self.name)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(body(res), b'')
+        self.assertEqual(
+            res['X-Accel-Redirect'], f'/protected-media/{self.name}'
+        )
+        self.assertEqual(res['Content-Type'], 'image/png')
+
+    def test_parse_range(self):
+        """Test byte range headers are parsed"""
+        self.assertEqual(media.parse_range('bytes=0-', 10), (0, 9))
+        self.assertEqual(media.parse_range('bytes=5-100', 10), (5, 9))
+        self.assertIsNone(media.parse_range('bytes=0-1,4-5', 10))
+        self.assertIsNone(media.parse_range(None, 10))
+        with self.assertRaises(ValueError):
+            media.parse_range('bytes=5-2', 10)
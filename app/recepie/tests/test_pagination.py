@@ -0,0 +1,140 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recepie, Tag
+from core.search import update_search_vectors
+
+RECEPIE_URLS = reverse('recepie:recepie-list')
+TAGS_URL = reverse('recepie:tag-list')
+
+
+def sample_recepie(user, **params):
+    defaults = {
+        'title': 'sample recepie',
+        'time_minutes': 10,
+        'price': 5.00
+    }
+    defaults.update(params)
+    return Recepie.objects.create(user=user, **defaults)
+
+
+class CursorPaginationTests(TestCase):
+    """Test cursor pagination on the list endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'pages@gmail.com',
+            '12345678'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_recepies_paginated_by_id(self):
+        """Test walking recipe pages returns every recipe once, newest first"""
+        recepies = [sample_recepie(self.user) for _ in range(5)]
+
+        res = self.client.get(RECEPIE_URLS, {'page_size': 2})
+        ids = [item['id'] for item in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            ids.extend(item['id'] for item in res.data['results'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(ids, sorted([r.id for r in recepies], reverse=True))
+
+    def test_tags_paginated_by_name_and_id(self):
+        """Test walking tag pages returns every tag once in name order"""
+        for name in ('Vegan', 'Dessert', 'Brunch', 'Lunch', 'Dinner'):
+            Tag.objects.create(user=self.user, name=name)
+
+        res = self.client.get(TAGS_URL, {'page_size': 2})
+        ids = [item['id'] for item in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            ids.extend(item['id'] for item in res.data['results'])
+
+        expected = Tag.objects.order_by('-name', '-id')
+        self.assertEqual(ids, [tag.id for tag in expected])
+
+    def walk(self, url, params):
+        """Return the ids of every page from url and the SQL of the later"""
+        res = self.client.get(url, params)
+        ids = [item['id'] for item in res.data['results']]
+        with CaptureQueriesContext(connection) as queries:
+            while res.data['next']:
+                res = self.client.get(res.data['next'])
+                ids.extend(item['id'] for item in res.data['results'])
+        return ids, ' '.join(query['sql'] for query in queries)
+
+    def test_tied_tags_paged_by_count_and_id(self):
+        """Test pages continue after (count, id) through tied counts"""
+        Tag.objects.bulk_create(
+            Tag(user=self.user, name=f'Tag {n}', recipe_count=n % 2)
+            for n in range(12)
+        )
+
+        ids, sql = self.walk(TAGS_URL, {'page_size': 5, 'ordering': 'popular'})
+
+        expected = Tag.objects.order_by('-recipe_count', '-id')
+        self.assertEqual(ids, [tag.id for tag in expected])
+        self.assertNotIn('OFFSET', sql)
+
+    def test_tied_search_ranks_paged_by_rank_and_id(self):
+        """Test search pages keep their place among equally ranked recipes"""
+        for _ in range(7):
+            sample_recepie(self.user, title='Tomato soup')
+        recepies = Recepie.objects.filter(user=self.user)
+        update_search_vectors(recepies)
+
+        ids, sql = self.walk(RECEPIE_URLS, {'page_size': 3, 'q': 'tomato'})
+
+        self.assertEqual(
+            ids, sorted(recepies.values_list('id', flat=True), reverse=True)
+        )
+        self.assertNotIn('OFFSET', sql)
+
+    def test_previous_pages_mirror_next(self):
+        """Test walking back from the last page returns the same pages"""
+        Tag.objects.bulk_create(
+            Tag(user=self.user, name=f'Tag {n}', recipe_count=1)
+            for n in range(7)
+        )
+        pages = [self.client.get(
+            TAGS_URL, {'page_size': 3, 'ordering': 'popular'}
+        ).data]
+        while pages[-1]['next']:
+            pages.append(self.client.get(pages[-1]['next']).data)
+
+        back = [pages[-1]]
+        while back[-1]['previous']:
+            back.append(self.client.get(back[-1]['previous']).data)
+
+        self.assertEqual(
+            [page['results'] for page in reversed(back)],
+            [page['results'] for page in pages]
+        )
+
+    def test_page_size_capped(self):
+        """Test clients cannot request pages above the maximum size"""
+        res = self.client.get(RECEPIE_URLS, {'page_size': 100000})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsNone(res.data['next'])
+
+    @override_settings(RECEPIE_API_PAGINATE=False)
+    def test_legacy_unpaginated_list(self):
+        """Test the legacy flag returns a plain list"""
+        sample_recepie(self.user)
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        recepie_res = self.client.get(RECEPIE_URLS)
+        tag_res = self.client.get(TAGS_URL)
+
+        self.assertEqual(len(recepie_res.data), 1)
+        self.assertEqual(tag_res.data[0]['name'], 'Vegan')
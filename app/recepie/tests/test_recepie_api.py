@@ -8,7 +8,7 @@ from django.test import TestCase
 from django.urls import reverse
 
 from rest_framework import status
-from rest_framework.test import APIClient
+from rest_framework.test import APIClient, APIRequestFactory
 
 from core.models import Recepie, Tag, Ingredient
 
@@ -78,7 +78,7 @@ class PrivateRecepieApiTest(TestCase):
         serializer = RecepieSerializer(recepie, many=True)
         
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
         
     def test_recepies_limited_to_user(self):
         
@@ -95,8 +95,8 @@ class PrivateRecepieApiTest(TestCase):
         recepie = Recepie.objects.filter(user=self.user)
         serializer = RecepieSerializer(recepie, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'], serializer.data)
     
     def test_view_recepie_detail(self):
         """Test viewing a recipe detail"""
@@ -199,8 +199,100 @@ class PrivateRecepieApiTest(TestCase):
         self.assertEqual(recipe.price, payload['price'])
         tags = recipe.tags.all()
         self.assertEqual(len(tags), 0)
-        
-    
+
+    def test_create_recipe_with_foreign_tag_rejected(self):
+        """Test tags of another user cannot be attached to a recipe"""
+        other = get_user_model().objects.create_user(
+            'other@gmail.com',
+            'testpass'
+        )
+        foreign = sample_tag(user=other, name='Theirs')
+        payload = {
+            'title': 'Stolen tag',
+            'tags': [foreign.id],
+            'time_minutes': 5,
+            'price': 1.00
+        }
+
+        res = self.client.post(RECEPIE_URLS, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recepie.objects.exists())
+
+    def test_invalid_ingredients_reported_together(self):
+        """Test every missing or malformed ingredient id is reported"""
+        ingredient = sample_ingredient(user=self.user)
+        payload = {
+            'title': 'Bad ingredients',
+            'ingredients': [ingredient.id, ingredient.id + 100, True],
+            'time_minutes': 5,
+            'price': 1.00
+        }
+
+        res = self.client.post(RECEPIE_URLS, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(res.data['ingredients']), 2)
+
+    def test_create_recipe_with_tag_names(self):
+        """Test tags given by name are created or reused"""
+        vegan = sample_tag(user=self.user, name='Vegan')
+        payload = {
+            'title': 'Named tags',
+            'tags': ['Vegan', {'name': 'Quick'}, ' Quick ', vegan.id],
+            'ingredients': [],
+            'time_minutes': 5,
+            'price': 1.00
+        }
+
+        res = self.client.post(RECEPIE_URLS, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        quick = Tag.objects.get(user=self.user, name='Quick')
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        recepie = Recepie.objects.get(id=res.data['id'])
+        self.assertCountEqual(recepie.tags.all(), [vegan, quick])
+        self.assertCountEqual(res.data['tags'], [vegan.id, quick.id])
+
+    def test_invalid_tag_names_rejected(self):
+        """Test blank names are rejected and nothing is created"""
+        payload = {
+            'title': 'Blank tag',
+            'tags': ['  ', {'name': ''}],
+            'ingredients': [],
+            'time_minutes': 5,
+            'price': 1.00
+        }
+
+        res = self.client.post(RECEPIE_URLS, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(res.data['tags']), 2)
+        self.assertFalse(Tag.objects.exists())
+
+    def test_related_ids_validated_in_one_query(self):
+        """Test validating many ingredients costs one query per field"""
+        ingredients = [
+            sample_ingredient(user=self.user, name=f'Ingredient {n}')
+            for n in range(40)
+        ]
+        request = APIRequestFactory().post(RECEPIE_URLS)
+        request.user = self.user
+        serializer = RecepieSerializer(data={
+            'title': 'Big recipe',
+            'ingredients': [ingredient.id for ingredient in ingredients],
+            'tags': [],
+            'time_minutes': 5,
+            'price': '1.00'
+        }, context={'request': request})
+
+        with self.assertNumQueries(1):
+            self.assertTrue(serializer.is_valid())
+        self.assertEqual(
+            serializer.validated_data['ingredients'], ingredients
+        )
+
+
 class RecipeImageUploadTests(TestCase):
     
     def setUp(self):
@@ -222,8 +314,9 @@ class RecipeImageUploadTests(TestCase):
             res = self.client.post(url, {'image': ntf}, format='multipart')
 
         self.recepie.refresh_from_db()
-        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
         self.assertIn('image', res.data)
+        self.assertEqual(res.data['image_status'], 'pending')
         self.assertTrue(os.path.exists(self.recepie.image.path))
 
     def test_upload_image_bad_request(self):
@@ -251,9 +344,9 @@ class RecipeImageUploadTests(TestCase):
         serializer1 = RecepieSerializer(recipe1)
         serializer2 = RecepieSerializer(recipe2)
         serializer3 = RecepieSerializer(recipe3)
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
         
     def test_filter_recipes_by_ingredients(self):
         """Test returning recipes with specific ingredients"""
@@ -273,6 +366,91 @@ class RecipeImageUploadTests(TestCase):
         serializer1 = RecepieSerializer(recipe1)
         serializer2 = RecepieSerializer(recipe2)
         serializer3 = RecepieSerializer(recipe3)
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
\ No newline at end of file
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
+
+
+class RecepieFilterTests(TestCase):
+    """Test the any/all filter semantics for recipes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'filter@gmail.com',
+            '12345678'
+        )
+        self.client.force_authenticate(self.user)
+        self.eggs = sample_ingredient(user=self.user, name='Eggs')
+        self.flour = sample_ingredient(user=self.user, name='Flour')
+        self.pancakes = sample_recepie(user=self.user, title='Pancakes')
+        self.pancakes.ingredients.add(self.eggs, self.flour)
+        self.omelette = sample_recepie(user=self.user, title='Omelette')
+        self.omelette.ingredients.add(self.eggs)
+
+    def ids_for(self, params):
+        res = self.client.get(RECEPIE_URLS, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in res.data['results']]
+
+    def test_filter_any_returns_unique_recipes(self):
+        """Test a recipe matching several IDs is returned once"""
+        ids = self.ids_for({
+            'ingredients': f'{self.eggs.id},{self.flour.id}'
+        })
+
+        self.assertEqual(ids, [self.omelette.id, self.pancakes.id])
+
+    def test_filter_all_requires_every_id(self):
+        """Test match=all returns recipes containing every ingredient"""
+        ids = self.ids_for({
+            'ingredients': f'{self.eggs.id},{self.flour.id}',
+            'match': 'all',
+        })
+
+        self.assertEqual(ids, [self.pancakes.id])
+
+    def test_filter_all_ignores_duplicate_ids(self):
+        """Test repeated IDs do not change match=all results"""
+        ids = self.ids_for({
+            'ingredients': f'{self.eggs.id},{self.eggs.id}',
+            'match': 'all',
+        })
+
+        self.assertEqual(ids, [self.omelette.id, self.pancakes.id])
+
+    def test_filter_all_combines_tags_and_ingredients(self):
+        """Test match=all applies to tags and ingredients together"""
+        tag = sample_tag(user=self.user, name='Breakfast')
+        self.pancakes.tags.add(tag)
+
+        ids = self.ids_for({
+            'tags': str(tag.id),
+            'ingredients': str(self.eggs.id),
+            'match': 'all',
+        })
+
+        self.assertEqual(ids, [self.pancakes.id])
+
+    def test_filter_invalid_ids_rejected(self):
+        """Test non-integer IDs return a bad request"""
+        res = self.client.get(RECEPIE_URLS, {'tags': '1,abc'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', res.data)
+
+    def test_filter_oversized_id_list_rejected(self):
+        """Test overly long ID lists return a bad request"""
+        res = self.client.get(
+            RECEPIE_URLS,
+            {'ingredients': ','.join(str(i) for i in range(1, 500))}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ingredients', res.data)
+
+    def test_filter_invalid_match_rejected(self):
+        """Test an unknown match mode returns a bad request"""
+        res = self.client.get(RECEPIE_URLS, {'match': 'some'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,87 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recepie, Tag, Ingredient
+
+RECEPIE_URLS = reverse('recepie:recepie-list')
+
+
+def detail_url(recipe_id):
+    """Return recipe detail URL"""
+    return reverse('recepie:recepie-detail', args=[recipe_id])
+
+
+def sample_recepie_with_relations(user, index):
+    """Create a recipe with its own tags and ingredients"""
+    recepie = Recepie.objects.create(
+        user=user,
+        title=f'Recepie {index}',
+        time_minutes=10,
+        price=5.00
+    )
+    for n in range(3):
+        recepie.tags.add(
+            Tag.objects.create(user=user, name=f'Tag {index}-{n}')
+        )
+        recepie.ingredients.add(
+            Ingredient.objects.create(user=user, name=f'Ingr {index}-{n}')
+        )
+    return recepie
+
+
+class RecepieQueryCountTests(TestCase):
+    """Test the number of queries stays fixed as recipes grow
+
+    Each count includes the one data version query used for ETags.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'queries@gmail.com',
+            '12345678'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_list_query_count_independent_of_size(self):
+        """Test listing recipes runs the same queries for 1 or 10 rows"""
+        sample_recepie_with_relations(self.user, 0)
+        with self.assertNumQueries(4):
+            res = self.client.get(RECEPIE_URLS)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        for index in range(1, 10):
+            sample_recepie_with_relations(self.user, index)
+        with self.assertNumQueries(4):
+            res = self.client.get(RECEPIE_URLS)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_list_returns_related_ids(self):
+        """Test prefetched list still returns tag and ingredient ids"""
+        recepie = sample_recepie_with_relations(self.user, 0)
+
+        res = self.client.get(RECEPIE_URLS)
+
+        self.assertEqual(
+            sorted(res.data['results'][0]['tags']),
+            sorted(recepie.tags.values_list('id', flat=True))
+        )
+        self.assertEqual(
+            sorted(res.data['results'][0]['ingredients']),
+            sorted(recepie.ingredients.values_list('id', flat=True))
+        )
+
+    def test_detail_query_count(self):
+        """Test retrieving a recipe prefetches nested relations"""
+        recepie = sample_recepie_with_relations(self.user, 0)
+
+        with self.assertNumQueries(4):
+            res = self.client.get(detail_url(recepie.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['tags']), 3)
+        self.assertEqual(len(res.data['ingredients']), 3)
@@ -0,0 +1,122 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recepie, Tag, Ingredient
+
+RECEPIE_URLS = reverse('recepie:recepie-list')
+TAGS_URL = reverse('recepie:tag-list')
+INGREDIENTS_URL = reverse('recepie:ingredient-list')
+
+
+def sample_recepie(user, **params):
+    defaults = {
+        'title': 'sample recepie',
+        'time_minutes': 10,
+        'price': 5.00
+    }
+    defaults.update(params)
+    return Recepie.objects.create(user=user, **defaults)
+
+
+class RecepieSearchApiTests(TestCase):
+    """Test full-text search over recipes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'search@gmail.com',
+            '12345678'
+        )
+        self.client.force_authenticate(self.user)
+
+    def search(self, q):
+        res = self.client.get(RECEPIE_URLS, {'q': q})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in res.data['results']]
+
+    def test_search_by_title(self):
+        """Test recipes are found by words in their title"""
+        curry = sample_recepie(user=self.user, title='Thai green curry')
+        sample_recepie(user=self.user, title='Fish and chips')
+
+        self.assertEqual(self.search('curries'), [curry.id])
+
+    def test_search_by_tag_and_ingredient_names(self):
+        """Test recipes are found by tag and ingredient names"""
+        recepie = sample_recepie(user=self.user, title='Weeknight dinner')
+        recepie.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        recepie.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Aubergine')
+        )
+
+        self.assertEqual(self.search('vegan'), [recepie.id])
+        self.assertEqual(self.search('aubergine'), [recepie.id])
+
+    def test_search_ranks_title_matches_first(self):
+        """Test title matches rank above tag matches"""
+        tagged = sample_recepie(user=self.user, title='Weeknight dinner')
+        tagged.tags.add(Tag.objects.create(user=self.user, name='Pasta'))
+        titled = sample_recepie(user=self.user, title='Pasta bake')
+
+        self.assertEqual(self.search('pasta'), [titled.id, tagged.id])
+
+    def test_search_follows_renamed_and_removed_relations(self):
+        """Test the search vector tracks tag renames and removals"""
+        recepie = sample_recepie(user=self.user, title='Weeknight dinner')
+        tag = Tag.objects.create(user=self.user, name='Spicy')
+        recepie.tags.add(tag)
+
+        tag.name = 'Mild'
+        tag.save()
+        self.assertEqual(self.search('spicy'), [])
+        self.assertEqual(self.search('mild'), [recepie.id])
+
+        tag.delete()
+        self.assertEqual(self.search('mild'), [])
+
+    def test_search_limited_to_user(self):
+        """Test search only returns the user's own recipes"""
+        user2 = get_user_model().objects.create_user(
+            'other@gmail.com',
+            '12345678'
+        )
+        sample_recepie(user=user2, title='Thai green curry')
+
+        self.assertEqual(self.search('curry'), [])
+
+
+class AttrPrefixSearchApiTests(TestCase):
+    """Test prefix search over tags and ingredients"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'prefix@gmail.com',
+            '12345678'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_tag_prefix_search(self):
+        """Test tags are matched case-insensitively by prefix"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        Tag.objects.create(user=self.user, name='Vegetarian')
+        Tag.objects.create(user=self.user, name='Dessert')
+
+        res = self.client.get(TAGS_URL, {'q': 'veg'})
+
+        names = [tag['name'] for tag in res.data['results']]
+        self.assertEqual(names, ['Vegetarian', 'Vegan'])
+
+    def test_ingredient_prefix_search(self):
+        """Test ingredients are matched by prefix only"""
+        Ingredient.objects.create(user=self.user, name='Salt')
+        Ingredient.objects.create(user=self.user, name='Rock salt')
+
+        res = self.client.get(INGREDIENTS_URL, {'q': 'sal'})
+
+        names = [item['name'] for item in res.data['results']]
+        self.assertEqual(names, ['Salt'])
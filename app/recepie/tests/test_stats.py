@@ -0,0 +1,158 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recepie, Tag
+
+from recepie.cache import get_cache
+
+STATS_URL = reverse('recepie:recepie-stats')
+
+
+class RecepieStatsTests(TestCase):
+    """Test the recipe statistics endpoint"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'stats@test.com', 'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.quick = Tag.objects.create(user=self.user, name='Quick')
+        self.salt = Ingredient.objects.create(user=self.user, name='Salt')
+        for minutes in range(10, 110, 10):
+            recepie = Recepie.objects.create(
+                user=self.user, title=f'Recipe {minutes}',
+                time_minutes=minutes, price=Decimal(minutes) / 10
+            )
+            recepie.tags.add(self.quick)
+            if minutes <= 40:
+                recepie.tags.add(self.vegan)
+                recepie.ingredients.add(self.salt)
+        other = get_user_model().objects.create_user(
+            'other@test.com', 'testpass'
+        )
+        Recepie.objects.create(
+            user=other, title='Other', time_minutes=1000, price=999
+        )
+
+    def get_stats(self, params=None):
+        get_cache().clear()
+        res = self.client.get(STATS_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_stats(self):
+        """Test averages, percentiles, histograms and rankings"""
+        data = self.get_stats()
+
+        self.assertEqual(data['count'], 10)
+        minutes = data['time_minutes']
+        self.assertEqual(minutes['avg'], 55)
+        self.assertEqual((minutes['min'], minutes['max']), (10, 100))
+        self.assertEqual(minutes['percentiles']['p50'], 55)
+        self.assertEqual(minutes['percentiles']['p90'], 91)
+        self.assertEqual(
+            [bucket['count'] for bucket in minutes['histogram']],
+            [1] * 10
+        )
+        self.assertEqual(minutes['histogram'][0]['from'], 10)
+        self.assertEqual(minutes['histogram'][-1]['to'], 100)
+        price = data['price']
+        self.assertEqual(price['avg'], Decimal('5.50'))
+        self.assertEqual(price['percentiles']['p25'], Decimal('3.25'))
+        self.assertEqual(sum(b['count'] for b in price['histogram']), 10)
+        self.assertEqual(data['tags'], [
+            {'id': self.quick.id, 'name': 'Quick', 'count': 10},
+            {'id': self.vegan.id, 'name': 'Vegan', 'count': 4},
+        ])
+        self.assertEqual(data['ingredients'], [
+            {'id': self.salt.id, 'name': 'Salt', 'count': 4},
+        ])
+
+    @override_settings(RECEPIE_STATS_TOP=1)
+    def test_stats_count_every_tag(self):
+        """Test every tag and ingredient is counted beyond the top ones"""
+        data = self.get_stats()
+
+        self.assertEqual(data['tags'], [
+            {'id': self.quick.id, 'name': 'Quick', 'count': 10},
+        ])
+        self.assertEqual(data['tag_counts'], [
+            {'id': self.quick.id, 'name': 'Quick', 'count': 10},
+            {'id': self.vegan.id, 'name': 'Vegan', 'count': 4},
+        ])
+        self.assertEqual(data['ingredient_counts'], [
+            {'id': self.salt.id, 'name': 'Salt', 'count': 4},
+        ])
+
+    def test_stats_query_count(self):
+        """Test the queries do not grow with the number of recipes
+
+        The first query reads the data version for the ETag.
+        """
+        get_cache().clear()
+        with self.assertNumQueries(6):
+            self.client.get(STATS_URL)
+
+        Recepie.objects.bulk_create(
+            Recepie(user=self.user, title='More', time_minutes=5, price=1)
+            for _ in range(50)
+        )
+        get_cache().clear()
+        with self.assertNumQueries(6):
+            self.client.get(STATS_URL)
+
+    def test_stats_respect_filters(self):
+        """Test the tags and ingredients filters narrow the stats"""
+        data = self.get_stats({'tags': f'{self.vegan.id},{self.quick.id}',
+                               'match': 'all'})
+
+        self.assertEqual(data['count'], 4)
+        self.assertEqual(data['time_minutes']['max'], 40)
+
+        data = self.get_stats({'ingredients': self.salt.id})
+        self.assertEqual(data['count'], 4)
+        self.assertEqual(data['price']['avg'], Decimal('2.50'))
+
+    def test_stats_without_recipes(self):
+        """Test stats over no recipes are empty rather than failing"""
+        data = self.get_stats({'tags': Tag.objects.create(
+            user=self.user, name='Unused'
+        ).id})
+
+        self.assertEqual(data['count'], 0)
+        self.assertIsNone(data['price']['avg'])
+        self.assertIsNone(data['price']['percentiles']['p50'])
+        self.assertEqual(data['price']['histogram'], [])
+        self.assertEqual(data['tags'], [])
+        self.assertEqual(data['tag_counts'], [])
+
+    def test_stats_single_value(self):
+        """Test a measure with one distinct value gets one bucket"""
+        Recepie.objects.filter(user=self.user).update(time_minutes=30)
+
+        histogram = self.get_stats()['time_minutes']['histogram']
+
+        self.assertEqual(histogram, [{'from': 30, 'to': 30, 'count': 10}])
+
+    def test_stats_cached_per_generation(self):
+        """Test stats are cached until the user's data changes"""
+        get_cache().clear()
+        self.client.get(STATS_URL)
+        res = self.client.get(STATS_URL)
+        self.assertEqual(res['X-Cache'], 'HIT')
+
+        Recepie.objects.create(
+            user=self.user, title='New', time_minutes=1, price=1
+        )
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data['count'], 11)
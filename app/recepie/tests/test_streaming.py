@@ -0,0 +1,240 @@
+import gzip
+import json
+import tracemalloc
+
+import brotli
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.middleware import BrotliCompressor, GzipCompressor, \
+    compress_stream
+from core.models import Ingredient, Recepie, Tag
+
+from recepie.cache import get_cache
+
+RECEPIES_URL = reverse('recepie:recepie-list')
+TAGS_URL = reverse('recepie:tag-list')
+
+
+def sample_recepies(user, count, tags=()):
+    recepies = Recepie.objects.bulk_create(
+        Recepie(user=user, title=f'Recipe {i}', time_minutes=i, price=5)
+        for i in range(count)
+    )
+    for recepie in recepies:
+        recepie.tags.set(tags)
+    return recepies
+
+
+@override_settings(RECEPIE_STREAM_CHUNK_SIZE=3)
+class StreamingListTests(TestCase):
+    """Test lists streamed with ?stream=1"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'stream@test.com', 'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('Vegan', 'Spicy')
+        ]
+        Ingredient.objects.create(user=self.user, name='Salt')
+        sample_recepies(self.user, 8, self.tags)
+
+    def get_stream(self, url, params=None, **extra):
+        get_cache().clear()
+        res = self.client.get(url, dict(params or {}, stream=1), **extra)
+        self.assertTrue(res.streaming)
+        return res
+
+    def test_stream_matches_unpaginated_list(self):
+        """Test the streamed body is the unpaginated list, byte for byte"""
+        for url in (RECEPIES_URL, TAGS_URL):
+            streamed = b''.join(self.get_stream(url).streaming_content)
+            get_cache().clear()
+            with override_settings(RECEPIE_API_PAGINATE=False):
+                whole = self.client.get(url)
+
+            self.assertFalse(whole.streaming)
+            self.assertEqual(streamed, whole.content)
+
+    @override_settings(RECEPIE_FAST_SERIALIZERS=False)
+    def test_stream_without_fast_serializers(self):
+        """Test lists stream through the instance path as well"""
+        for url in (RECEPIES_URL, TAGS_URL):
+            streamed = b''.join(self.get_stream(url).streaming_content)
+            get_cache().clear()
+            with override_settings(RECEPIE_API_PAGINATE=False):
+                whole = self.client.get(url)
+
+            self.assertEqual(streamed, whole.content)
+            self.assertGreater(len(json.loads(streamed)), 1)
+
+    def test_stream_returns_every_row(self):
+        """Test the stream is not cut to a page"""
+        res = self.get_stream(RECEPIES_URL, {'page_size': 2})
+        data = json.loads(b''.join(res.streaming_content))
+
+        self.assertEqual(len(data), 8)
+        self.assertEqual(data[0]['tags'], sorted(t.id for t in self.tags))
+
+    def test_stream_ordered_as_pages(self):
+        """Test streamed rows come in the order cursor pagination pages"""
+        for i in range(5):
+            Tag.objects.create(user=self.user, name=f'Unused {i}')
+        for url, params in (
+            (RECEPIES_URL, {}),
+            (RECEPIES_URL, {'q': 'recipe'}),
+            (TAGS_URL, {}),
+            (TAGS_URL, {'ordering': 'popular'}),
+        ):
+            res = self.get_stream(url, params)
+            streamed = [
+                item['id'] for item in json.loads(
+                    b''.join(res.streaming_content)
+                )
+            ]
+            res = self.client.get(url, dict(params, page_size=2))
+            paged = [item['id'] for item in res.data['results']]
+            while res.data['next']:
+                res = self.client.get(res.data['next'])
+                paged += [item['id'] for item in res.data['results']]
+
+            self.assertGreater(len(streamed), 3)
+            self.assertEqual(streamed, paged)
+
+    def test_stream_respects_filters(self):
+        """Test filters apply to streamed lists"""
+        other = Tag.objects.create(user=self.user, name='Other')
+        recepie = Recepie.objects.create(
+            user=self.user, title='Tagged', time_minutes=1, price=1
+        )
+        recepie.tags.add(other)
+
+        res = self.get_stream(RECEPIES_URL, {'tags': other.id})
+        data = json.loads(b''.join(res.streaming_content))
+
+        self.assertEqual([item['id'] for item in data], [recepie.id])
+
+    def test_empty_stream(self):
+        """Test a list with no rows streams as an empty array"""
+        res = self.get_stream(RECEPIES_URL, {'q': 'nothing matches'})
+
+        self.assertEqual(b''.join(res.streaming_content), b'[]')
+
+    def test_stream_compressed(self):
+        """Test gzip and brotli streams decompress to the same JSON"""
+        plain = b''.join(self.get_stream(RECEPIES_URL).streaming_content)
+
+        res = self.get_stream(RECEPIES_URL, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertFalse(res.has_header('Content-Length'))
+        self.assertEqual(
+            gzip.decompress(b''.join(res.streaming_content)), plain
+        )
+
+        res = self.get_stream(
+            RECEPIES_URL, HTTP_ACCEPT_ENCODING='gzip, br;q=0.9'
+        )
+        self.assertEqual(res['Content-Encoding'], 'br')
+        self.assertEqual(
+            brotli.decompress(b''.join(res.streaming_content)), plain
+        )
+
+    def test_peak_memory_constant(self):
+        """Test peak memory does not grow with the size of the stream"""
+        def peak():
+            tracemalloc.start()
+            res = self.get_stream(
+                RECEPIES_URL, HTTP_ACCEPT_ENCODING='gzip'
+            )
+            for _ in res.streaming_content:
+                pass
+            size = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            return size
+
+        with override_settings(RECEPIE_STREAM_CHUNK_SIZE=20):
+            small = peak()
+            sample_recepies(self.user, 400)
+            large = peak()
+
+        self.assertLess(large, small * 2)
+
+
+class CompressionTests(TestCase):
+    """Test negotiated compression of ordinary responses"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'compress@test.com', 'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        sample_recepies(self.user, 20)
+        get_cache().clear()
+
+    def test_not_compressed_without_accept_encoding(self):
+        """Test responses are sent as is to clients not asking"""
+        res = self.client.get(RECEPIES_URL)
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', res['Vary'])
+
+    def test_refused_coding_not_used(self):
+        """Test a coding given q=0 is not used"""
+        res = self.client.get(
+            RECEPIES_URL, HTTP_ACCEPT_ENCODING='br;q=0, gzip'
+        )
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(
+            json.loads(gzip.decompress(res.content))['results'][0]['title'],
+            'Recipe 19'
+        )
+
+    def test_small_response_not_compressed(self):
+        """Test responses below the minimum size are left alone"""
+        res = self.client.get(TAGS_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+
+    def test_stream_flushed_by_size(self):
+        """Test streams are flushed every flush size, not every chunk"""
+        chunks = [
+            f'{{"id":{i},"title":"Recipe {i}"}},'.encode()
+            for i in range(2000)
+        ]
+        for compressor_class, decompress in (
+            (GzipCompressor, gzip.decompress),
+            (BrotliCompressor, brotli.decompress),
+        ):
+            every_chunk = b''.join(
+                compress_stream(compressor_class(), chunks, 1)
+            )
+            parts = list(
+                compress_stream(compressor_class(), chunks, 16 * 1024)
+            )
+
+            self.assertEqual(decompress(b''.join(parts)), b''.join(chunks))
+            self.assertLess(len(b''.join(parts)), len(every_chunk) / 2)
+            self.assertLess(len(parts), len(chunks) / 10)
+
+    def test_weak_etag_revalidates(self):
+        """Test the weakened ETag of a compressed response still gets 304"""
+        res = self.client.get(RECEPIES_URL, HTTP_ACCEPT_ENCODING='br')
+        self.assertEqual(res['Content-Encoding'], 'br')
+        self.assertTrue(res['ETag'].startswith('W/"'))
+
+        res = self.client.get(
+            RECEPIES_URL, HTTP_ACCEPT_ENCODING='br',
+            HTTP_IF_NONE_MATCH=res['ETag']
+        )
+
+        self.assertEqual(res.status_code, 304)
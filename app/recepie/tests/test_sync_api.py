@@ -0,0 +1,183 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recepie, Tag, Ingredient
+
+SYNC_URL = reverse('recepie:sync')
+
+
+def sample_recepie(user, **params):
+    defaults = {
+        'title': 'sample recepie',
+        'time_minutes': 10,
+        'price': 5.00
+    }
+    defaults.update(params)
+    return Recepie.objects.create(user=user, **defaults)
+
+
+class SyncApiTests(TestCase):
+    """Test the delta sync endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'sync@gmail.com',
+            '12345678'
+        )
+        self.client.force_authenticate(self.user)
+
+    def sync(self, token=None):
+        params = {'since': token} if token else {}
+        res = self.client.get(SYNC_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_login_required(self):
+        """Test sync requires authentication"""
+        res = APIClient().get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_full_sync_without_token(self):
+        """Test the first sync returns everything the user owns"""
+        recepie = sample_recepie(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+
+        data = self.sync()
+
+        self.assertTrue(data['token'])
+        self.assertEqual([r['id'] for r in data['recepies']], [recepie.id])
+        self.assertEqual([t['id'] for t in data['tags']], [tag.id])
+        self.assertEqual(
+            [i['id'] for i in data['ingredients']], [ingredient.id]
+        )
+        self.assertEqual(
+            data['deleted'], {'recepies': [], 'tags': [], 'ingredients': []}
+        )
+
+    def test_sync_limited_to_user(self):
+        """Test another user's objects are never synced"""
+        other = get_user_model().objects.create_user(
+            'other@gmail.com',
+            'testpass'
+        )
+        sample_recepie(user=other)
+        Tag.objects.create(user=other, name='Fruity')
+
+        data = self.sync()
+
+        self.assertEqual(data['recepies'], [])
+        self.assertEqual(data['tags'], [])
+
+    def test_only_changes_after_token(self):
+        """Test a sync with a token returns only later changes"""
+        unchanged = sample_recepie(user=self.user, title='Old')
+        changed = sample_recepie(user=self.user, title='Stew')
+        token = self.sync()['token']
+
+        changed.title = 'Beef stew'
+        changed.save()
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        data = self.sync(token)
+
+        self.assertEqual([r['id'] for r in data['recepies']], [changed.id])
+        self.assertNotIn(unchanged.id, [r['id'] for r in data['recepies']])
+        self.assertEqual([t['id'] for t in data['tags']], [tag.id])
+        self.assertEqual(self.sync(data['token'])['recepies'], [])
+
+    def test_deletes_reported_as_tombstones(self):
+        """Test deleted objects are listed after the token"""
+        recepie = sample_recepie(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recepie_id, tag_id = recepie.id, tag.id
+        token = self.sync()['token']
+
+        recepie.delete()
+        tag.delete()
+        data = self.sync(token)
+
+        self.assertEqual(data['deleted']['recepies'], [recepie_id])
+        self.assertEqual(data['deleted']['tags'], [tag_id])
+        self.assertEqual(data['recepies'], [])
+
+    def test_relinking_tag_syncs_recepie(self):
+        """Test adding a tag to a recipe marks the recipe as changed"""
+        recepie = sample_recepie(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        token = self.sync()['token']
+
+        recepie.tags.add(tag)
+        data = self.sync(token)
+
+        self.assertEqual(len(data['recepies']), 1)
+        self.assertEqual(data['recepies'][0]['tags'], [tag.id])
+
+    def test_deleting_tag_syncs_linked_recepie(self):
+        """Test deleting a tag marks the recipes using it as changed"""
+        recepie = sample_recepie(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recepie.tags.add(tag)
+        tag_id = tag.id
+        token = self.sync()['token']
+
+        tag.delete()
+        data = self.sync(token)
+
+        self.assertEqual([r['id'] for r in data['recepies']], [recepie.id])
+        self.assertEqual(data['recepies'][0]['tags'], [])
+        self.assertEqual(data['deleted']['tags'], [tag_id])
+
+    def test_invalid_token_rejected(self):
+        """Test a tampered token returns 400"""
+        res = self.client.get(SYNC_URL, {'since': 'not-a-token'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(RECEPIE_SYNC_PAGE_SIZE=2)
+    def test_full_sync_paged(self):
+        """Test the first sync is sent in pages linked by their tokens"""
+        recepies = [sample_recepie(user=self.user) for _ in range(3)]
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+
+        pages = [self.sync()]
+        while pages[-1]['more']:
+            pages.append(self.sync(pages[-1]['token']))
+
+        self.assertEqual(len(pages), 2)
+        self.assertEqual(
+            [r['id'] for page in pages for r in page['recepies']],
+            [recepie.id for recepie in recepies]
+        )
+        self.assertEqual(pages[-1]['tags'][0]['id'], tag.id)
+        self.assertFalse(self.sync(pages[-1]['token'])['recepies'])
+
+    @override_settings(RECEPIE_SYNC_PAGE_SIZE=2)
+    def test_changes_sharing_a_sequence_kept_together(self):
+        """Test a page runs over rather than split one change sequence"""
+        recepies = [sample_recepie(user=self.user) for _ in range(3)]
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        Recepie.tags.through.objects.bulk_create(
+            Recepie.tags.through(recepie=recepie, tag=tag)
+            for recepie in recepies
+        )
+        tag_id = tag.id
+        data = self.sync()
+        while data['more']:
+            data = self.sync(data['token'])
+        token = data['token']
+
+        # Touches the three recipes with one sequence, then the tombstone
+        tag.delete()
+        data = self.sync(token)
+        last = self.sync(data['token'])
+
+        self.assertEqual(len(data['recepies']), 3)
+        self.assertTrue(data['more'])
+        self.assertEqual(last['deleted']['tags'], [tag_id])
+        self.assertFalse(last['more'])
@@ -43,7 +43,7 @@ class PrivateTagsApiTests(TestCase):
         tags = Tag.objects.all().order_by('-name')
         serializer = TagSerializer(tags, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
         
     def test_tags_limited_to_user(self):
         user2 = get_user_model().objects.create_user(
@@ -57,8 +57,8 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.get(TAGS_URL)
         
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], tag.name)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], tag.name)
         
     def test_create_tag_successful(self):
         payload = {
@@ -72,6 +72,15 @@ class PrivateTagsApiTests(TestCase):
         ).exists()
         self.assertTrue(exists)
         
+    def test_create_existing_tag_returns_it(self):
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.post(TAGS_URL, {'name': 'Vegan'})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['id'], tag.id)
+        self.assertEqual(Tag.objects.count(), 1)
+
     def test_create_tag_invalid(self):
         payload = {'name': ''}
         res = self.client.post(TAGS_URL, payload)
@@ -93,8 +102,47 @@ class PrivateTagsApiTests(TestCase):
 
         serializer1 = TagSerializer(tag1)
         serializer2 = TagSerializer(tag2)
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertNotIn(serializer2.data, res.data['results'])
+
+    def test_retrieve_tags_assigned_count(self):
+        """Test annotating tags with the number of recipes using them"""
+        tag1 = Tag.objects.create(user=self.user, name='Breakfast')
+        tag2 = Tag.objects.create(user=self.user, name='Lunch')
+        for title in ('Pancakes', 'Porridge'):
+            recipe = Recepie.objects.create(
+                title=title,
+                time_minutes=5,
+                price=3.00,
+                user=self.user
+            )
+            recipe.tags.add(tag1)
+
+        res = self.client.get(TAGS_URL, {'assigned_count': 1})
+
+        counts = {t['id']: t['assigned_count'] for t in res.data['results']}
+        self.assertEqual(counts, {tag1.id: 2, tag2.id: 0})
+
+    def test_assigned_only_single_query(self):
+        """Test assigned tags are filtered without duplicating rows"""
+        tag = Tag.objects.create(user=self.user, name='Breakfast')
+        for title in ('Pancakes', 'Porridge'):
+            recipe = Recepie.objects.create(
+                title=title,
+                time_minutes=5,
+                price=3.00,
+                user=self.user
+            )
+            recipe.tags.add(tag)
+
+        # One query for the ETag data version, one for the tags
+        with self.assertNumQueries(2):
+            res = self.client.get(
+                TAGS_URL, {'assigned_only': 1, 'assigned_count': 1}
+            )
+
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['assigned_count'], 2)
 
 def test_retrieve_tags_assigned_unique(self):
     """Test filtering tags by assigned returns unique items"""
@@ -116,4 +164,4 @@ def test_retrieve_tags_assigned_unique(self):
 
     res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
-    self.assertEqual(len(res.data), 1)
\ No newline at end of file
+    self.assertEqual(len(res.data['results']), 1)
\ No newline at end of file
@@ -0,0 +1,257 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recepie, ImageUpload
+
+from recepie import uploads
+
+UPLOAD_DIR = tempfile.mkdtemp()
+
+
+def image_upload_url(recipe_id):
+    return reverse('recepie:recepie-upload-image', args=[recipe_id])
+
+
+def start_upload_url(recipe_id):
+    return reverse('recepie:recepie-start-image-upload', args=[recipe_id])
+
+
+def png(size=(10, 10)):
+    out = io.BytesIO()
+    Image.new('RGB', size, 'blue').save(out, format='PNG')
+    return out.getvalue()
+
+
+@override_settings(RECEPIE_UPLOAD_DIR=UPLOAD_DIR)
+class ImageUploadTests(TestCase):
+    """Test the streaming and resumable image uploads"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(UPLOAD_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'uploads@gmail.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.recepie = Recepie.objects.create(
+            user=self.user, title='Photo', time_minutes=5, price=1
+        )
+
+    def tearDown(self):
+        self.recepie.refresh_from_db()
+        if self.recepie.image:
+            self.recepie.image.delete()
+
+    def upload(self, data, name='photo.jpg'):
+        return self.client.post(
+            image_upload_url(self.recepie.id),
+            {'image': ContentFile(data, name=name)},
+            format='multipart'
+        )
+
+    def test_type_sniffed_from_content(self):
+        """Test the stored name follows the bytes, not the client's name"""
+        data = png()
+
+        res = self.upload(data, name='photo.html')
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.recepie.refresh_from_db()
+        self.assertTrue(self.recepie.image.name.endswith('.png'))
+        self.assertEqual(
+            self.recepie.image_sha256, hashlib.sha256(data).hexdigest()
+        )
+
+    def test_non_image_rejected(self):
+        """Test a file that is not an image is rejected whatever its name"""
+        res = self.upload(b'<html></html>', name='photo.jpg')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['image'], [uploads.UNSUPPORTED_MESSAGE])
+        self.recepie.refresh_from_db()
+        self.assertFalse(self.recepie.image)
+
+    def test_missing_image_rejected(self):
+        """Test a request without an image part is a client error"""
+        res = self.client.post(
+            image_upload_url(self.recepie.id), {}, format='multipart'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['image'], [uploads.MISSING_MESSAGE])
+
+    @override_settings(RECEPIE_IMAGE_MAX_BYTES=1000)
+    def test_oversized_upload_rejected_while_streaming(self):
+        """Test the limit is enforced on the bytes as they arrive"""
+        res = self.upload(png() + b'\0' * 2000)
+
+        self.assertEqual(
+            res.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+        self.recepie.refresh_from_db()
+        self.assertFalse(self.recepie.image)
+
+    @override_settings(RECEPIE_IMAGE_MAX_BYTES=1000)
+    def test_oversized_request_rejected_before_parsing(self):
+        """Test a body declared too large is refused outright"""
+        res = self.upload(png() + b'\0' * 100000)
+
+        self.assertEqual(
+            res.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+
+    def test_repeated_upload_is_deduplicated(self):
+        """Test uploading the recipe's current image again is a no-op"""
+        data = png()
+        self.upload(data)
+        self.recepie.refresh_from_db()
+        name = self.recepie.image.name
+
+        res = self.upload(data)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recepie.refresh_from_db()
+        self.assertEqual(self.recepie.image.name, name)
+
+    def start(self, length):
+        return self.client.post(
+            start_upload_url(self.recepie.id), HTTP_UPLOAD_LENGTH=str(length)
+        )
+
+    def send(self, url, chunk, offset):
+        return self.client.patch(
+            url, chunk, content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def test_resumable_upload(self):
+        """Test an image sent in chunks is attached once complete"""
+        data = png(size=(200, 200))
+        res = self.start(len(data))
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        url = res['Location']
+        upload = ImageUpload.objects.get()
+
+        res = self.send(url, data[:100], 0)
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(res['Upload-Offset'], '100')
+
+        res = self.send(url, data[50:], 50)
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(res['Upload-Offset'], '100')
+
+        res = self.client.head(url)
+        self.assertEqual(res['Upload-Offset'], '100')
+        self.assertEqual(res['Upload-Length'], str(len(data)))
+
+        res = self.send(url, data[100:], 100)
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.recepie.refresh_from_db()
+        self.assertTrue(self.recepie.image.name.endswith('.png'))
+        with self.recepie.image.open() as image:
+            self.assertEqual(image.read(), data)
+        self.assertEqual(
+            self.recepie.image_sha256, hashlib.sha256(data).hexdigest()
+        )
+        self.assertFalse(ImageUpload.objects.exists())
+        self.assertFalse(os.path.exists(uploads.part_path(upload)))
+
+    def test_resumable_upload_hashed_as_received(self):
+        """Test the chunks are hashed as they arrive, not once complete"""
+        data = png(size=(200, 200))
+        url = self.start(len(data))['Location']
+        upload = ImageUpload.objects.get()
+
+        self.send(url, data[:100], 0)
+
+        sha256 = uploads.running_hashes.take(upload.id, 100)
+        self.assertEqual(
+            sha256.hexdigest(), hashlib.sha256(data[:100]).hexdigest()
+        )
+        uploads.running_hashes.keep(upload.id, 100, sha256)
+        with mock.patch('recepie.uploads.hashlib.sha256') as rehash:
+            res = self.send(url, data[100:], 100)
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        rehash.assert_not_called()
+        self.recepie.refresh_from_db()
+        self.assertEqual(
+            self.recepie.image_sha256, hashlib.sha256(data).hexdigest()
+        )
+
+    def test_resumable_chunk_while_busy_rejected(self):
+        """Test a chunk is refused while another is being received"""
+        url = self.start(10)['Location']
+        upload = ImageUpload.objects.get()
+
+        with uploads.open_part(upload):
+            res = self.send(url, b'\0' * 5, 0)
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        upload.refresh_from_db()
+        self.assertEqual(upload.offset, 0)
+
+    def test_moved_offset_not_overwritten(self):
+        """Test a chunk is not recorded over an offset moved meanwhile"""
+        self.start(10)
+        upload = ImageUpload.objects.get()
+
+        with uploads.open_part(upload) as part:
+            ImageUpload.objects.filter(pk=upload.pk).update(offset=3)
+            offset = uploads.append_chunk(
+                upload, part, io.BytesIO(b'\0' * 5), 5
+            )
+
+        self.assertIsNone(offset)
+        upload.refresh_from_db()
+        self.assertEqual(upload.offset, 3)
+
+    def test_resumable_chunk_past_length_rejected(self):
+        """Test a chunk cannot run past the declared length"""
+        url = self.start(10)['Location']
+
+        res = self.send(url, b'\0' * 20, 0)
+
+        self.assertEqual(
+            res.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+
+    @override_settings(RECEPIE_IMAGE_MAX_BYTES=1000)
+    def test_resumable_upload_size_limited(self):
+        """Test a resumable upload cannot be started over the limit"""
+        res = self.start(1001)
+
+        self.assertEqual(
+            res.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+        self.assertFalse(ImageUpload.objects.exists())
+
+    def test_resumable_non_image_rejected(self):
+        """Test a completed upload that is not an image is discarded"""
+        data = b'not an image at all'
+        url = self.start(len(data))['Location']
+
+        res = self.send(url, data, 0)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ImageUpload.objects.exists())
+        self.recepie.refresh_from_db()
+        self.assertFalse(self.recepie.image)
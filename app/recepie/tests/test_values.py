@@ -0,0 +1,146 @@
+import io
+from collections import OrderedDict
+from datetime import datetime
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recepie, Tag
+
+from recepie.cache import get_cache
+from recepie.parsers import FastJSONParser
+from recepie.renderers import FastJSONRenderer
+
+RECEPIES_URL = reverse('recepie:recepie-list')
+TAGS_URL = reverse('recepie:tag-list')
+INGREDIENTS_URL = reverse('recepie:ingredient-list')
+
+
+class ValuesListTests(TestCase):
+    """Test lists built from values() rows match the instance path"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'values@test.com', 'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('Vegan', 'Dessert  ', 'Spicy')
+        ]
+        ingredients = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ('Salt', 'Crème fraîche')
+        ]
+        for i in range(5):
+            recepie = Recepie.objects.create(
+                user=self.user, title=f'Recipe "{i}"', time_minutes=i,
+                price=Decimal('10.5') + i, link='https://example.com/a?b=1'
+            )
+            recepie.tags.set(tags[i % 3:])
+            recepie.ingredients.set(ingredients[:i % 3])
+        Recepie.objects.filter(title='Recipe "1"').update(
+            image_status=Recepie.IMAGE_READY,
+            image_renditions={'thumbnail': 'images/ab/cd/abcd.jpg'}
+        )
+
+    def assertSameOutput(self, url, params=None):
+        get_cache().clear()
+        fast = self.client.get(url, params)
+        get_cache().clear()
+        with override_settings(RECEPIE_FAST_SERIALIZERS=False):
+            default = self.client.get(url, params)
+
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.content, default.content)
+
+    def test_recepie_list_identical(self):
+        """Test recipe lists match byte for byte"""
+        self.assertSameOutput(RECEPIES_URL)
+        self.assertSameOutput(RECEPIES_URL, {'page_size': 2})
+        self.assertSameOutput(RECEPIES_URL, {'q': 'recipe'})
+
+    def test_attr_lists_identical(self):
+        """Test tag and ingredient lists match with and without counts"""
+        for url in (TAGS_URL, INGREDIENTS_URL):
+            self.assertSameOutput(url)
+            self.assertSameOutput(url, {'assigned_count': 1})
+            self.assertSameOutput(url, {'assigned_only': 1, 'page_size': 1})
+
+    @override_settings(RECEPIE_API_PAGINATE=False)
+    def test_unpaginated_list_identical(self):
+        """Test the legacy unpaginated list matches too"""
+        self.assertSameOutput(RECEPIES_URL)
+
+    def test_recepie_list_queries(self):
+        """Test a page costs one query per m2m however long it is"""
+        # Data version, the page, then ingredient and tag ids
+        with self.assertNumQueries(4):
+            self.client.get(RECEPIES_URL)
+
+
+class FastJSONTests(TestCase):
+    """Test the orjson renderer and parser match DRF's"""
+
+    def test_render_identical(self):
+        """Test rendered bytes match JSONRenderer's"""
+        data = OrderedDict([
+            ('text', 'café     "q" \\ </script>'),
+            ('when', timezone.make_aware(datetime(2020, 1, 2, 3, 4, 5, 6789))),
+            ('price', Decimal('1.50')),
+            ('items', [1, -2, True, None, {'nested': []}]),
+            ('big', 2 ** 70),
+        ])
+
+        fast = FastJSONRenderer().render(data)
+
+        self.assertEqual(fast, JSONRenderer().render(data))
+
+    def test_render_floats_identical(self):
+        """Test floats orjson writes with other exponents fall back"""
+        for value in (0.5, -0.0, 1e-4, 1e15, 1e16, 1e-7, -1.5e300):
+            data = {'values': [1, {'value': value}]}
+
+            fast = FastJSONRenderer().render(data)
+
+            self.assertEqual(fast, JSONRenderer().render(data))
+
+    def test_render_nan_refused(self):
+        """Test NaN is refused like JSONRenderer instead of written null"""
+        for value in (float('nan'), float('inf')):
+            with self.assertRaises(ValueError):
+                FastJSONRenderer().render({'value': value})
+
+    def test_render_indented_falls_back(self):
+        """Test pretty-printed output is left to JSONRenderer"""
+        data = {'a': [1, 2]}
+        media_type = 'application/json; indent=2'
+
+        self.assertEqual(
+            FastJSONRenderer().render(data, media_type),
+            JSONRenderer().render(data, media_type)
+        )
+
+    def test_parse_identical(self):
+        """Test parsed data matches JSONParser's"""
+        for body in (b'{"a": [1, 2.5, "\xc3\xa9"], "b": null}',
+                     b'[%d]' % 2 ** 70):
+            self.assertEqual(
+                FastJSONParser().parse(io.BytesIO(body)),
+                JSONParser().parse(io.BytesIO(body))
+            )
+
+    def test_parse_invalid(self):
+        """Test invalid JSON raises JSONParser's error"""
+        for body in (b'{"a": ', b'{"a": NaN}'):
+            with self.assertRaises(ParseError):
+                FastJSONParser().parse(io.BytesIO(body))
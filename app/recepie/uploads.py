@@ -0,0 +1,284 @@
+"""Streaming and resumable uploads of recipe images
+
+Uploads are written to disk chunk by chunk as they arrive, whatever their
+size, so a worker's memory stays flat however many are in flight. The
+type is taken from the file's leading bytes and the SHA-256 computed on
+the way through.
+"""
+import fcntl
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.core.files.uploadedfile import TemporaryUploadedFile, \
+    UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile, \
+    StopUpload
+
+from rest_framework import status
+
+from core.models import ImageUpload
+
+CHUNK_SIZE = 64 * 1024
+SNIFF_BYTES = 12
+# Room for the multipart boundaries and headers around the file
+MULTIPART_OVERHEAD = 16 * 1024
+
+CONTENT_TYPES = {
+    'jpg': 'image/jpeg',
+    'png': 'image/png',
+    'gif': 'image/gif',
+    'webp': 'image/webp',
+}
+
+
+def sniff_image_type(head):
+    """Return the extension matching an image's leading bytes, or None"""
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def max_bytes():
+    return settings.RECEPIE_IMAGE_MAX_BYTES
+
+
+def too_large_message():
+    return f'Images may be at most {max_bytes()} bytes.'
+
+
+UNSUPPORTED_MESSAGE = 'Upload a JPEG, PNG, GIF or WebP image.'
+MISSING_MESSAGE = 'No file was submitted.'
+# Running hashes of resumable uploads kept by a process
+HASHES_KEPT = 1000
+
+
+class UploadBusy(Exception):
+    """Another request is writing a chunk of the same upload"""
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """Stream the image field of a multipart upload to a temporary file
+
+    Unlike Django's default handlers, small files are not kept in memory
+    either. error and error_status are set when the upload is over the
+    size limit or not an image, and the file is then dropped.
+    """
+    field_name = 'image'
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.error = None
+        self.error_status = None
+
+    def new_file(self, field_name, *args, **kwargs):
+        if field_name != self.field_name:
+            raise SkipFile()
+        super().new_file(field_name, *args, **kwargs)
+        self.head = b''
+        self.sha256 = hashlib.sha256()
+        self.file = TemporaryUploadedFile(
+            self.file_name, self.content_type, 0, self.charset,
+            self.content_type_extra
+        )
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > max_bytes():
+            self.error = too_large_message()
+            self.error_status = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            raise StopUpload()
+        if len(self.head) < SNIFF_BYTES:
+            self.head += raw_data[:SNIFF_BYTES - len(self.head)]
+        self.sha256.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        ext = sniff_image_type(self.head)
+        if ext is None:
+            self.error = UNSUPPORTED_MESSAGE
+            self.error_status = status.HTTP_400_BAD_REQUEST
+            self.file.close()
+            return None
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.name = f'image.{ext}'
+        self.file.content_type = CONTENT_TYPES[ext]
+        self.file.sha256 = self.sha256.hexdigest()
+        return self.file
+
+
+def request_too_large(request):
+    """Return whether the declared body cannot hold an image within limit"""
+    try:
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return False
+    return length > max_bytes() + MULTIPART_OVERHEAD
+
+
+class AssembledUploadFile(UploadedFile):
+    """A completed resumable upload, read from the file it was written to
+
+    temporary_file_path() lets storage move the file into place instead of
+    copying it, and lets image validation read it from disk.
+    """
+
+    def __init__(self, path, ext, size, sha256):
+        super().__init__(
+            open(path, 'rb'), f'image.{ext}', CONTENT_TYPES[ext], size
+        )
+        self.path = path
+        self.sha256 = sha256
+
+    def temporary_file_path(self):
+        return self.path
+
+
+def part_path(upload):
+    """Return the file a resumable upload's chunks are written to"""
+    return os.path.join(settings.RECEPIE_UPLOAD_DIR, f'{upload.id.hex}.part')
+
+
+class RunningHashes:
+    """The SHA-256 of each upload's part file so far, by upload id
+
+    Only the process that received an upload's chunks has its hash, and
+    only the most recent HASHES_KEPT uploads are kept.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._hashes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, upload_id, offset):
+        """Remove and return the hash of the first offset bytes, or None"""
+        with self._lock:
+            entry = self._hashes.pop(upload_id, None)
+        if entry is not None and entry[0] == offset:
+            return entry[1]
+        if offset == 0:
+            return hashlib.sha256()
+        return None
+
+    def forget(self, upload_id):
+        with self._lock:
+            self._hashes.pop(upload_id, None)
+
+    def keep(self, upload_id, offset, sha256):
+        with self._lock:
+            self._hashes[upload_id] = (offset, sha256)
+            while len(self._hashes) > self.size:
+                self._hashes.popitem(last=False)
+
+
+running_hashes = RunningHashes(HASHES_KEPT)
+
+
+@contextmanager
+def open_part(upload):
+    """Open the upload's part file for one request to write a chunk to
+
+    Raises UploadBusy while another request holds it. The upload's offset
+    is re-read under a row lock held only for that read, so the chunk is
+    received outside any transaction.
+    """
+    os.makedirs(settings.RECEPIE_UPLOAD_DIR, exist_ok=True)
+    with open(part_path(upload), 'ab') as part:
+        try:
+            fcntl.flock(part.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadBusy()
+        with transaction.atomic():
+            upload.offset = ImageUpload.objects.select_for_update(
+            ).values_list('offset', flat=True).get(pk=upload.pk)
+        yield part
+
+
+def append_chunk(upload, part, stream, length):
+    """Write up to length bytes of stream to part at the upload's offset
+
+    part comes from open_part(). Bytes past the recorded offset are left
+    over from an interrupted request and overwritten. The new offset is
+    only recorded if no other request moved it meanwhile; returns it, or
+    None when one did. It falls short when the client goes away mid-chunk.
+    """
+    offset = upload.offset
+    sha256 = running_hashes.take(upload.id, offset)
+    part.truncate(offset)
+    remaining = length
+    while remaining > 0:
+        chunk = stream.read(min(CHUNK_SIZE, remaining))
+        if not chunk:
+            break
+        part.write(chunk)
+        if sha256 is not None:
+            sha256.update(chunk)
+        remaining -= len(chunk)
+    part.flush()
+    os.fsync(part.fileno())
+    if not ImageUpload.objects.filter(pk=upload.pk, offset=offset).update(
+        offset=offset + length - remaining
+    ):
+        return None
+    upload.offset = offset + length - remaining
+    if sha256 is not None:
+        running_hashes.keep(upload.id, upload.offset, sha256)
+    return upload.offset
+
+
+def claim(upload):
+    """Take a completed upload to assemble; False if another request did"""
+    return ImageUpload.objects.filter(
+        pk=upload.pk, offset=upload.length
+    ).delete()[0] > 0
+
+
+def assemble(upload):
+    """Return a completed upload as a file, or None if it is not an image
+
+    The file is only hashed again when its chunks reached other processes.
+    """
+    path = part_path(upload)
+    sha256 = running_hashes.take(upload.id, upload.length)
+    with open(path, 'rb') as part:
+        head = part.read(SNIFF_BYTES)
+        if sha256 is None:
+            sha256 = hashlib.sha256(head)
+            for chunk in iter(lambda: part.read(CHUNK_SIZE), b''):
+                sha256.update(chunk)
+    ext = sniff_image_type(head)
+    if ext is None:
+        return None
+    return AssembledUploadFile(path, ext, upload.length, sha256.hexdigest())
+
+
+def _remove_part(upload):
+    running_hashes.forget(upload.id)
+    try:
+        os.remove(part_path(upload))
+    except FileNotFoundError:
+        pass
+
+
+def discard(upload):
+    """Delete an upload and whatever it received"""
+    _remove_part(upload)
+    upload.delete()
+
+
+def discard_all(queryset):
+    """Delete the uploads in queryset and whatever they received"""
+    for upload in queryset.only('id'):
+        _remove_part(upload)
+    queryset._raw_delete(queryset.db)
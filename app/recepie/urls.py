@@ -11,5 +11,8 @@ router.register('recepies', views.RecepieViewSet)
 app_name = 'recepie'
 
 urlpatterns = [
+    path('sync/', views.SyncView.as_view(), name='sync'),
+    path('cache-stats/', views.CacheStatsView.as_view(), name='cache-stats'),
+    path('db-stats/', views.DatabaseStatsView.as_view(), name='db-stats'),
     path('', include(router.urls))
 ]
\ No newline at end of file
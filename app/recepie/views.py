@@ -1,31 +1,83 @@
+from functools import partial
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection, transaction
+from django.db.models import F, IntegerField, Value
+from django.db.models.functions import Cast
+
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.views import APIView
+
+from core.backends.postgresql import base as db_backend
+from core.models import Tag, Ingredient, Recepie, ImageUpload, StoredFile
+from core.search import SEARCH_CONFIG
 
-from core.models import Tag, Ingredient, Recepie
+from recepie import aggregates, bulk, cache, fieldsets, filters, images, \
+    media, serializers, sync, uploads, values
+from recepie.conditional import ConditionalGetMixin
+from recepie.pagination import RecepieCursorPagination
 
-from recepie import serializers
+from user.authentication import CachedTokenAuthentication
 
 
-class BaseRecepieAttrViewSet(viewsets.GenericViewSet, 
+class BaseRecepieAttrViewSet(ConditionalGetMixin,
+                             cache.CachedResponseMixin,
+                             bulk.BulkModelMixin,
+                             values.ValuesListMixin,
+                             viewsets.GenericViewSet, 
                              mixins.ListModelMixin,
                              mixins.CreateModelMixin):
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = RecepieCursorPagination
+    ordering = ('-name', '-id')
+    popular_ordering = ('-recipe_count', '-id')
     
     def get_queryset(self):
         """Return objects for current user"""
         assigned_only = bool(self.request.query_params.get('assigned_only', 0))
-        queryset = self.queryset
+        assigned_count = bool(
+            self.request.query_params.get('assigned_count', 0)
+        )
+        search = self.request.query_params.get('q')
+        queryset = self.queryset.filter(user=self.request.user)
+        if search:
+            queryset = queryset.filter(name__istartswith=search)
+        # Read from the recipe_count column rather than the links
         if assigned_only:
-            queryset = queryset.filter(recepie__isnull=False)
+            queryset = queryset.filter(recipe_count__gt=0)
+        if assigned_count:
+            queryset = queryset.annotate(assigned_count=F('recipe_count'))
 
-        return queryset.filter(
-            user=self.request.user
-        ).order_by('-name').distinct()
-        
+        return queryset.order_by(*self.get_ordering())
+
+    def get_ordering(self):
+        """Return the indexed ordering used for listing and pagination
+
+        ?ordering=popular lists the most used first.
+        """
+        ordering = self.request.query_params.get('ordering', 'name')
+        if ordering == 'popular':
+            return self.popular_ordering
+        if ordering != 'name':
+            raise ValidationError({
+                'ordering': 'Expected one of name, popular.'
+            })
+        return self.ordering
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            partial(self.cached_response, super().list),
+            request, *args, **kwargs
+        )
+
+    @transaction.atomic
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
     
@@ -42,60 +94,355 @@ class IngredientViewSet(BaseRecepieAttrViewSet):
     serializer_class = serializers.IngredientSerializer
     
 
-class RecepieViewSet(viewsets.ModelViewSet):
+class RecepieViewSet(ConditionalGetMixin,
+                     cache.CachedResponseMixin,
+                     bulk.BulkModelMixin,
+                     values.ValuesListMixin,
+                     fieldsets.SparseFieldsViewMixin,
+                     viewsets.ModelViewSet):
     serializer_class = serializers.RecepieSerializer
     queryset = Recepie.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = RecepieCursorPagination
+    ordering = ('-id',)
+    search_ordering = ('-search_rank', '-id')
+    max_filter_ids = 100
     
     
-    def _params_to_ints(self, qs):
-        """Convert a list of string IDs to a list of integers"""
-        return [int(str_id) for str_id in qs.split(',')]
+    def _params_to_ints(self, qs, param):
+        """Convert a list of string IDs to a list of unique integers"""
+        str_ids = qs.split(',')
+        if len(str_ids) > self.max_filter_ids:
+            raise ValidationError({
+                param: f'At most {self.max_filter_ids} IDs may be given.'
+            })
+        try:
+            return sorted({int(str_id) for str_id in str_ids})
+        except ValueError:
+            raise ValidationError({
+                param: 'Expected a comma separated list of integer IDs.'
+            })
+
+    def _match_mode(self):
+        """Return whether recipes must match any or all filter IDs"""
+        match = self.request.query_params.get('match', filters.MATCH_ANY)
+        if match not in filters.MATCH_MODES:
+            raise ValidationError({
+                'match': f'Expected one of {", ".join(filters.MATCH_MODES)}.'
+            })
+        return match
     
     
     def get_queryset(self):
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
+        match = self._match_mode()
         queryset = self.queryset
         if tags:
-            tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            tag_ids = self._params_to_ints(tags, 'tags')
+            queryset = filters.filter_by_related(
+                queryset, Recepie.tags.through, 'tag', tag_ids, match
+            )
         if ingredients:
-            ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+            ingredient_ids = self._params_to_ints(ingredients, 'ingredients')
+            queryset = filters.filter_by_related(
+                queryset,
+                Recepie.ingredients.through,
+                'ingredient',
+                ingredient_ids,
+                match
+            )
 
-        return queryset.filter(user=self.request.user)
-           
+        search = self.request.query_params.get('q')
+        if search:
+            queryset = self._search(queryset, search)
+
+        queryset = queryset.filter(
+            user=self.request.user
+        ).defer('search_vector').order_by(*self.get_ordering())
+        return self._prefetch_related_for_action(queryset)
+
+    def _search(self, queryset, search):
+        """Filter recipes matching a full-text query and rank them"""
+        query = SearchQuery(search, config=SEARCH_CONFIG)
+        # Rank as an integer so cursor positions round-trip exactly
+        rank = SearchRank(F('search_vector'), query) * Value(1000000.0)
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=Cast(rank, IntegerField())
+        )
+
+    def get_ordering(self):
+        """Order search results by rank, otherwise by newest first"""
+        if self.request.query_params.get('q'):
+            return self.search_ordering
+        return self.ordering
+
+    def _prefetch_related_for_action(self, queryset):
+        """Load only the columns and relations the read serializes"""
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        return self.sparse_queryset(queryset, {
+            'tags': Tag,
+            'ingredients': Ingredient,
+        })
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            partial(self.cached_response, super().list),
+            request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            partial(self.cached_response, super().retrieve),
+            request, *args, **kwargs
+        )
     
+    @action(methods=['GET'], detail=False)
+    def stats(self, request):
+        """Return statistics over the recipes the list filters select"""
+        return self.conditional_response(
+            partial(self.cached_response, self._stats),
+            request
+        )
+
+    def _stats(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(aggregates.recepie_stats(queryset))
+
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return serializers.RecepieDetailSerializer
-        elif self.action == 'upload_image':
+        elif self.action in ('upload_image', 'image_upload'):
             return serializers.RecipeImageSerializer
         
         return self.serializer_class
     
+    @transaction.atomic
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        serializer.save()
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
         
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
-        """Upload an image to a recipe"""
+        """Upload an image to a recipe, resizing it in the background"""
+        recipe = self.get_object()
+        if uploads.request_too_large(request):
+            return Response(
+                {'image': [uploads.too_large_message()]},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+        # Set before request.data parses the body
+        handler = uploads.ImageUploadHandler(request)
+        request.upload_handlers = [handler]
+        image = request.data.get('image')
+        if handler.error is not None:
+            return Response(
+                {'image': [handler.error]}, status=handler.error_status
+            )
+        if image is None:
+            return Response(
+                {'image': [uploads.MISSING_MESSAGE]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return self._save_image(recipe, image)
+
+    @action(methods=['POST'], detail=True, url_path='image-uploads')
+    def start_image_upload(self, request, pk=None):
+        """Start a resumable upload of an Upload-Length bytes image"""
+        recipe = self.get_object()
+        try:
+            length = int(request.META['HTTP_UPLOAD_LENGTH'])
+        except (KeyError, ValueError):
+            length = -1
+        if length <= 0:
+            raise ValidationError({
+                'Upload-Length': 'Expected the image size in bytes.'
+            })
+        if length > uploads.max_bytes():
+            return Response(
+                {'image': [uploads.too_large_message()]},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+        upload = ImageUpload.objects.create(
+            user=request.user, recepie=recipe, length=length
+        )
+        location = reverse(
+            'recepie:recepie-image-upload',
+            kwargs={'pk': recipe.pk, 'upload_id': upload.id.hex},
+            request=request
+        )
+        return Response(
+            {'id': upload.id.hex, 'offset': 0, 'length': length},
+            status=status.HTTP_201_CREATED,
+            headers={'Location': location, 'Upload-Offset': '0'}
+        )
+
+    @action(
+        methods=['HEAD', 'PATCH'], detail=True,
+        url_path=r'image-uploads/(?P<upload_id>[0-9a-f]{32})'
+    )
+    def image_upload(self, request, pk=None, upload_id=None):
+        """Report or continue a resumable upload from its Upload-Offset
+
+        The chunk is the raw request body. The request completing the
+        upload answers like upload-image; earlier ones answer 204.
+        """
         recipe = self.get_object()
-        serializer = self.get_serializer(
-            recipe,
-            data=request.data
+        upload = get_object_or_404(
+            ImageUpload.objects.all(), pk=upload_id, recepie=recipe
         )
+        if request.method == 'PATCH':
+            response = self._append_chunk(request, upload)
+            if response is not None:
+                return response
+            if upload.offset == upload.length:
+                return self._finish_upload(recipe, upload)
+        return Response(status=status.HTTP_204_NO_CONTENT, headers={
+            'Upload-Offset': str(upload.offset),
+            'Upload-Length': str(upload.length),
+        })
+
+    def _append_chunk(self, request, upload):
+        """Write the request body to the upload, or return an error"""
+        try:
+            offset = int(request.META['HTTP_UPLOAD_OFFSET'])
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except (KeyError, ValueError):
+            raise ValidationError({
+                'Upload-Offset': 'Expected the offset of this chunk.'
+            })
+        try:
+            with uploads.open_part(upload) as part:
+                if offset != upload.offset:
+                    return self._offset_conflict(upload)
+                if length > upload.length - upload.offset:
+                    return Response(
+                        {'image': ['The chunk runs past Upload-Length.']},
+                        status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+                    )
+                if uploads.append_chunk(
+                    upload, part, request, length
+                ) is None:
+                    return self._offset_conflict(upload)
+        except ImageUpload.DoesNotExist:
+            raise NotFound()
+        except uploads.UploadBusy:
+            return Response(
+                {'Upload-Offset': 'Another chunk is being received.'},
+                status=status.HTTP_409_CONFLICT
+            )
+        return None
+
+    def _offset_conflict(self, upload):
+        return Response(
+            {'Upload-Offset': f'Expected offset {upload.offset}.'},
+            status=status.HTTP_409_CONFLICT,
+            headers={'Upload-Offset': str(upload.offset)}
+        )
+
+    def _finish_upload(self, recipe, upload):
+        """Attach a fully received upload to the recipe"""
+        if not uploads.claim(upload):
+            # Another request completing it is attaching it
+            raise NotFound()
+        image = uploads.assemble(upload)
+        try:
+            if image is None:
+                return Response(
+                    {'image': [uploads.UNSUPPORTED_MESSAGE]},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            return self._save_image(recipe, image)
+        finally:
+            if image is not None:
+                image.close()
+            uploads.discard(upload)
+
+    def _save_image(self, recipe, image):
+        """Store an uploaded image on the recipe and queue its renditions
+
+        Uploading the image the recipe already has changes nothing.
+        """
+        sha256 = getattr(image, 'sha256', '')
+        if recipe.image and sha256 and sha256 == recipe.image_sha256:
+            return Response(
+                self.get_serializer(recipe).data, status=status.HTTP_200_OK
+            )
+        old_files = recipe.stored_files()
+        serializer = self.get_serializer(recipe, data={'image': image})
 
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                recipe = serializer.save(
+                    image_status=Recepie.IMAGE_PENDING,
+                    image_renditions={},
+                    image_sha256=sha256
+                )
+                StoredFile.objects.replace(old_files, recipe.stored_files())
+                images.schedule(recipe)
             return Response(
                 serializer.data,
-                status=status.HTTP_200_OK
+                status=status.HTTP_202_ACCEPTED
             )
 
         return Response(
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
-        )
\ No newline at end of file
+        )
+
+
+class MediaView(APIView):
+    """Serve a stored image to the owner of a recipe using it"""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def perform_content_negotiation(self, request, force=False):
+        # The file is the response whatever the client accepts
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, path):
+        if not media.readable_by(request.user, path):
+            raise NotFound()
+        return media.serve(request, path)
+
+
+class CacheStatsView(APIView):
+    """Report hit/miss counters of this process's response cache"""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(cache.stats.as_dict())
+
+
+class DatabaseStatsView(APIView):
+    """Report this process's database connections and the server's"""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response({
+            'process': db_backend.stats.as_dict(),
+            'server': db_backend.server_connection_counts(connection),
+        })
+
+
+class SyncView(APIView):
+    """Return the user's changes since a sync token"""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        since = request.query_params.get('since')
+        if since:
+            since = sync.decode_token(since)
+        return Response(sync.changes_since(request.user, since or None))
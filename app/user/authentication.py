@@ -0,0 +1,167 @@
+"""Token authentication without a database query per request
+
+A token's user is looked up in this process's memory first, then in the
+shared cache, and only then in authtoken_token. Deleting a token or saving
+its user drops the shared entry at once; other processes may keep serving
+their own copy for up to USER_AUTH_LOCAL_TIMEOUT seconds.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import IntegrityError, router
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+# The user fields kept in the caches; the password hash never is, and
+# anything else is loaded from the database when first used
+CACHED_USER_FIELDS = (
+    'id', 'email', 'name', 'is_active', 'is_staff', 'is_superuser',
+)
+
+
+class LocalCache:
+    """A small thread-safe LRU cache whose entries expire after ttl seconds"""
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.size <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_cache = LocalCache(
+    settings.USER_AUTH_LOCAL_SIZE, settings.USER_AUTH_LOCAL_TIMEOUT
+)
+
+
+def get_cache():
+    return caches[settings.USER_AUTH_CACHE_ALIAS]
+
+
+def _cache_key(key):
+    # Hashed so raw tokens never appear in cache keys or cache logs
+    return 'user:token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def token_expires(created):
+    """Return when a token issued at created stops being accepted"""
+    return created + timedelta(seconds=settings.USER_TOKEN_TTL)
+
+
+def is_expired(created):
+    return token_expires(created) <= timezone.now()
+
+
+def invalidate_tokens(keys):
+    """Forget the cached users of the given token keys"""
+    keys = list(keys)
+    for key in keys:
+        local_cache.delete(key)
+    get_cache().delete_many([_cache_key(key) for key in keys])
+
+
+def issue_token(user):
+    """Return the user's token, replacing it first if it has expired"""
+    token = Token.objects.filter(user=user).first()
+    if token is not None and is_expired(token.created):
+        Token.objects.filter(pk=token.pk).delete()
+        token = None
+    if token is None:
+        try:
+            # Returns the token of a concurrent login that created it first
+            token, _ = Token.objects.get_or_create(user=user)
+        except IntegrityError:
+            # That token was replaced again before it could be read
+            token = Token.objects.get(user=user)
+    return token
+
+
+def rotate_token(user):
+    """Revoke the user's token and return a new one"""
+    Token.objects.filter(user=user).delete()
+    return Token.objects.create(user=user)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that caches users and rejects expired tokens"""
+
+    def authenticate_credentials(self, key):
+        entry = local_cache.get(key)
+        if entry is None:
+            entry = get_cache().get(_cache_key(key))
+            if entry is None:
+                entry = self._load(key)
+            local_cache.set(key, entry)
+
+        values, created = entry
+        if is_expired(created):
+            invalidate_tokens([key])
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+        # Each request gets its own user, so none sees another's changes
+        user_model = get_user_model()
+        user = user_model.from_db(
+            router.db_for_read(user_model),
+            list(values), list(values.values())
+        )
+        return user, Token(key=key, user=user, created=created)
+
+    def _load(self, key):
+        """Return (user, created) of a token from the database and cache it
+
+        Invalid tokens and inactive users raise, and are not cached.
+        """
+        user, token = super().authenticate_credentials(key)
+        # Plain field values, which survive the user model gaining fields,
+        # in model order as from_db() expects
+        values = {
+            field.attname: getattr(user, field.attname)
+            for field in user._meta.concrete_fields
+            if field.attname in CACHED_USER_FIELDS
+        }
+        entry = (values, token.created)
+        timeout = int(min(
+            settings.USER_AUTH_CACHE_TIMEOUT,
+            (token_expires(token.created) - timezone.now()).total_seconds()
+        ))
+        if timeout > 0:
+            get_cache().set(_cache_key(key), entry, timeout)
+        return entry
@@ -0,0 +1,59 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from user.authentication import CachedTokenAuthentication, \
+    invalidate_tokens
+
+
+class Rollback(Exception):
+    """Raised to undo everything the benchmark wrote"""
+
+
+class Command(BaseCommand):
+    help = 'Time token authentication with and without the cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options['requests'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _run(self, count):
+        user = get_user_model().objects.create_user(
+            email='benchmark-auth@example.com', password='benchmark'
+        )
+        token = Token.objects.create(user=user)
+        request = APIRequestFactory().get(
+            '/', HTTP_AUTHORIZATION=f'Token {token.key}'
+        )
+        invalidate_tokens([token.key])
+        for authentication in (TokenAuthentication,
+                               CachedTokenAuthentication):
+            self._timed(authentication(), request, count)
+        invalidate_tokens([token.key])
+
+    def _timed(self, authentication, request, count):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for _ in range(count):
+                authentication.authenticate(Request(request))
+            elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f'{type(authentication).__name__:<26} {count:>6} requests  '
+            f'{elapsed / count * 1000000:8.1f}us/request  '
+            f'{len(queries):>6} queries'
+        )
@@ -0,0 +1,87 @@
+import threading
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import get_hashers
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from rest_framework.test import APIRequestFactory
+
+from user.views import CreateTokenView
+
+PASSWORD = 'benchmark-password'
+
+
+class Command(BaseCommand):
+    help = 'Time password hashers, then login throughput under concurrency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=200)
+        parser.add_argument('--concurrency', default='1,2,4,8')
+        parser.add_argument('--hashes', type=int, default=20)
+
+    def handle(self, *args, **options):
+        for hasher in get_hashers():
+            self._time_hasher(hasher, options['hashes'])
+
+        # Logins run on their own threads and connections, so the user is
+        # committed and deleted afterwards instead of rolled back
+        self.email = f'benchmark-login-{uuid.uuid4().hex}@example.com'
+        user = get_user_model().objects.create_user(self.email, PASSWORD)
+        self.view = CreateTokenView.as_view(throttle_classes=())
+        self.factory = APIRequestFactory()
+        try:
+            for concurrency in map(int, options['concurrency'].split(',')):
+                self._time_logins(options['logins'], concurrency)
+        finally:
+            user.delete()
+
+    def _time_hasher(self, hasher, count):
+        try:
+            encoded = hasher.encode(PASSWORD, hasher.salt())
+        except ValueError as error:
+            self.stdout.write(f'{hasher.algorithm:<24} skipped: {error}')
+            return
+        start = time.perf_counter()
+        for _ in range(count):
+            hasher.verify(PASSWORD, encoded)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f'{hasher.algorithm:<24} {elapsed / count * 1000:8.1f}ms/verify'
+        )
+
+    def _login(self, count, errors):
+        try:
+            for _ in range(count):
+                request = self.factory.post(
+                    '/token/', {'email': self.email, 'password': PASSWORD},
+                    format='json'
+                )
+                res = self.view(request)
+                if res.status_code != 200:
+                    errors.append(f'{res.status_code}: {res.data}')
+        finally:
+            connection.close()
+
+    def _time_logins(self, logins, concurrency):
+        errors = []
+        per_thread = max(logins // concurrency, 1)
+        threads = [
+            threading.Thread(target=self._login, args=(per_thread, errors))
+            for _ in range(concurrency)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        if errors:
+            raise CommandError(f'Login failed with {errors[0]}')
+        total = per_thread * concurrency
+        self.stdout.write(
+            f'{concurrency:>3} threads {total:>6} logins  {elapsed:8.3f}s  '
+            f'{total / elapsed:8.0f}/s'
+        )
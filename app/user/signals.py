@@ -0,0 +1,25 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from user.authentication import invalidate_tokens
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    """Stop accepting a deleted token from the cache"""
+    invalidate_tokens([instance.key])
+
+
+@receiver(post_save, sender=get_user_model())
+def forget_saved_user_tokens(sender, instance, raw=False, **kwargs):
+    """Drop cached copies of a user who was deactivated or changed password
+
+    Any save drops them, so cached users never go stale.
+    """
+    if not raw:
+        invalidate_tokens(
+            Token.objects.filter(user=instance).values_list('key', flat=True)
+        )
@@ -0,0 +1,163 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import _cache_key, get_cache, issue_token, \
+    local_cache
+
+TOKEN_URL = reverse('user:token')
+ROTATE_URL = reverse('user:token-rotate')
+ME_URL = reverse('user:me')
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating with cached, expiring tokens"""
+
+    def setUp(self):
+        get_cache().clear()
+        local_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com', password='testpass', name='tester'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_cached_token_skips_database(self):
+        """Test only the first request looks the token up"""
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_shared_cache_used_after_local_expiry(self):
+        """Test a process without its own copy reads the shared cache"""
+        self.client.get(ME_URL)
+        local_cache.clear()
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_deleted_token_rejected(self):
+        """Test deleting a token stops it being accepted from the cache"""
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test a deactivated user's cached token is rejected"""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_drops_cached_user(self):
+        """Test a password change is seen by the next request"""
+        self.client.get(ME_URL)
+        self.user.set_password('changedpass')
+        self.user.save()
+
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_update_saves_fresh_user(self):
+        """Test updating the profile never saves a stale cached user"""
+        self.client.get(ME_URL)
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            is_staff=True
+        )
+
+        res = self.client.patch(ME_URL, {'name': 'new name'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, 'new name')
+        self.assertTrue(self.user.is_staff)
+
+    def test_expired_token_rejected(self):
+        """Test a token older than USER_TOKEN_TTL is rejected"""
+        self.client.get(ME_URL)
+        later = timezone.now() + timedelta(days=31)
+
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_expired_token_replaced_on_login(self):
+        """Test logging in issues a new token once the old one expired"""
+        Token.objects.filter(pk=self.token.pk).update(
+            created=timezone.now() - timedelta(days=31)
+        )
+        payload = {'email': 'test@test.com', 'password': 'testpass'}
+
+        res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res.data['token'], self.token.key)
+        self.assertGreater(res.data['expires'], timezone.now())
+
+    def test_login_returns_current_token(self):
+        """Test logging in again returns the unexpired token"""
+        payload = {'email': 'test@test.com', 'password': 'testpass'}
+
+        res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.data['token'], self.token.key)
+
+    def test_password_hash_not_cached(self):
+        """Test only the listed user fields are kept in the shared cache"""
+        self.client.get(ME_URL)
+
+        values, created = get_cache().get(_cache_key(self.token.key))
+
+        self.assertNotIn('password', values)
+        self.assertEqual(values['email'], self.user.email)
+
+    def test_concurrent_login_reuses_token(self):
+        """Test a token created by a concurrent login is returned"""
+        no_tokens = Token.objects.none()
+
+        with mock.patch.object(
+            Token.objects, 'filter', return_value=no_tokens
+        ):
+            token = issue_token(self.user)
+
+        self.assertEqual(token.key, self.token.key)
+
+    def test_rotate_token(self):
+        """Test rotating revokes the old token and issues a new one"""
+        self.client.get(ME_URL)
+
+        res = self.client.post(ROTATE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(Token.objects.filter(key=self.token.key).exists())
+        self.assertEqual(self.client.get(ME_URL).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {res.data["token"]}'
+        )
+        self.assertEqual(self.client.get(ME_URL).status_code,
+                         status.HTTP_200_OK)
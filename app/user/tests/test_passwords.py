@@ -0,0 +1,131 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.passwords import HashingPool, PasswordHashingBusy
+
+CREATE_USER_URL = reverse('user:create')
+TOKEN_URL = reverse('user:token')
+
+
+class PasswordHashingTests(TestCase):
+    """Test hashing passwords and rate limiting logins"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.payload = {'email': 'test@test.com', 'password': 'testpass'}
+
+    def test_new_password_uses_argon2(self):
+        """Test passwords of new users are hashed with Argon2"""
+        user = get_user_model().objects.create_user(**self.payload)
+
+        self.assertTrue(user.password.startswith('argon2$'))
+        self.assertTrue(user.check_password(self.payload['password']))
+
+    def test_login_upgrades_old_hash(self):
+        """Test logging in rehashes a PBKDF2 password with Argon2"""
+        user = get_user_model().objects.create_user(email='test@test.com')
+        get_user_model().objects.filter(pk=user.pk).update(
+            password=make_password('testpass', hasher='pbkdf2_sha256')
+        )
+
+        res = self.client.post(TOKEN_URL, self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('argon2$'))
+
+    def test_failed_login_keeps_old_hash(self):
+        """Test a wrong password leaves the stored hash alone"""
+        user = get_user_model().objects.create_user(email='test@test.com')
+        old = make_password('testpass', hasher='pbkdf2_sha256')
+        get_user_model().objects.filter(pk=user.pk).update(password=old)
+
+        self.client.post(TOKEN_URL, {**self.payload, 'password': 'wrong'})
+
+        user.refresh_from_db()
+        self.assertEqual(user.password, old)
+
+    @override_settings(USER_LOGIN_RATE='2/min')
+    def test_login_rate_limited_per_account(self):
+        """Test logins stop being checked after too many for one account"""
+        get_user_model().objects.create_user(**self.payload)
+        for address in ('10.0.0.1', '10.0.0.2'):
+            self.client.post(
+                TOKEN_URL, {**self.payload, 'password': 'wrong'},
+                REMOTE_ADDR=address
+            )
+
+        res = self.client.post(
+            TOKEN_URL, {**self.payload, 'email': 'TEST@test.com'},
+            REMOTE_ADDR='10.0.0.3'
+        )
+        other = self.client.post(
+            TOKEN_URL, {'email': 'other@test.com', 'password': 'wrong'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(other.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(USER_LOGIN_ADDRESS_RATE='2/min')
+    def test_login_rate_limited_per_address(self):
+        """Test one address spraying random accounts is stopped"""
+        for email in ('one@test.com', 'two@test.com'):
+            self.client.post(
+                TOKEN_URL, {'email': email, 'password': 'wrong'},
+                REMOTE_ADDR='10.0.0.1'
+            )
+
+        res = self.client.post(
+            TOKEN_URL, {'email': 'three@test.com', 'password': 'wrong'},
+            REMOTE_ADDR='10.0.0.1'
+        )
+        other = self.client.post(
+            TOKEN_URL, {'email': 'three@test.com', 'password': 'wrong'},
+            REMOTE_ADDR='10.0.0.2'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(other.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(USER_SIGNUP_RATE='1/hour')
+    def test_signup_rate_limited(self):
+        """Test one address cannot create accounts without limit"""
+        self.client.post(CREATE_USER_URL, self.payload)
+
+        res = self.client.post(
+            CREATE_USER_URL, {**self.payload, 'email': 'other@test.com'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertFalse(
+            get_user_model().objects.filter(email='other@test.com').exists()
+        )
+
+    def test_busy_pool_rejects_hashing(self):
+        """Test hashing fails fast when the slots and queue are full"""
+        pool = HashingPool(workers=1, queue=0, timeout=0)
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        blocked = threading.Thread(target=pool.run, args=(block,))
+        blocked.start()
+        started.wait(5)
+        try:
+            with self.assertRaises(PasswordHashingBusy):
+                pool.run(make_password, 'testpass')
+        finally:
+            release.set()
+            blocked.join()
+        self.assertTrue(pool.run(make_password, 'testpass'))
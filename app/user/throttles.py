@@ -0,0 +1,48 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from rest_framework.throttling import AnonRateThrottle, SimpleRateThrottle
+
+
+class LoginRateThrottle(SimpleRateThrottle):
+    """Limit login attempts per account, from wherever they come"""
+    scope = 'login'
+
+    def get_rate(self):
+        return settings.USER_LOGIN_RATE
+
+    def get_cache_key(self, request, view):
+        data = request.data
+        email = data.get('email') if hasattr(data, 'get') else None
+        if not isinstance(email, str) or not email:
+            # Rejected by the serializer before any password is hashed
+            return None
+        email = get_user_model().objects.normalize_email(email).lower()
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': hashlib.sha256(email.encode()).hexdigest(),
+        }
+
+
+class LoginAddressRateThrottle(SimpleRateThrottle):
+    """Limit login attempts per client address, whichever accounts"""
+    scope = 'login_address'
+
+    def get_rate(self):
+        return settings.USER_LOGIN_ADDRESS_RATE
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': self.get_ident(request),
+        }
+
+
+class SignupRateThrottle(AnonRateThrottle):
+    """Limit the accounts one client address can create"""
+    scope = 'signup'
+
+    def get_rate(self):
+        return settings.USER_SIGNUP_RATE
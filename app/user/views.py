@@ -1,28 +1,62 @@
-from rest_framework import generics, authentication, permissions
+from django.contrib.auth import get_user_model
+
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from user.authentication import CachedTokenAuthentication, issue_token, \
+    rotate_token, token_expires
 from user.serializers import UserSerializer, AuthTokenSerializer
+from user.throttles import LoginAddressRateThrottle, LoginRateThrottle, \
+    SignupRateThrottle
+
+
+def token_response(token):
+    return Response({
+        'token': token.key,
+        'expires': token_expires(token.created),
+    })
 
 
 class CreateUserView(generics.CreateAPIView):
     
     serializer_class = UserSerializer
+    throttle_classes = (SignupRateThrottle,)
     
 
 class CreateTokenView(ObtainAuthToken):
     
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = (LoginRateThrottle, LoginAddressRateThrottle)
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(
+            data=request.data, context={'request': request}
+        )
+        serializer.is_valid(raise_exception=True)
+        return token_response(issue_token(serializer.validated_data['user']))
+
+
+class RotateTokenView(APIView):
+    """Replace the authenticated user's token with a new one"""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request, *args, **kwargs):
+        return token_response(rotate_token(request.user))
 
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage the authenticated user"""
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
-        return self.request.user
-        
-    
-    
\ No newline at end of file
+        if self.request.method in permissions.SAFE_METHODS:
+            return self.request.user
+        # The authenticated user may be a cached copy; save a fresh one
+        return get_user_model().objects.get(pk=self.request.user.pk)